@@ -0,0 +1,68 @@
+"""
+Memory per buffered host: UnifiedHost models vs. CompactHost records.
+
+Normalizes a batch of synthetic hosts per source, keeps them in memory in both forms and measures
+the bytes reachable from each batch (objects shared between hosts, such as interned strings, are
+counted once). Also reports the pickled size, which is what the normalization workers send back.
+
+Usage:
+    PYTHONPATH=. python benchmarks/compact_host_benchmark.py [hosts per source]
+"""
+import pickle
+import sys
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+from benchmarks.synthetic_hosts import synthetic_payloads
+from src.models.compact_host import CompactHost
+from src.normalization.host_normalizer import HostNormalizer
+
+
+def deep_size(root: Any) -> int:
+    """Bytes of every object reachable from root, each object counted once."""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or obj is None or isinstance(obj, (bool, type)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        if isinstance(obj, BaseModel):
+            stack.extend([obj.__dict__, obj.__pydantic_fields_set__])
+        elif hasattr(type(obj), "__slots__") and not isinstance(obj, (str, int, float)):
+            stack.extend(getattr(obj, name) for name in type(obj).__slots__ if hasattr(obj, name))
+    return total
+
+
+def measure(source: str, raw_hosts: List[Dict[str, Any]]) -> Dict[str, float]:
+    hosts = HostNormalizer().normalize_batch(raw_hosts, source)
+    compact = [CompactHost.from_unified(host) for host in hosts]
+    return {
+        "model_bytes": deep_size(hosts) / len(hosts),
+        "compact_bytes": deep_size(compact) / len(compact),
+        "model_pickle": len(pickle.dumps(hosts)) / len(hosts),
+        "compact_pickle": len(pickle.dumps(compact)) / len(compact),
+    }
+
+
+def main(count: int):
+    print(f"Bytes per host ({count} hosts per source)")
+    print(f"{'source':>12} | {'UnifiedHost':>11} {'CompactHost':>11} {'ratio':>6} | "
+          f"{'pickled':>8} {'compact':>8} {'ratio':>6}")
+    for source, raw_hosts in synthetic_payloads(count, seed=1).items():
+        sizes = measure(source, raw_hosts)
+        print(f"{source:>12} | {sizes['model_bytes']:>11.0f} {sizes['compact_bytes']:>11.0f} "
+              f"{sizes['model_bytes'] / sizes['compact_bytes']:>5.1f}x | {sizes['model_pickle']:>8.0f} "
+              f"{sizes['compact_pickle']:>8.0f} {sizes['model_pickle'] / sizes['compact_pickle']:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
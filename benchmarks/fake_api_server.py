@@ -0,0 +1,152 @@
+"""
+Local stand-in for the vendor host APIs, used to run the API clients offline.
+
+Implements the same pagination semantics as the real endpoints:
+- Qualys/CrowdStrike: POST ?skip=&limit=, returning a JSON list of hosts. A limit above the maximum
+  returns a 'too_big' error body, and a skip/limit combination past the number of hosts returns
+  an HTTP 400 whose text is END_OF_DATA_ERROR_MESSAGE.
+- Tenable: POST ?cursor=, returning {"hosts": [...], "cursor": "..."}. An unknown cursor returns
+  HTTP 400 'Invalid cursor'.
+
+Usage:
+    with FakeApiServer(qualys_hosts=[...], tenable_hosts=[...]) as server:
+        client = AsyncQualysApiClient(base_url=server.base_url)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from src.api_clients.base_client import BaseApiClient
+
+SKIP_LIMIT_ENDPOINTS = {
+    "/api/qualys/hosts/get": "qualys",
+    "/api/crowdstrike/hosts/get": "crowdstrike",
+}
+CURSOR_ENDPOINTS = {
+    "/api/tenable/hosts/get": "tenable",
+}
+
+
+class FakeApiServer:
+    def __init__(self, qualys_hosts: Optional[List[Dict[str, Any]]] = None,
+                 crowdstrike_hosts: Optional[List[Dict[str, Any]]] = None,
+                 tenable_hosts: Optional[List[Dict[str, Any]]] = None,
+                 max_limit: int = 2, tenable_page_size: int = 2, latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.hosts = {
+            "qualys": qualys_hosts or [],
+            "crowdstrike": crowdstrike_hosts or [],
+            "tenable": tenable_hosts or [],
+        }
+        self.max_limit = max_limit
+        self.tenable_page_size = tenable_page_size
+        # Simulated network round trip per request, in seconds
+        self.latency = latency
+        self.request_count = 0
+        # Requests being served right now, and the most seen at once
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeApiServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-api-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeApiServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _skip_limit_page(self, source: str, params: Dict[str, List[str]]):
+        hosts = self.hosts[source]
+        try:
+            skip = int(params.get("skip", ["0"])[0])
+            limit = int(params.get("limit", ["1"])[0])
+        except ValueError:
+            return 400, "text/plain", "Invalid skip/limit"
+
+        if limit > self.max_limit:
+            error = [{"code": "too_big", "maximum": self.max_limit,
+                      "message": f"Number must be less than or equal to {self.max_limit}"}]
+            return 200, "application/json", json.dumps({"error": error})
+        if skip + limit > len(hosts):
+            return 400, "text/plain", BaseApiClient.END_OF_DATA_ERROR_MESSAGE
+        return 200, "application/json", json.dumps(hosts[skip:skip + limit])
+
+    def _cursor_page(self, source: str, params: Dict[str, List[str]]):
+        hosts = self.hosts[source]
+        cursor = params.get("cursor", [""])[0]
+        if cursor == "":
+            offset = 0
+        elif cursor.startswith("c") and cursor[1:].isdigit() and int(cursor[1:]) <= len(hosts):
+            offset = int(cursor[1:])
+        else:
+            return 400, "text/plain", "Invalid cursor"
+
+        page = hosts[offset:offset + self.tenable_page_size]
+        next_offset = offset + len(page)
+        return 200, "application/json", json.dumps({"hosts": page, "cursor": f"c{next_offset}"})
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                with server._lock:
+                    server.request_count += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    self._respond()
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                parsed = urlparse(self.path)
+                params = parse_qs(parsed.query, keep_blank_values=True)
+                if parsed.path in SKIP_LIMIT_ENDPOINTS:
+                    status, content_type, body = server._skip_limit_page(SKIP_LIMIT_ENDPOINTS[parsed.path], params)
+                elif parsed.path in CURSOR_ENDPOINTS:
+                    status, content_type, body = server._cursor_page(CURSOR_ENDPOINTS[parsed.path], params)
+                else:
+                    status, content_type, body = 404, "text/plain", "Not found"
+
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,63 @@
+"""
+Benchmark of per-host (normalize_host) vs. batch (normalize_batch) normalization.
+
+Runs both APIs over the same synthetic Qualys, CrowdStrike and Tenable payloads and prints the
+throughput per source. Checks that both produce the same hosts.
+
+Usage:
+    PYTHONPATH=. python benchmarks/normalization_benchmark.py [hosts per source] [batch size]
+"""
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.synthetic_hosts import synthetic_payloads
+from src.normalization.host_normalizer import HostNormalizer
+
+TIMESTAMP_FIELDS = {"record_created_at", "record_last_updated_at"}
+
+
+def _timed(run: Callable[[], List[Any]], repeat: int = 3) -> tuple[float, List[Any]]:
+    # Best of `repeat` runs
+    best = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def compare(source: str, raw_hosts: List[Dict[str, Any]], batch_size: int) -> Dict[str, float]:
+    normalizer = HostNormalizer()
+    # Warm-up, so neither side pays for the first model validations
+    normalizer.normalize_batch(raw_hosts[:10], source)
+
+    per_host_seconds, per_host = _timed(lambda: [normalizer.normalize_host(raw_host, source) for raw_host in raw_hosts])
+    batch_seconds, batch = _timed(lambda: [
+        host
+        for start in range(0, len(raw_hosts), batch_size)
+        for host in normalizer.normalize_batch(raw_hosts[start:start + batch_size], source)
+    ])
+
+    if [h.model_dump(exclude=TIMESTAMP_FIELDS) for h in per_host] != [h.model_dump(exclude=TIMESTAMP_FIELDS) for h in batch]:
+        raise AssertionError(f"normalize_batch and normalize_host disagree for {source}")
+
+    return {
+        "per_host": len(raw_hosts) / per_host_seconds,
+        "batch": len(raw_hosts) / batch_seconds,
+    }
+
+
+def main(count: int, batch_size: int):
+    payloads = synthetic_payloads(count, seed=1)
+    print(f"{count} hosts per source, batches of {batch_size}")
+    print(f"{'source':>12} | {'per-host hosts/s':>16} | {'batch hosts/s':>13} | {'speed-up':>8}")
+    for source, raw_hosts in payloads.items():
+        rates = compare(source, raw_hosts, batch_size)
+        print(f"{source:>12} | {rates['per_host']:>16.0f} | {rates['batch']:>13.0f} | "
+              f"{rates['batch'] / rates['per_host']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
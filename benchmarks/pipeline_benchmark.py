@@ -0,0 +1,204 @@
+"""
+End-to-end pipeline benchmark against local stand-ins for the vendor APIs and MongoDB.
+
+Serves a synthetic fleet (benchmarks/synthetic_hosts.py) from a FakeApiServer running in its own
+process, fetches it with the real Qualys, CrowdStrike and Tenable clients, and normalizes and
+deduplicates it through ConcurrentPipeline into mongomock (or the MongoDB at --mongo-uri).
+Reports end-to-end hosts/s and, from PIPELINE_METRICS, the busy time and rate of every stage.
+
+mongomock answers every query with a collection scan and does not support pymongo 4 bulk
+operations: beyond ~10k hosts use --dedup offline (no reads until the final load), or a local
+mongod via --mongo-uri, which is also required for --batch-size.
+
+With --cache-dir, the pages served by the fake API are recorded on disk (ResponseCache), and
+--cache-mode replay runs the pipeline from the recorded pages without starting the server, so
+repeated runs read identical inputs at disk speed.
+
+Usage:
+    PYTHONPATH=. python benchmarks/pipeline_benchmark.py --sizes 1000,100000,1000000 --dedup offline
+    PYTHONPATH=. python benchmarks/pipeline_benchmark.py --sizes 100000 --mongo-uri mongodb://localhost:27017 --batch-size 500
+    PYTHONPATH=. python benchmarks/pipeline_benchmark.py --sizes 100000 --dedup offline --cache-dir /tmp/pages --cache-mode replay
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from pymongo import MongoClient
+
+from benchmarks.fake_api_server import FakeApiServer
+from benchmarks.synthetic_hosts import expected_assets, synthetic_fleet
+from src.api_clients.crowdstrike_client import CrowdStrikeApiClient
+from src.api_clients.qualys_client import QualysApiClient
+from src.api_clients.rate_limiter import AdaptiveRateLimiter
+from src.api_clients.response_cache import ResponseCache
+from src.api_clients.tenable_client import TenableApiClient
+from src.deduplication.deduplicator import Deduplicator
+from src.deduplication.offline_deduplicator import OfflineDeduplicator
+from src.pipeline.concurrent_pipeline import ConcurrentPipeline
+from src.pipeline.metrics import PIPELINE_METRICS, STAGES, MongoCommandMetrics
+from src.pipeline.parallel_normalizer import ParallelNormalizer
+
+CLIENTS = [(QualysApiClient, "Qualys"), (CrowdStrikeApiClient, "CrowdStrike"), (TenableApiClient, "Tenable")]
+# No client-side pacing: the benchmark measures the pipeline, not the vendors' rate limits
+UNLIMITED_RATE = 1e9
+
+
+def _serve(count: int, seed: int, overlap: float, page_size: int, latency: float, ready, stop):
+    fleet = synthetic_fleet(count, seed, overlap)
+    with FakeApiServer(qualys_hosts=fleet["Qualys"], crowdstrike_hosts=fleet["CrowdStrike"],
+                       tenable_hosts=fleet["Tenable"], max_limit=page_size, tenable_page_size=page_size,
+                       latency=latency) as server:
+        ready.send(server.base_url)
+        stop.wait()
+
+
+@contextlib.contextmanager
+def fake_api(count: int, seed: int, overlap: float, page_size: int, latency: float,
+             replay: bool = False) -> Iterator[str]:
+    """Runs FakeApiServer in a child process, so serving pages takes no CPU from the pipeline."""
+    if replay:
+        # Every page comes from the response cache, which does not key on the server address
+        yield "http://replay.invalid"
+        return
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    stop = context.Event()
+    process = context.Process(target=_serve, args=(count, seed, overlap, page_size, latency, sender, stop), daemon=True)
+    process.start()
+    try:
+        yield receiver.recv()
+    finally:
+        stop.set()
+        process.join(timeout=10)
+
+
+def make_clients(base_url: str, count: int, page_size: int, prefetch: int,
+                 response_cache: Optional[ResponseCache] = None) -> List[Any]:
+    sources = []
+    for client_class, source in CLIENTS:
+        rate_limiter = AdaptiveRateLimiter(rate=UNLIMITED_RATE, burst=UNLIMITED_RATE, max_rate=UNLIMITED_RATE,
+                                           max_concurrency=max(1, prefetch))
+        client = client_class(rate_limiter=rate_limiter, response_cache=response_cache)
+        client.BASE_URL = base_url
+        client.MAX_API_LIMIT = page_size
+        # Every host is reachable; a partial last page goes through the clients' end-of-data handling
+        client.MAX_API_SKIP = max(count - 1, 0)
+        client.PREFETCH_WINDOW = prefetch
+        sources.append((client, source))
+    return sources
+
+
+def open_database(mongo_uri: Optional[str]):
+    if mongo_uri:
+        client = MongoClient(mongo_uri, event_listeners=[MongoCommandMetrics(PIPELINE_METRICS)])
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("mongomock is not installed (it is not in requirements.txt): "
+                             "pip install mongomock, or benchmark against a MongoDB with --mongo-uri")
+        client = mongomock.MongoClient()
+    db = client["asset_inventory_benchmark"]
+    for name in ("unified_assets", "unified_assets_staging"):
+        db[name].drop()
+    return db
+
+
+def run(count: int, args: argparse.Namespace) -> Dict[str, Any]:
+    PIPELINE_METRICS.reset()
+    PIPELINE_METRICS.configure(verbose=False)
+    db = open_database(args.mongo_uri)
+    response_cache = None
+    if args.cache_dir:
+        # One cache per fleet, so runs of different sizes or seeds never share pages
+        directory = os.path.join(args.cache_dir, f"{count}-{args.seed}-{args.overlap}-{args.page_size}")
+        response_cache = ResponseCache(directory, mode=args.cache_mode)
+
+    with fake_api(count, args.seed, args.overlap, args.page_size, args.latency, args.cache_mode == "replay") as base_url, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        sources = make_clients(base_url, count, args.page_size, args.prefetch, response_cache)
+        if args.dedup == "offline":
+            deduplicator = OfflineDeduplicator(db)
+        else:
+            deduplicator = Deduplicator(db, use_identity_index=args.dedup == "index")
+        pipeline = ConcurrentPipeline(deduplicator, max_workers=args.fetch_workers, batch_size=args.batch_size,
+                                      normalizer=ParallelNormalizer(workers=args.normalize_workers,
+                                                                    compact=args.compact_transport),
+                                      progress_interval=0)
+        started_at = time.perf_counter()
+        progress = pipeline.run(sources)
+        if isinstance(deduplicator, OfflineDeduplicator):
+            deduplicator.load()
+        elapsed = time.perf_counter() - started_at
+
+    processed = sum(source["processed"] for source in progress.values())
+    return {
+        "hosts": processed,
+        "assets": db["unified_assets"].count_documents({}),
+        "expected_assets": expected_assets(count, args.overlap),
+        "seconds": elapsed,
+        "snapshot": PIPELINE_METRICS.snapshot(),
+    }
+
+
+def _counter(snapshot: Dict[str, Any], name: str) -> float:
+    return sum(counter["value"] for counter in snapshot["counters"] if counter["name"] == name)
+
+
+def report(count: int, result: Dict[str, Any]):
+    snapshot = result["snapshot"]
+    print(f"\n{count} hosts per source: {result['hosts']} hosts -> {result['assets']} assets "
+          f"(expected {result['expected_assets']}) in {result['seconds']:.2f}s, "
+          f"{result['hosts'] / result['seconds']:.0f} hosts/s end to end")
+    print(f"HTTP: {_counter(snapshot, 'http_requests_total'):.0f} requests, "
+          f"{_counter(snapshot, 'http_response_bytes_total') / 1e6:.1f} MB, "
+          f"{_counter(snapshot, 'api_cache_hits_total'):.0f} pages from the response cache; "
+          f"MongoDB round-trips: {_counter(snapshot, 'mongo_round_trips_total'):.0f}"
+          f"{'' if _counter(snapshot, 'mongo_round_trips_total') else ' (not counted for mongomock)'}")
+    print(f"{'stage':>10} | {'units':>9} {'busy s':>8} {'items':>9} {'items/s':>10} {'hosts/s':>10}")
+    hosts_fetched = _counter(snapshot, "hosts_fetched_total")
+    for stage in STAGES:
+        stats = snapshot["stages"].get(stage)
+        if not stats:
+            continue
+        # Stage items are requests for fetch and candidates for score; hosts/s is per host handled
+        hosts = hosts_fetched if stage == "fetch" else result["hosts"]
+        hosts_per_second = hosts / stats["seconds"] if stats["seconds"] else float("nan")
+        print(f"{stage:>10} | {stats['count']:>9} {stats['seconds']:>8.2f} {stats['items']:>9.0f} "
+              f"{stats['items_per_second'] or 0:>10.0f} {hosts_per_second:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000", help="comma-separated hosts per source, e.g. 1000,100000,1000000")
+    parser.add_argument("--overlap", type=float, default=1.0, help="fraction of each source's hosts shared by all sources")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dedup", choices=["online", "index", "offline"], default="online",
+                        help="online: Deduplicator; index: with the identity index; offline: OfflineDeduplicator")
+    parser.add_argument("--batch-size", type=int, default=0, help="bulk deduplication batch size (0 = host by host)")
+    parser.add_argument("--normalize-workers", type=int, default=0)
+    parser.add_argument("--compact-transport", action="store_true",
+                        help="return normalization worker results as CompactHost records")
+    parser.add_argument("--fetch-workers", type=int, default=3)
+    parser.add_argument("--prefetch", type=int, default=1, help="skip/limit pages kept in flight per client")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per API request")
+    parser.add_argument("--mongo-uri", default=None, help="benchmark against this MongoDB instead of mongomock")
+    parser.add_argument("--cache-dir", default=None, help="record the served pages here (see --cache-mode)")
+    parser.add_argument("--cache-mode", choices=ResponseCache.MODES, default="record",
+                        help="replay: run from the pages recorded in --cache-dir, without the fake API server")
+    args = parser.parse_args()
+    if args.batch_size and not args.mongo_uri:
+        parser.error("--batch-size needs --mongo-uri: mongomock does not support pymongo 4 bulk operations")
+    if args.cache_mode == "replay" and not args.cache_dir:
+        parser.error("--cache-mode replay needs --cache-dir")
+
+    for count in (int(size) for size in args.sizes.split(",")):
+        report(count, run(count, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of the installed_software merge: cost and $set payload size vs. package count.
+
+Compares Deduplicator._merge_software with the previous merge, which rebuilt and rewrote the whole
+array on every merge. The scenario is a re-scan: the asset already holds N packages reported by
+Qualys and CrowdStrike, and CrowdStrike reports them again with about 1% of the packages upgraded.
+
+Usage:
+    PYTHONPATH=. python benchmarks/software_merge_benchmark.py [package counts...]
+"""
+import copy
+import sys
+import timeit
+from typing import Any, Dict, List
+
+import bson
+
+from src.deduplication.deduplicator import Deduplicator
+from src.models.unified_host import Software
+
+SOURCE = "CrowdStrike"
+
+
+def legacy_merge_software(incoming_source: str, existing_software: List[Dict[str, Any]],
+                          incoming_software: List[Software], set_fields: Dict[str, Any]):
+    # The merge as it was before set-based membership, kept for comparison
+    consolidated_software = [s for s in existing_software if incoming_source not in s.get("sources", [])]
+    software_lookup = {(s.get("vendor"), s.get("product"), s.get("version")): s for s in consolidated_software}
+
+    for sw in incoming_software:
+        key = (sw.vendor, sw.product, sw.version)
+        if key in software_lookup:
+            software_lookup[key]["sources"].append(incoming_source)
+            software_lookup[key]["sources"] = sorted(list(set(software_lookup[key]["sources"])))
+        else:
+            consolidated_software.append(sw.model_dump(exclude_none=True))
+
+    set_fields["installed_software"] = consolidated_software
+
+
+def build_scenario(packages: int):
+    existing = [
+        {"vendor": f"vendor{i % 50}", "product": f"product{i}", "version": "1.0", "sources": ["CrowdStrike", "Qualys"]}
+        for i in range(packages)
+    ]
+    upgraded = set(range(0, packages, 100))
+    incoming = [
+        Software(vendor=f"vendor{i % 50}", product=f"product{i}", version="1.1" if i in upgraded else "1.0",
+                 sources=[SOURCE])
+        for i in range(packages)
+    ]
+    return existing, incoming
+
+
+def measure(merge, packages: int, repeat: int, dumped: bool = False) -> Dict[str, float]:
+    existing, incoming = build_scenario(packages)
+    if dumped:
+        # The deduplicator merges the software of the host it already dumped
+        incoming = [sw.model_dump() for sw in incoming]
+    copies = [copy.deepcopy(existing) for _ in range(repeat)]
+    remaining = iter(copies)
+
+    def run():
+        merge(SOURCE, next(remaining), incoming, {})
+
+    seconds = timeit.timeit(run, number=repeat) / repeat
+    set_fields = {}
+    merge(SOURCE, copy.deepcopy(existing), incoming, set_fields)
+    return {"ms": seconds * 1000, "payload_bytes": len(bson.encode(set_fields))}
+
+
+def main(package_counts: List[int]):
+    print(f"{'packages':>9} | {'legacy ms':>10} {'legacy bytes':>13} | {'set-based ms':>12} {'set-based bytes':>15}")
+    for packages in package_counts:
+        repeat = max(3, 20000 // packages)
+        legacy = measure(legacy_merge_software, packages, repeat)
+        current = measure(Deduplicator._merge_software, packages, repeat, dumped=True)
+        print(f"{packages:>9} | {legacy['ms']:>10.3f} {legacy['payload_bytes']:>13} | "
+              f"{current['ms']:>12.3f} {current['payload_bytes']:>15}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 5000, 20000])
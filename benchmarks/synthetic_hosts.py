@@ -0,0 +1,219 @@
+"""
+Seeded generator of raw host payloads shaped like the Qualys, CrowdStrike and Tenable API responses.
+
+Host i gets the same MAC address, hostname and EC2 instance id in every source, so the three
+payloads for one index deduplicate into a single asset. `overlap` is the fraction of each source's
+hosts that belong to that shared fleet (a float for every source, or a dict per source); the rest
+are hosts only that source reports, so the fleet has expected_assets(count, overlap) assets.
+
+Usage:
+    qualys_hosts = qualys_hosts(1000, seed=1)
+    payloads = synthetic_payloads(1000, seed=1)  # {"Qualys": [...], "CrowdStrike": [...], "Tenable": [...]}
+    payloads = synthetic_payloads(1000, seed=1, overlap={"Qualys": 1.0, "CrowdStrike": 0.5, "Tenable": 0.8})
+    fleet = synthetic_fleet(1_000_000, seed=1)  # same, generated lazily host by host
+"""
+import random
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+OS_STRINGS = [
+    "Linux Kernel 4.14.355-275.582.amzn2.x86_64 on Amazon Linux 2",
+    "Linux Kernel 5.10.0-28-cloud-amd64 on Debian 11",
+    "Microsoft Windows Server 2019 Datacenter",
+    "Linux Kernel 5.15.0-1051-aws on Ubuntu 22.04",
+]
+
+
+def _mac(i: int, separator: str = ":") -> str:
+    return separator.join(["02", "00", "00", f"{i >> 16 & 255:02x}", f"{i >> 8 & 255:02x}", f"{i & 255:02x}"])
+
+
+def _private_ip(i: int) -> str:
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def _public_ip(i: int) -> str:
+    return f"3.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def _date(rng: random.Random) -> str:
+    return f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z"
+
+
+def qualys_host(i: int, rng: random.Random, software_count: int = 40) -> Dict[str, Any]:
+    return {
+        "id": 100000 + i,
+        "name": f"host-{i}",
+        "os": "Amazon Linux 2",
+        "address": _private_ip(i),
+        "manufacturer": "Xen",
+        "model": "HVM domU",
+        "totalMemory": rng.choice([1024, 2048, 4096, 8192]),
+        "lastSystemBoot": _date(rng),
+        "cloudProvider": "AWS",
+        "agentInfo": {"agentVersion": "6.1.0.28", "platform": "Linux", "lastCheckedIn": {"$date": _date(rng)}},
+        "lastVulnScan": {"$date": _date(rng)},
+        "sourceInfo": {"list": [
+            {"AssetSource": {}},
+            {"Ec2AssetSourceSimple": {
+                "instanceId": f"i-{i:017x}", "instanceType": "t3.micro", "accountId": "123456789012",
+                "region": "us-east-1", "availabilityZone": "us-east-1a", "imageId": "ami-0abcdef",
+                "vpcId": "vpc-1", "subnetId": "subnet-1", "publicIpAddress": _public_ip(i),
+            }},
+        ]},
+        "networkInterface": {"list": [
+            {"HostAssetInterface": {"macAddress": _mac(i), "address": _private_ip(i), "gatewayAddress": "10.0.0.1"}},
+            {"HostAssetInterface": {"macAddress": _mac(i), "address": f"fe80::{i & 0xffff:x}"}},
+            {"HostAssetInterface": {"address": _public_ip(i)}},
+        ]},
+        "processor": {"list": [{"HostAssetProcessor": {"name": "Intel(R) Xeon(R) CPU E5-2686 v4 @ 2.30GHz"}}]},
+        "vuln": {"list": [{"HostAssetVuln": {"qid": qid}} for qid in rng.sample(range(10000, 400000), 15)]},
+        "openPort": {"list": [{"HostAssetOpenPort": {"port": port, "protocol": "TCP"}} for port in (22, 80, 443)]},
+        "software": {"list": [
+            {"HostAssetSoftware": {"name": f"package-{j}", "version": f"1.{rng.randint(0, 3)}.0"}}
+            for j in range(software_count)
+        ]},
+    }
+
+
+def crowdstrike_host(i: int, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "device_id": f"{i:032x}",
+        "hostname": f"host-{i}",
+        "mac_address": _mac(i, "-"),
+        "local_ip": _private_ip(i),
+        "external_ip": _public_ip(i),
+        "default_gateway_ip": "10.0.0.1",
+        "instance_id": f"i-{i:017x}",
+        "service_provider": "AWS_EC2_V2",
+        "service_provider_account_id": "123456789012",
+        "zone_group": "us-east-1a",
+        "platform_name": "Linux",
+        "os_version": "Amazon Linux 2",
+        "kernel_version": "4.14.355-275.582.amzn2.x86_64",
+        "system_manufacturer": "Xen",
+        "system_product_name": "HVM domU",
+        "agent_version": "7.10.17706.0",
+        "status": "normal",
+        "first_seen": _date(rng),
+        "last_seen": _date(rng),
+        "device_policies": {
+            "prevention": {"policy_id": "prevention-1"},
+            "sensor_update": {"policy_id": "sensor-1"},
+            "firewall": {"policy_id": None},
+        },
+    }
+
+
+def tenable_host(i: int, rng: random.Random, software_count: int = 120) -> Dict[str, Any]:
+    return {
+        "id": f"{i:08x}-0000-0000-0000-000000000000",
+        "host_name": f"host-{i}",
+        "operating_systems": [rng.choice(OS_STRINGS)],
+        "display_mac_address": _mac(i),
+        "mac_addresses": [_mac(i)],
+        "ipv4_addresses": [_private_ip(i), _public_ip(i)],
+        "ipv6_addresses": [f"fe80::{i & 0xffff:x}"],
+        "display_ipv4_address": _public_ip(i),
+        "aws_ec2_instance_id": f"i-{i:017x}",
+        "aws_owner_id": "123456789012",
+        "aws_region": "us-east-1",
+        "aws_availability_zone": "us-east-1a",
+        "aws_ec2_instance_type": "t3.micro",
+        "aws_vpc_id": "vpc-1",
+        "aws_subnet_id": "subnet-1",
+        "has_agent": True,
+        "last_seen": _date(rng),
+        "last_authenticated_scan_time": _date(rng),
+        "vuln_counts": {"critical": rng.randint(0, 5), "high": rng.randint(0, 20)},
+        "tags": [{"id": "tag-1", "category": "environment", "value": "prod", "type": "static"}],
+        "mitigations": [{"id": "mit-1", "vendor_name": "CrowdStrike", "product_name": "Falcon",
+                         "version": "7.10", "form_factor": "agent", "last_Detected": _date(rng)}],
+        "installed_software": [
+            f"cpe:/a:vendor{j % 25}:package-{j}:1.{rng.randint(0, 3)}.0" for j in range(software_count)
+        ],
+    }
+
+
+SOURCE_FACTORIES: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "Qualys": qualys_host,
+    "CrowdStrike": crowdstrike_host,
+    "Tenable": tenable_host,
+}
+
+Overlap = Union[float, Dict[str, float]]
+
+
+def _shared_count(source: str, count: int, overlap: Overlap) -> int:
+    ratio = overlap.get(source, 1.0) if isinstance(overlap, dict) else overlap
+    return int(round(count * min(max(ratio, 0.0), 1.0)))
+
+
+def host_index(source: str, position: int, count: int, overlap: Overlap = 1.0) -> int:
+    """Fleet index of a source's position-th host: shared hosts first, then hosts unique to the source."""
+    if position < _shared_count(source, count, overlap):
+        return position
+    return count * (1 + list(SOURCE_FACTORIES).index(source)) + position
+
+
+def expected_assets(count: int, overlap: Overlap = 1.0) -> int:
+    """Distinct assets the payloads of synthetic_payloads/synthetic_fleet deduplicate into."""
+    shared = max(_shared_count(source, count, overlap) for source in SOURCE_FACTORIES)
+    return shared + sum(count - _shared_count(source, count, overlap) for source in SOURCE_FACTORIES)
+
+
+def qualys_hosts(count: int, seed: int = 0, overlap: Overlap = 1.0, **kwargs) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [qualys_host(host_index("Qualys", i, count, overlap), rng, **kwargs) for i in range(count)]
+
+
+def crowdstrike_hosts(count: int, seed: int = 0, overlap: Overlap = 1.0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [crowdstrike_host(host_index("CrowdStrike", i, count, overlap), rng) for i in range(count)]
+
+
+def tenable_hosts(count: int, seed: int = 0, overlap: Overlap = 1.0, **kwargs) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [tenable_host(host_index("Tenable", i, count, overlap), rng, **kwargs) for i in range(count)]
+
+
+def synthetic_payloads(count: int, seed: int = 0, overlap: Overlap = 1.0) -> Dict[str, List[Dict[str, Any]]]:
+    return {
+        "Qualys": qualys_hosts(count, seed, overlap),
+        "CrowdStrike": crowdstrike_hosts(count, seed, overlap),
+        "Tenable": tenable_hosts(count, seed, overlap),
+    }
+
+
+class SyntheticSource(Sequence):
+    """
+    One source's payloads as a read-only sequence that builds each host on access, so fleets of
+    millions of hosts can be served page by page without being held in memory. Every host has its
+    own seeded random generator: the same (seed, source, position) always yields the same payload.
+    """
+
+    def __init__(self, source: str, count: int, seed: int = 0, overlap: Overlap = 1.0, **kwargs):
+        self.source = source
+        self.count = count
+        self.seed = seed
+        self.overlap = overlap
+        self.kwargs = kwargs
+        self._factory = SOURCE_FACTORIES[source]
+        self._salt = list(SOURCE_FACTORIES).index(source)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self.count))]
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        rng = random.Random((self.seed * 4 + self._salt) * 10_000_019 + position)
+        return self._factory(host_index(self.source, position, self.count, self.overlap), rng, **self.kwargs)
+
+
+def synthetic_fleet(count: int, seed: int = 0, overlap: Overlap = 1.0) -> Dict[str, SyntheticSource]:
+    """Lazy counterpart of synthetic_payloads, for fleets too large to generate up front."""
+    return {source: SyntheticSource(source, count, seed, overlap) for source in SOURCE_FACTORIES}
@@ -2,25 +2,78 @@ import os
 from pymongo import MongoClient
 from src.api_clients.crowdstrike_client import CrowdStrikeApiClient
 from src.api_clients.qualys_client import QualysApiClient
+from src.api_clients.response_cache import ResponseCache
 from src.api_clients.tenable_client import TenableApiClient
 
 from src.normalization.host_normalizer import HostNormalizer
 from src.deduplication.deduplicator import Deduplicator
+from src.deduplication.offline_deduplicator import OfflineDeduplicator
 from src.analysis.visualizer import AssetVisualizer
+from src.pipeline.concurrent_pipeline import ConcurrentPipeline
+from src.pipeline.incremental_sync import IncrementalSync
+from src.pipeline.metrics import PIPELINE_METRICS, MongoCommandMetrics
+from src.pipeline.parallel_normalizer import ParallelNormalizer
 
-def process_source(client, source, deduplicator):
+# "concurrent" fetches all sources at once, "serial" processes them one after another
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "serial")
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "3"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "0"))
+# 0 upserts host by host; otherwise hosts are deduplicated with bulk writes in batches of this size
+DEDUP_BATCH_SIZE = int(os.getenv("DEDUP_BATCH_SIZE", "0"))
+DEDUP_IDENTITY_INDEX = os.getenv("DEDUP_IDENTITY_INDEX", "0") == "1"
+# "online" merges into MongoDB host by host; "offline" merges in memory and swaps in the result (full re-sync)
+DEDUP_MODE = os.getenv("DEDUP_MODE", "online")
+# Normalize hosts in this many worker processes (0 = in the pipeline thread), in chunks of NORMALIZE_CHUNK_SIZE
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", "0"))
+NORMALIZE_CHUNK_SIZE = int(os.getenv("NORMALIZE_CHUNK_SIZE", "200"))
+# 1 sends worker results back as CompactHost records: less memory between the stages, more CPU per host
+NORMALIZE_COMPACT_TRANSPORT = os.getenv("NORMALIZE_COMPACT_TRANSPORT", "0") == "1"
+# Skip source records that did not change since the last run and resume interrupted runs
+INCREMENTAL_SYNC = os.getenv("INCREMENTAL_SYNC", "0") == "1"
+# Chart output: comma-separated file formats, resolution (0 = figure default) and render processes (0 = in this process)
+CHART_FORMATS = [fmt.strip() for fmt in os.getenv("CHART_FORMATS", "png").split(",") if fmt.strip()]
+CHART_DPI = float(os.getenv("CHART_DPI", "0")) or None
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "0"))
+# Quiet mode drops the per-host and per-page log lines
+PIPELINE_QUIET = os.getenv("PIPELINE_QUIET", "0") == "1"
+# Stage metrics export ("json" or "prometheus"), written after the pipeline when METRICS_FILE is set
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FORMAT = os.getenv("METRICS_FORMAT", "json")
+# Comma-separated stages (fetch, normalize, dedup_find, score, merge, write) to run under cProfile / tracemalloc
+PROFILE_STAGES = [stage.strip() for stage in os.getenv("PROFILE_STAGES", "").split(",") if stage.strip()]
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+TRACE_MEMORY_STAGES = [stage.strip() for stage in os.getenv("TRACE_MEMORY_STAGES", "").split(",") if stage.strip()]
+# Raw API pages are cached on disk when set; "replay" serves only from the cache, without network access
+API_CACHE_DIR = os.getenv("API_CACHE_DIR", "")
+API_CACHE_MODE = os.getenv("API_CACHE_MODE", "record")
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "0"))
+
+def process_source(client, source, deduplicator, batch_size=0):
     print(f"\n--- Processing source: {source} ---")
     host_normalizer = HostNormalizer()
+
+    def normalize(raw_host):
+        with PIPELINE_METRICS.stage("normalize"):
+            return host_normalizer.normalize_host(raw_host, source)
+
+    normalized_hosts = (
+        normalized_host for raw_host in client.fetch_hosts()
+        if (normalized_host := normalize(raw_host))
+    )
     count = 0
-    for raw_host in client.fetch_hosts():
-        normalized_host = host_normalizer.normalize_host(raw_host, source)
-        if normalized_host:
+    if batch_size:
+        stats = deduplicator.upsert_hosts_bulk(normalized_hosts, batch_size=batch_size)
+        count = stats["inserted"] + stats["merged"] + stats["skipped"]
+    else:
+        for normalized_host in normalized_hosts:
             deduplicator.upsert_host(normalized_host)
             count += 1
     print(f"--- Finished {source}. Processed {count} hosts. ---")
 
 def main():
-    mongo_client = MongoClient(os.getenv("MONGO_URI"))
+    PIPELINE_METRICS.configure(verbose=not PIPELINE_QUIET, profile_stages=PROFILE_STAGES,
+                               trace_memory_stages=TRACE_MEMORY_STAGES)
+    mongo_client = MongoClient(os.getenv("MONGO_URI"), event_listeners=[MongoCommandMetrics(PIPELINE_METRICS)])
 
     try:
         mongo_client.admin.command('ping')
@@ -30,20 +83,63 @@ def main():
 
     db = mongo_client["asset_inventory"]
 
-    deduplicator = Deduplicator(db)
+    if DEDUP_MODE == "offline":
+        deduplicator = OfflineDeduplicator(db)
+    else:
+        deduplicator = Deduplicator(db, use_identity_index=DEDUP_IDENTITY_INDEX)
+
+    response_cache = None
+    if API_CACHE_DIR:
+        response_cache = ResponseCache(API_CACHE_DIR, mode=API_CACHE_MODE, ttl=API_CACHE_TTL)
+        print(f"API response cache: {API_CACHE_DIR} ({API_CACHE_MODE} mode), "
+              f"{response_cache.evict_expired()} expired pages evicted.")
+
+    qualys_client = QualysApiClient(response_cache=response_cache)
+    crowdstrike_client = CrowdStrikeApiClient(response_cache=response_cache)
+    tenable_client = TenableApiClient(response_cache=response_cache)
+
+    # Merge order matters for deduplication, so it is the same in both modes
+    sources = [
+        (qualys_client, "Qualys"),
+        (crowdstrike_client, "CrowdStrike"),
+        (tenable_client, "Tenable"),
+    ]
+
+    sync = None
+    if INCREMENTAL_SYNC:
+        if isinstance(deduplicator, OfflineDeduplicator):
+            # The offline load replaces the whole collection, so unchanged hosts cannot be skipped
+            print("Incremental sync is ignored in offline deduplication mode.")
+        else:
+            sync = IncrementalSync(db)
 
-    qualys_client = QualysApiClient()
-    crowdstrike_client = CrowdStrikeApiClient()
-    tenable_client = TenableApiClient()
+    print(f"\n--- Starting the Pipeline ({PIPELINE_MODE} mode). ---")
+    if PIPELINE_MODE == "concurrent" or sync or NORMALIZE_WORKERS:
+        workers = PIPELINE_WORKERS if PIPELINE_MODE == "concurrent" else 1
+        normalizer = ParallelNormalizer(workers=NORMALIZE_WORKERS, chunk_size=NORMALIZE_CHUNK_SIZE,
+                                        compact=NORMALIZE_COMPACT_TRANSPORT)
+        pipeline = ConcurrentPipeline(deduplicator, max_workers=workers, queue_size=PIPELINE_QUEUE_SIZE,
+                                      batch_size=DEDUP_BATCH_SIZE, sync=sync, normalizer=normalizer)
+        pipeline.run(sources)
+    else:
+        for client, source in sources:
+            process_source(client, source, deduplicator, batch_size=DEDUP_BATCH_SIZE)
+        print(f"Parse cache stats: {HostNormalizer.cache_stats()}")
 
-    print("\n--- Starting the Pipeline. ---")
-    process_source(qualys_client, "Qualys", deduplicator)
-    process_source(crowdstrike_client, "CrowdStrike", deduplicator)
-    process_source(tenable_client, "Tenable", deduplicator)
+    if isinstance(deduplicator, OfflineDeduplicator):
+        print(f"Offline deduplication memory usage: {deduplicator.memory_usage()}")
+        deduplicator.load()
+    print(f"Merge stats: {deduplicator.merge_stats}")
+    print(f"Stage metrics: {PIPELINE_METRICS.stage_summary()}")
+    if METRICS_FILE:
+        PIPELINE_METRICS.write(METRICS_FILE, METRICS_FORMAT)
+        print(f"Metrics written to {METRICS_FILE} ({METRICS_FORMAT}).")
+    if PROFILE_STAGES:
+        print(f"Stage profiles written: {PIPELINE_METRICS.dump_profiles(PROFILE_DIR)}")
     print("\n--- Pipeline Complete. Data has been fetched, normalized, and merged in MongoDB. ---")
 
     print("\n--- Visualizing process. ---")
-    visualizer = AssetVisualizer(db)
+    visualizer = AssetVisualizer(db, formats=CHART_FORMATS, dpi=CHART_DPI, render_workers=CHART_RENDER_WORKERS)
     visualizer.run_analysis()
 
 if __name__ == "__main__":
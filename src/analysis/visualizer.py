@@ -1,161 +1,362 @@
+import hashlib
+import json
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
 import seaborn as sns
-from pandas import Timestamp
-from pandas._libs import NaTType
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from pymongo.database import Database
 from datetime import datetime, timedelta, timezone
 
 
+# Charts are drawn on standalone Agg figures, without pyplot's global state, so they can be
+# rendered concurrently in worker processes
+
+def _new_figure(figsize: Tuple[float, float]) -> Figure:
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _style_axes(figure: Figure, ax, title: str, xlabel: str, ylabel: str):
+    ax.set_title(title, fontsize=16, weight='bold')
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.set_ylabel(ylabel, fontsize=12)
+    ax.tick_params(axis='both', labelsize=10)
+    figure.tight_layout()
+
+
+def _render_os_distribution(os_counts: pd.Series) -> Figure:
+    figure = _new_figure((12, 8))
+    ax = figure.subplots()
+    # Bars by count, colors in the order the platforms first appear, as countplot over the hosts did
+    order = os_counts.sort_values(ascending=False).index
+    sns.barplot(x=os_counts.values, y=os_counts.index, order=order, palette="viridis", hue=os_counts.index,
+                hue_order=os_counts.index, legend=False, ax=ax)
+    _style_axes(figure, ax, 'Distribution of Hosts by Operating System', 'Number of Hosts', 'Operating System')
+    return figure
+
+
+def _render_host_activity(activity_counts: pd.Series, labels: List[str], start_date: datetime) -> Figure:
+    figure = _new_figure((8, 6))
+    ax = figure.subplots()
+    sns.barplot(x=activity_counts.index, y=activity_counts.values, order=labels, palette="coolwarm",
+                hue=activity_counts.index, hue_order=activity_counts.index, legend=False, ax=ax)
+    _style_axes(figure, ax, f'Host Activity: Active vs. Stale. Current date: {start_date.date()}',
+                'Activity Status', 'Number of Hosts')
+    return figure
+
+
+def _render_network_segments(top_networks: pd.Series) -> Figure:
+    figure = _new_figure((12, 8))
+    ax = figure.subplots()
+    sns.barplot(x=top_networks.values, y=top_networks.index, palette='plasma', hue=top_networks.index, legend=False, ax=ax)
+
+    # Ensure integer ticks on the x-axis for clarity
+    max_count = top_networks.max()
+    if max_count < 10:
+        ax.set_xticks(range(int(max_count) + 2))
+
+    _style_axes(figure, ax, 'Host Count by Network Segment (Top 5)', 'Number of Hosts', 'Default Gateway IP')
+    return figure
+
+
+CHART_RENDERERS: Dict[str, Callable[..., Figure]] = {
+    "os_distribution": _render_os_distribution,
+    "host_activity": _render_host_activity,
+    "network_segment_distribution": _render_network_segments,
+}
+
+
+def _init_render_worker():
+    matplotlib.use("Agg")
+
+
+def _render_chart(name: str, data: Tuple[Any, ...], paths: List[str], dpi: Optional[float]) -> List[str]:
+    figure = CHART_RENDERERS[name](*data)
+    for path in paths:
+        figure.savefig(path, dpi=dpi or 'figure')
+    return paths
+
+
+def _data_hash(data: Tuple[Any, ...], formats: Iterable[str], dpi: Optional[float]) -> str:
+    # Hash of a chart's aggregated input and the render settings
+    def plain(value: Any) -> Any:
+        if isinstance(value, pd.Series):
+            return [[str(key), int(count)] for key, count in value.items()]
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+    payload = json.dumps({"data": [plain(value) for value in data], "formats": list(formats), "dpi": dpi})
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
 class AssetVisualizer:
     OUTPUT_DIR = "visualizations"
-
-    def __init__(self, db: Database):
+    # Documents per cursor batch and per DataFrame chunk
+    LOAD_BATCH_SIZE = 10000
+    # DataFrame column -> document field; only these fields are read from MongoDB
+    COLUMNS = {
+        "os_platform": "os_platform",
+        "default_gateway": "default_gateway",
+        "qualys_last_checked_in": "qualys_security.last_checked_in",
+        "crowdstrike_last_seen": "crowdstrike_security.last_seen",
+        "tenable_last_authenticated_scan_time": "tenable_security.last_authenticated_scan_time",
+    }
+    # Per-source seen timestamps; the latest one is a host's last_seen
+    SEEN_COLUMNS = ("qualys_last_checked_in", "crowdstrike_last_seen", "tenable_last_authenticated_scan_time")
+    ACTIVE_LABEL = 'Active (<=30 days)'
+    STALE_LABEL = 'Stale (>30 days)'
+
+    # Chart name -> data hash of the last render, kept in OUTPUT_DIR
+    RENDER_MANIFEST = ".chart_hashes.json"
+
+    def __init__(self, db: Database, formats: Iterable[str] = ("png",), dpi: Optional[float] = None,
+                 render_workers: int = 0):
+        """
+        formats: file formats every chart is saved in (any format matplotlib's savefig supports).
+        dpi: resolution of the saved charts; None keeps the figure's default.
+        render_workers: render the charts in this many worker processes (0 = in this process).
+        """
         self.collection = db["unified_assets"]
+        self.formats = tuple(formats)
+        self.dpi = dpi
+        self.render_workers = render_workers
         if not os.path.exists(self.OUTPUT_DIR):
             os.makedirs(self.OUTPUT_DIR)
         print(f"Visualizations will be saved to the '{self.OUTPUT_DIR}/' directory.")
 
-    def _get_latest_seen_timestamp(self, doc: dict) -> Timestamp | NaTType:
-        qualys_sec = doc.get('qualys_security', {})
-        crowdstrike_sec = doc.get('crowdstrike_security', {})
-
-        qualys_seen = qualys_sec.get('last_checked_in') if qualys_sec else None
-        crowdstrike_seen = crowdstrike_sec.get('last_seen') if crowdstrike_sec else None
-
-        # Convert string dates to datetime objects
-        ts_qualys = pd.to_datetime(qualys_seen, errors='coerce', utc=True)
-        ts_crowdstrike = pd.to_datetime(crowdstrike_seen, errors='coerce', utc=True)
+    @staticmethod
+    def _get_path(doc: dict, path: str):
+        value = doc
+        for key in path.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    @staticmethod
+    def _activity_window() -> tuple[datetime, datetime]:
+        # Define the threshold for what is considered "stale"
+        #start_date = datetime.now(timezone.utc)
+        # thirty_days_ago = start_date - timedelta(days=30) # From now
 
-        # Return most recent valid timestamp
-        if pd.notna(ts_qualys) and pd.notna(ts_crowdstrike):
-            return max(ts_qualys, ts_crowdstrike)
-        elif pd.notna(ts_qualys):
-            return ts_qualys
-        elif pd.notna(ts_crowdstrike):
-            return ts_crowdstrike
-        else:
-            return pd.NaT
+        start_date = datetime.strptime('2023-07-27', '%Y-%m-%d').replace(tzinfo=timezone.utc) # From 2023-07-27
+        thirty_days_ago = start_date - timedelta(days=30)
+        return start_date, thirty_days_ago
+
+    @staticmethod
+    def _to_timestamps(values: pd.Series) -> pd.Series:
+        # One vectorized ISO 8601 parse per column; the few values in other formats fall back to
+        # per-value format inference, which is what a scalar pd.to_datetime call would do
+        timestamps = pd.to_datetime(values, errors='coerce', utc=True, format='ISO8601')
+        retry = timestamps.isna() & values.notna()
+        if retry.any():
+            timestamps[retry] = pd.to_datetime(values[retry], errors='coerce', utc=True, format='mixed')
+        return timestamps
+
+    def _latest_seen(self, df: pd.DataFrame) -> pd.Series:
+        # Most recent valid timestamp across the sources; NaT when no source has one
+        seen = pd.concat([self._to_timestamps(df[column]) for column in self.SEEN_COLUMNS], axis=1)
+        return seen.max(axis=1)
+
+    def _load_columns(self) -> pd.DataFrame:
+        # Projected cursor read into flat columns, one DataFrame chunk per LOAD_BATCH_SIZE documents,
+        # so no full documents (software inventories etc.) are ever held in memory
+        projection = {path: 1 for path in self.COLUMNS.values()}
+        projection["_id"] = 0
+        cursor = self.collection.find({}, projection).batch_size(self.LOAD_BATCH_SIZE)
+
+        chunks = []
+        columns = {column: [] for column in self.COLUMNS}
+        rows = 0
+        for doc in cursor:
+            for column, path in self.COLUMNS.items():
+                columns[column].append(self._get_path(doc, path))
+            rows += 1
+            if rows == self.LOAD_BATCH_SIZE:
+                chunks.append(pd.DataFrame(columns))
+                columns = {column: [] for column in self.COLUMNS}
+                rows = 0
+        if rows:
+            chunks.append(pd.DataFrame(columns))
+
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
 
     def fetch_and_prepare_data(self) -> pd.DataFrame:
         print("Fetching and preparing data from MongoDB...")
-        all_hosts = list(self.collection.find({}))
-        if not all_hosts:
+        df = self._load_columns()
+        if df.empty:
             print("Warning: No data found in the 'unified_assets' collection.")
             return pd.DataFrame()
 
-        df = pd.DataFrame(all_hosts)
-
-        df['last_seen'] = df.apply(self._get_latest_seen_timestamp, axis=1)
+        df['last_seen'] = self._latest_seen(df)
+        _, thirty_days_ago = self._activity_window()
+        # NaT compares False, so hosts never seen count as active, as in the activity chart
+        df['activity_status'] = np.where(df['last_seen'] < thirty_days_ago, self.STALE_LABEL, self.ACTIVE_LABEL)
 
         print(f"Successfully loaded {len(df)} hosts into DataFrame.")
         return df
 
-    def generate_os_distribution_chart(self, df: pd.DataFrame):
-        if 'os_platform' not in df or df['os_platform'].isnull().all():
+    def count_by(self, field: str) -> pd.Series:
+        """
+        Hosts per non-null value of `field` computed by MongoDB, in the order the values first appear
+        (lowest _id). sort_values(ascending=False) on the result orders it exactly like value_counts().
+        """
+        pipeline = [
+            {"$match": {field: {"$ne": None}}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}, "first_id": {"$min": "$_id"}}},
+            {"$sort": {"first_id": 1}},
+        ]
+        rows = list(self.collection.aggregate(pipeline))
+        return pd.Series([row["count"] for row in rows], index=pd.Index([row["_id"] for row in rows], name=field),
+                         name="count", dtype="int64")
+
+    def count_activity(self, thirty_days_ago: datetime) -> tuple[pd.Series, int]:
+        """
+        Active/stale host counts computed by MongoDB, in the order the statuses first appear, together
+        with the number of hosts that have any seen timestamp. A host is stale when its latest seen
+        timestamp is before thirty_days_ago; hosts without one count as active.
+        """
+        seen = [
+            {"$convert": {"input": f"${self.COLUMNS[column]}", "to": "date", "onError": None, "onNull": None}}
+            for column in self.SEEN_COLUMNS
+        ]
+        pipeline = [
+            {"$project": {"last_seen": {"$max": seen}}},
+            {"$group": {
+                "_id": {"$cond": [
+                    {"$and": [{"$ne": ["$last_seen", None]}, {"$lt": ["$last_seen", thirty_days_ago]}]},
+                    self.STALE_LABEL,
+                    self.ACTIVE_LABEL,
+                ]},
+                "count": {"$sum": 1},
+                "seen": {"$sum": {"$cond": [{"$ne": ["$last_seen", None]}, 1, 0]}},
+                "first_id": {"$min": "$_id"},
+            }},
+            {"$sort": {"first_id": 1}},
+        ]
+        rows = list(self.collection.aggregate(pipeline))
+        counts = pd.Series([row["count"] for row in rows], index=[row["_id"] for row in rows], dtype="int64")
+        return counts, sum(row["seen"] for row in rows)
+
+    def _os_distribution_data(self) -> Optional[Tuple[Any, ...]]:
+        os_counts = self.count_by("os_platform")
+        if os_counts.empty:
             print("Skipping OS distribution chart: 'os_platform' column is missing or empty.")
-            return
+            return None
 
         print("Generating OS distribution chart...")
-        plt.figure(figsize=(12, 8))
-
-        sns.countplot(y=df['os_platform'], order=df['os_platform'].value_counts().index, palette="viridis", hue=df['os_platform'], legend=False)
+        return (os_counts,)
 
-        plt.title('Distribution of Hosts by Operating System', fontsize=16, weight='bold')
-        plt.xlabel('Number of Hosts', fontsize=12)
-        plt.ylabel('Operating System', fontsize=12)
-        plt.xticks(fontsize=10)
-        plt.yticks(fontsize=10)
-        plt.tight_layout()
+    def _host_activity_data(self) -> Optional[Tuple[Any, ...]]:
+        start_date, thirty_days_ago = self._activity_window()
 
-        save_path = os.path.join(self.OUTPUT_DIR, "os_distribution.png")
-        plt.savefig(save_path)
-        plt.close()
-        print(f"Chart saved to: {save_path}")
-
-    def generate_host_activity_chart(self, df: pd.DataFrame):
-        if 'last_seen' not in df or df['last_seen'].isnull().all():
+        # Categorize hosts
+        activity_counts, hosts_seen = self.count_activity(thirty_days_ago)
+        if not hosts_seen:
             print("Skipping host activity chart: 'last_seen' column is missing or empty.")
-            return
+            return None
 
         print("Generating host activity chart (Active vs. Stale)...")
+        return activity_counts, [self.ACTIVE_LABEL, self.STALE_LABEL], start_date
 
-
-        # Define the threshold for what is considered "stale"
-        #start_date = datetime.now(timezone.utc)
-        # thirty_days_ago = start_date - timedelta(days=30) # From now
-
-        start_date = datetime.strptime('2023-07-27', '%Y-%m-%d').replace(tzinfo=timezone.utc) # From 2023-07-27
-        thirty_days_ago = start_date - timedelta(days=30)
-
-        # Categorize hosts
-        df['activity_status'] = df['last_seen'].apply(
-            lambda ts: 'Stale (>30 days)' if pd.notna(ts) and ts < thirty_days_ago else 'Active (<=30 days)'
-        )
-
-        plt.figure(figsize=(8, 6))
-        sns.countplot(x=df['activity_status'], order=['Active (<=30 days)', 'Stale (>30 days)'], palette="coolwarm", hue=df['activity_status'], legend=False)
-
-        plt.title(f'Host Activity: Active vs. Stale. Current date: {start_date.date()}', fontsize=16, weight='bold')
-        plt.xlabel('Activity Status', fontsize=12)
-        plt.ylabel('Number of Hosts', fontsize=12)
-        plt.xticks(fontsize=10)
-        plt.yticks(fontsize=10)
-        plt.tight_layout()
-
-        save_path = os.path.join(self.OUTPUT_DIR, "host_activity.png")
-        plt.savefig(save_path)
-        plt.close()
-        print(f"Chart saved to: {save_path}")
-
-    def generate_network_segment_chart(self, df: pd.DataFrame):
-        if 'default_gateway' not in df or df['default_gateway'].isnull().all():
+    def _network_segment_data(self) -> Optional[Tuple[Any, ...]]:
+        # Count hosts per gateway, dropping nulls
+        gateway_counts = self.count_by("default_gateway").sort_values(ascending=False)
+        if gateway_counts.empty:
             print("Skipping network segment chart: 'default_gateway' column is missing or empty.")
-            return
+            return None
 
         print("Generating host count by network segment chart...")
 
-        # Count hosts per gateway, dropping nulls
-        gateway_counts = df.dropna(subset=['default_gateway'])['default_gateway'].value_counts()
-
         # Adjust number to filter for networks with more than some device number in a network
         significant_networks = gateway_counts[gateway_counts >= 1]
 
         if significant_networks.empty:
             print("No significant network segments (more than 1 host per gateway) found to visualize.")
-            return
+            return None
 
         # Plot the top 5 largest networks
-        top_networks = significant_networks.head(5).sort_values(ascending=True)
-
-        plt.figure(figsize=(12, 8))
-
-        ax = sns.barplot(x=top_networks.values, y=top_networks.index, palette='plasma', hue=top_networks.index, legend=False)
+        return (significant_networks.head(5).sort_values(ascending=True),)
+
+    def _chart_paths(self, name: str) -> List[str]:
+        return [os.path.join(self.OUTPUT_DIR, f"{name}.{extension}") for extension in self.formats]
+
+    def _read_manifest(self) -> Dict[str, str]:
+        try:
+            with open(os.path.join(self.OUTPUT_DIR, self.RENDER_MANIFEST)) as manifest:
+                return json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, hashes: Dict[str, str]):
+        with open(os.path.join(self.OUTPUT_DIR, self.RENDER_MANIFEST), "w") as manifest:
+            json.dump(hashes, manifest, indent=2, sort_keys=True)
+
+    def generate_charts(self, names: Iterable[str]):
+        """
+        Aggregates and renders the named charts (keys of CHART_RENDERERS). A chart whose aggregated
+        data and render settings hash the same as on the last run, and whose files all exist, is not
+        rendered again.
+        """
+        loaders = {
+            "os_distribution": self._os_distribution_data,
+            "host_activity": self._host_activity_data,
+            "network_segment_distribution": self._network_segment_data,
+        }
+        hashes = self._read_manifest()
+        pending = []
+        for name in names:
+            data = loaders[name]()
+            if data is None:
+                continue
+            paths = self._chart_paths(name)
+            data_hash = _data_hash(data, self.formats, self.dpi)
+            if hashes.get(name) == data_hash and all(os.path.exists(path) for path in paths):
+                print(f"Chart unchanged, skipping: {', '.join(paths)}")
+                continue
+            hashes[name] = data_hash
+            pending.append((name, data, paths))
+
+        if self.render_workers > 0 and len(pending) > 1:
+            # spawn, like the normalization workers: nothing of this process' matplotlib state is inherited
+            with ProcessPoolExecutor(max_workers=min(self.render_workers, len(pending)), initializer=_init_render_worker,
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                futures = [executor.submit(_render_chart, name, data, paths, self.dpi) for name, data, paths in pending]
+                rendered = [future.result() for future in futures]
+        else:
+            rendered = [_render_chart(name, data, paths, self.dpi) for name, data, paths in pending]
 
-        plt.title('Host Count by Network Segment (Top 5)', fontsize=16, weight='bold')
-        plt.xlabel('Number of Hosts', fontsize=12)
-        plt.ylabel('Default Gateway IP', fontsize=12)
+        for paths in rendered:
+            for save_path in paths:
+                print(f"Chart saved to: {save_path}")
+        if pending:
+            self._write_manifest(hashes)
 
-        # Ensure integer ticks on the x-axis for clarity
-        max_count = top_networks.max()
-        if max_count < 10:
-            ax.set_xticks(range(int(max_count) + 2))
+    def generate_os_distribution_chart(self):
+        self.generate_charts(["os_distribution"])
 
-        plt.tight_layout()
+    def generate_host_activity_chart(self):
+        self.generate_charts(["host_activity"])
 
-        save_path = os.path.join(self.OUTPUT_DIR, "network_segment_distribution.png")
-        plt.savefig(save_path)
-        plt.close()
-        print(f"Chart saved to: {save_path}")
+    def generate_network_segment_chart(self):
+        self.generate_charts(["network_segment_distribution"])
 
     def run_analysis(self):
-        df = self.fetch_and_prepare_data()
-        if df.empty:
+        # The charts are computed from aggregation pipelines; no host documents are loaded here
+        print("Aggregating asset counts in MongoDB...")
+        if self.collection.find_one({}, {"_id": 1}) is None:
+            print("Warning: No data found in the 'unified_assets' collection.")
             return
 
-        self.generate_os_distribution_chart(df)
-        self.generate_host_activity_chart(df)
-        self.generate_network_segment_chart(df)
+        self.generate_charts(CHART_RENDERERS)
         print("\nAnalysis complete.")
-
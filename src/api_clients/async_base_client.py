@@ -0,0 +1,209 @@
+import asyncio
+import httpx
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+from src.api_clients.base_client import EndOfDataError, decode_json, parse_hosts_page
+from src.api_clients.rate_limiter import AdaptiveRateLimiter, RetryPolicy
+
+try:
+    import h2  # noqa: F401 - only needed to negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def create_http_client(max_connections: int = 100, max_keepalive_connections: int = 20,
+                       timeout: float = 30.0) -> httpx.AsyncClient:
+    """
+    Creates a pooled keep-alive client that can be shared by several async API clients,
+    so a single event loop drives all vendors over one connection pool.
+    """
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+        timeout=timeout,
+    )
+
+
+class AsyncBaseApiClient:
+    # values to be overwritten by child classes
+    API_TOKEN: str = ""
+    BASE_URL: str = ""
+    ENDPOINT: str = ""
+    MAX_API_LIMIT: int = 1
+    MAX_API_SKIP: int = 5
+    # Number of page requests in flight at once for one client
+    CONCURRENT_PAGES: int = 8
+    RATE_LIMIT: float = 20.0
+    MAX_RETRIES: int = 5
+
+    END_OF_DATA_ERROR_MESSAGE: str = "Error invalid skip/limit combo (>number of hosts)"
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, base_url: Optional[str] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, retry_policy: Optional[RetryPolicy] = None):
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(rate=self.RATE_LIMIT, max_concurrency=self.CONCURRENT_PAGES)
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=self.MAX_RETRIES)
+        self._owns_client = http_client is None
+        self.client = http_client or create_http_client()
+        self.base_url = base_url or self.BASE_URL
+        self.headers = {
+            "accept": "application/json",
+            "token": self.API_TOKEN or "",
+            "Content-Type": "application/json"
+        }
+
+    async def aclose(self):
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _is_retryable(self, response: httpx.Response) -> bool:
+        if not self.retry_policy.is_retryable_status(response.status_code):
+            return False
+        return self.END_OF_DATA_ERROR_MESSAGE not in response.text
+
+    # Same rate limiting and retry behaviour as BaseApiClient._post, without blocking the event loop
+    async def _post(self, params: Dict[str, Any]) -> httpx.Response:
+        url = f"{self.base_url}{self.ENDPOINT}"
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            # The concurrency cap is the limiter's, so clients sharing a limiter share it too
+            async with self.rate_limiter.async_slot():
+                started_at = time.perf_counter()
+                try:
+                    response = await self.client.post(url, params=params, headers=self.headers)
+                except httpx.TransportError as e:
+                    error = e
+                latency = time.perf_counter() - started_at
+
+            retry_after = None
+            if response is not None:
+                if not self._is_retryable(response):
+                    self.rate_limiter.record_success(latency)
+                    response.raise_for_status()
+                    return response
+                retry_after = self.retry_policy.parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429 or retry_after is not None:
+                    self.rate_limiter.record_throttle(retry_after)
+
+            if attempt >= self.retry_policy.max_retries:
+                if response is not None:
+                    response.raise_for_status()
+                raise error
+
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+            print(f"{self.__class__.__name__}: {reason} on {url} {params}, retry {attempt + 1}/{self.retry_policy.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    # Fetch a batch of hosts (using skip and limit)
+    async def _fetch_page(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        url = f"{self.base_url}{self.ENDPOINT}"
+
+        if not (1 <= limit <= self.MAX_API_LIMIT):
+            raise ValueError(f"Invalid limit parameter: {limit}. Must be between 1 and {self.MAX_API_LIMIT}.")
+
+        if skip > self.MAX_API_SKIP:
+            print(f"Warning: Attempting to fetch with skip={skip} which is beyond the documented MAX_API_SKIP ({self.MAX_API_SKIP}).")
+
+        try:
+            response = await self._post({"skip": skip, "limit": limit})
+            return parse_hosts_page(decode_json(response.content), url)
+
+        except httpx.HTTPStatusError as e:
+            if self.END_OF_DATA_ERROR_MESSAGE in e.response.text:
+                print(f"Detected specific end of data error for {self.__class__.__name__} at skip={skip}, limit={limit}.")
+                raise EndOfDataError(f"API indicated end of data: {e.response.text}")
+            print(f"HTTP Error fetching data from {url} (skip={skip}, limit={limit}): {e}")
+            print(f"Response content: {e.response.text}")
+            raise
+        except httpx.TimeoutException as e:
+            print(f"Timeout Error fetching data from {url} (skip={skip}, limit={limit}): {e}")
+            raise
+        except httpx.TransportError as e:
+            print(f"Connection Error fetching data from {url} (skip={skip}, limit={limit}): {e}")
+            raise
+        except ValueError as e:
+            print(f"API Constraint Violation: {e}")
+            raise
+
+    # Last page is shorter than the limit: shrink the limit until the API accepts it
+    async def _fetch_tail(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        print(f"API returned EndOfDataError with skip={skip}, limit={limit}. Attempting to retry with smaller limits.")
+        for retry_limit in range(limit - 1, 0, -1):
+            try:
+                print(f"Retrying with skip={skip}, limit={retry_limit}")
+                hosts_batch = await self._fetch_page(skip, retry_limit)
+                if hosts_batch:
+                    return hosts_batch
+            except (EndOfDataError, ValueError, httpx.HTTPError) as retry_e:
+                print(f"Retry with skip={skip}, limit={retry_limit} failed: {retry_e}")
+        print(f"No valid smaller limit found for skip={skip}. Stopping data fetching.")
+        return []
+
+    # Main async generator, keeps CONCURRENT_PAGES requests in flight and yields pages in order
+    async def fetch_all_hosts(self, page_limit: Optional[int] = None,
+                              skip: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        actual_limit = page_limit if page_limit is not None else self.MAX_API_LIMIT
+        if not (1 <= actual_limit <= self.MAX_API_LIMIT):
+            raise ValueError(
+                f"Requested page_limit ({page_limit}) is invalid. "
+                f"Must be between 1 and {self.MAX_API_LIMIT} (inclusive)."
+            )
+
+        skip = skip if skip is not None else 0
+        page_skips = iter(range(skip, self.MAX_API_SKIP + 1, actual_limit))
+        in_flight = deque()
+
+        def submit_next_page():
+            next_skip = next(page_skips, None)
+            if next_skip is not None:
+                in_flight.append((next_skip, asyncio.create_task(self._fetch_page(next_skip, actual_limit))))
+
+        for _ in range(max(1, self.CONCURRENT_PAGES)):
+            submit_next_page()
+
+        try:
+            while in_flight:
+                page_skip, task = in_flight.popleft()
+                try:
+                    hosts_batch = await task
+                except EndOfDataError:
+                    for host in await self._fetch_tail(page_skip, actual_limit):
+                        yield host
+                    return
+                except ValueError as e:
+                    print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
+                    return
+                except Exception as e:
+                    print(f"An unexpected error occurred during {self.__class__.__name__} host fetching loop: {e}")
+                    return
+
+                if not hosts_batch:
+                    return
+
+                submit_next_page()
+                for host in hosts_batch:
+                    yield host
+
+            print(f"Reached documented maximum allowed skip ({self.MAX_API_SKIP}). Stopping data fetching for {self.__class__.__name__}.")
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+            # Let cancelled requests unwind so their connections go back to the pool
+            await asyncio.gather(*(task for _, task in in_flight), return_exceptions=True)
+
+    async def fetch_hosts(self, page_limit: Optional[int] = None,
+                          skip: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        async for host in self.fetch_all_hosts(page_limit=page_limit, skip=skip):
+            yield host
@@ -0,0 +1,24 @@
+from src.api_clients.async_base_client import AsyncBaseApiClient
+from src.api_clients.rate_limiter import AdaptiveRateLimiter, RetryPolicy
+from typing import AsyncIterator, Dict, Any, Optional
+import httpx
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+class AsyncQualysApiClient(AsyncBaseApiClient):
+    API_TOKEN: str = os.getenv("API_TOKEN")
+    BASE_URL: str = "https://api.recruiting.app.silk.security"
+    ENDPOINT: str = "/api/qualys/hosts/get"
+    MAX_API_LIMIT: int = 2
+    MAX_API_SKIP: int = 6
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, base_url: Optional[str] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, retry_policy: Optional[RetryPolicy] = None):
+        super().__init__(http_client=http_client, base_url=base_url, rate_limiter=rate_limiter, retry_policy=retry_policy)
+        print("AsyncQualysApiClient initialized.")
+
+    async def fetch_hosts(self, page_limit: Optional[int] = None, skip: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        print(f"Starting to fetch hosts from Qualys (async) with page_limit={page_limit if page_limit is not None else self.MAX_API_LIMIT}...")
+        async for host in self.fetch_all_hosts(page_limit=page_limit, skip=skip):
+            yield host
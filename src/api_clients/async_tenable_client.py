@@ -0,0 +1,81 @@
+from src.api_clients.async_base_client import AsyncBaseApiClient
+from src.api_clients.base_client import decode_json
+from src.api_clients.rate_limiter import AdaptiveRateLimiter, RetryPolicy
+from src.pipeline.metrics import PIPELINE_METRICS
+from typing import AsyncIterator, Dict, Any, Optional, List
+import httpx
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+class AsyncTenableApiClient(AsyncBaseApiClient):
+    API_TOKEN: str = os.getenv("API_TOKEN")
+    BASE_URL: str = "https://api.recruiting.app.silk.security"
+    ENDPOINT: str = "/api/tenable/hosts/get"
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, base_url: Optional[str] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, retry_policy: Optional[RetryPolicy] = None):
+        super().__init__(http_client=http_client, base_url=base_url, rate_limiter=rate_limiter, retry_policy=retry_policy)
+        # Kept per instance so concurrent clients never share pagination state
+        self.cursor: Optional[str] = ''
+        print("AsyncTenableApiClient initialized.")
+
+    async def fetch_hosts(self) -> AsyncIterator[Dict[str, Any]]:
+        print(f"Starting to fetch hosts from Tenable (async)")
+        async for host in self.fetch_all_hosts():
+            yield host
+
+    # The next cursor only arrives with the current page, so pages are fetched one after another
+    async def fetch_all_hosts(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            hosts_batch = []
+            try:
+                if PIPELINE_METRICS.verbose:
+                    print(f"Fetching {self.__class__.__name__} hosts, cursor: {self.cursor}")
+                hosts_batch = await self._fetch_page(cursor=self.cursor)
+
+            except ValueError as e:
+                print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
+                break
+            except Exception as e:
+                print(f"An unexpected error occurred during {self.__class__.__name__} host fetching loop: {e}")
+                break
+
+            if not hosts_batch:
+                break
+
+            for host in hosts_batch:
+                yield host
+
+            if not self.cursor:
+                break
+
+    async def _fetch_page(self, cursor: str) -> List[Dict[str, Any]]:
+        url = f"{self.base_url}{self.ENDPOINT}"
+
+        try:
+            response = await self._post({"cursor": cursor})
+            response_json = decode_json(response.content)
+            hosts = response_json.get("hosts")
+            self.cursor = response_json.get("cursor")
+
+            if isinstance(hosts, list):
+                return hosts
+            else:
+                print(f"Unexpected API response structure for {url}: {response_json}")
+                return []
+
+        except httpx.HTTPStatusError as e:
+            if e.response.text == 'Invalid cursor':
+                print(f"Wrong cursor: {cursor} on {url}: {e}")
+                return []
+            raise
+        except httpx.TimeoutException as e:
+            print(f"Timeout Error fetching data from {url}: {e}")
+            raise
+        except httpx.TransportError as e:
+            print(f"Connection Error fetching data from {url}: {e}")
+            raise
+        except ValueError as e:
+            print(f"API Constraint Violation: {e}")
+            raise
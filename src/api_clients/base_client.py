@@ -1,11 +1,49 @@
+import json
 import requests
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Iterator, Dict, Any, List, Optional
 
+from src.api_clients.json_stream import JsonStreamReader
+from src.api_clients.rate_limiter import AdaptiveRateLimiter, RetryPolicy
+from src.api_clients.response_cache import CacheMissError, ResponseCache
+from src.pipeline.metrics import PIPELINE_METRICS, PipelineMetrics
+
+try:
+    import orjson
+    # Decodes the response bytes directly, several times faster than json.loads
+    decode_json = orjson.loads
+except ImportError:
+    decode_json = json.loads
+
 class EndOfDataError(Exception):
     """Custom exception to signal that the API returned an 'end of data' error."""
     pass
 
+# Turns a decoded skip/limit page into a list of hosts, raising ValueError for API constraint errors
+def parse_hosts_page(response_json: Any, url: str) -> List[Dict[str, Any]]:
+    if isinstance(response_json, dict) and response_json.get("error"):
+        error_details = response_json["error"]
+        if isinstance(error_details, list):
+            for err in error_details:
+                error_code = err.get("code", "")
+                error_message = err.get("message", "")
+                print(f"API Error Response: Code={error_code}, Message={error_message}, Details={err}")
+                if "too_big" in error_code and "maximum" in err:
+                    raise ValueError(f"API returned 'limit too big' error: Max limit is {err['maximum']}.")
+                elif "Number must be less than or equal to" in error_message:
+                    raise ValueError(f"API returned parameter validation error: {error_message}.")
+        print(f"API Error: {response_json.get('error')}")
+        raise ValueError(f"API returned a general error: {response_json}")
+
+    if isinstance(response_json, list):
+        return response_json
+    else:
+        print(f"Unexpected API response structure for {url}: {response_json}")
+        return []
+
 class BaseApiClient:
     # values to be overwritten by child classes
     API_TOKEN: str = ""
@@ -13,16 +51,97 @@ class BaseApiClient:
     ENDPOINT: str = ""
     MAX_API_LIMIT: int = 1
     MAX_API_SKIP: int = 5
+    # Number of page requests kept in flight ahead of the consumer (1 = strictly sequential)
+    PREFETCH_WINDOW: int = 1
+    # Parse pages while they download and yield hosts one by one (sequential fetching only)
+    STREAM_PAGES: bool = False
+    STREAM_CHUNK_SIZE: int = 64 * 1024
+    CONNECTION_POOL_SIZE: int = 16
+    # Default request pacing per source, adjusted at runtime by the AdaptiveRateLimiter
+    RATE_LIMIT: float = 20.0
+    MAX_CONCURRENCY: int = 4
+    MAX_RETRIES: int = 5
 
     END_OF_DATA_ERROR_MESSAGE: str = "Error invalid skip/limit combo (>number of hosts)"
 
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[AdaptiveRateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 metrics: Optional[PipelineMetrics] = None, response_cache: Optional[ResponseCache] = None):
+        self.metrics = metrics or PIPELINE_METRICS
+        # Optional on-disk page store: serves recorded pages, or replays them without any network access
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(rate=self.RATE_LIMIT, max_concurrency=self.MAX_CONCURRENCY)
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=self.MAX_RETRIES)
         self.session = requests.Session()
         self.session.headers.update({
             "accept": "application/json",
             "token": self.API_TOKEN,
             "Content-Type": "application/json"
         })
+        # Prefetching shares the session across threads; size the pool so connections are reused
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.CONNECTION_POOL_SIZE, self.PREFETCH_WINDOW))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _is_retryable(self, response: requests.Response) -> bool:
+        if not self.retry_policy.is_retryable_status(response.status_code):
+            return False
+        # End of data is an answer, not a transient failure
+        return self.END_OF_DATA_ERROR_MESSAGE not in response.text
+
+    # POST with rate limiting, retrying connection errors, timeouts, 429 and 5xx with jittered backoff.
+    # With stream=True the body is left unread (latency is time to headers) and the caller closes the response.
+    def _post(self, url: str, params: Dict[str, Any], stream: bool = False) -> requests.Response:
+        cache = self.response_cache
+        if cache is not None:
+            cached = cache.get(self.ENDPOINT, params, url)
+            if cached is not None:
+                self.metrics.inc("api_cache_hits_total", client=self.__class__.__name__)
+                return cached
+            self.metrics.inc("api_cache_misses_total", client=self.__class__.__name__)
+            if cache.replay:
+                raise CacheMissError(f"No cached page for {self.ENDPOINT} {params} in {cache.directory}")
+
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            with self.rate_limiter.slot():
+                started_at = time.perf_counter()
+                try:
+                    response = self.session.post(url, params=params, data={}, timeout=30, stream=stream)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                latency = time.perf_counter() - started_at
+
+            client = self.__class__.__name__
+            self.metrics.record_stage("fetch", latency)
+            self.metrics.inc("http_requests_total", client=client)
+            if response is not None and not stream:
+                self.metrics.inc("http_response_bytes_total", len(response.content), client=client)
+
+            retry_after = None
+            if response is not None:
+                if not self._is_retryable(response):
+                    self.rate_limiter.record_success(latency)
+                    # A streamed page is recorded while it is read (_stream_chunks); error bodies are small
+                    if cache is not None and not (stream and response.ok):
+                        cache.put(self.ENDPOINT, params, response)
+                    return response
+                retry_after = self.retry_policy.parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429 or retry_after is not None:
+                    self.rate_limiter.record_throttle(retry_after)
+
+            if attempt >= self.retry_policy.max_retries:
+                if response is not None:
+                    return response
+                raise error
+
+            self.metrics.inc("http_retries_total", client=client)
+            delay = self.retry_policy.backoff(attempt, retry_after)
+            reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+            print(f"{self.__class__.__name__}: {reason} on {url} {params}, retry {attempt + 1}/{self.retry_policy.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
 
     # Fetch a batch of hosts (using skip and limit)
     def _fetch_page(self, skip: int, limit: int) -> List[Dict[str, Any]]:
@@ -36,30 +155,12 @@ class BaseApiClient:
              print(f"Warning: Attempting to fetch with skip={skip} which is beyond the documented MAX_API_SKIP ({self.MAX_API_SKIP}).")
 
         try:
-            response = self.session.post(url, params=params, data={}, timeout=30)
+            response = self._post(url, params)
             response.raise_for_status()
 
-            response_json = response.json()
-
-            if isinstance(response_json, dict) and response_json.get("error"):
-                error_details = response_json["error"]
-                if isinstance(error_details, list):
-                    for err in error_details:
-                        error_code = err.get("code", "")
-                        error_message = err.get("message", "")
-                        print(f"API Error Response: Code={error_code}, Message={error_message}, Details={err}")
-                        if "too_big" in error_code and "maximum" in err:
-                            raise ValueError(f"API returned 'limit too big' error: Max limit is {err['maximum']}.")
-                        elif "Number must be less than or equal to" in error_message:
-                            raise ValueError(f"API returned parameter validation error: {error_message}.")
-                print(f"API Error: {response_json.get('error')}")
-                raise ValueError(f"API returned a general error: {response_json}")
-
-            if isinstance(response_json, list):
-                return response_json
-            else:
-                print(f"Unexpected API response structure for {url}: {response_json}")
-                return []
+            hosts = parse_hosts_page(decode_json(response.content), url)
+            self.metrics.inc("hosts_fetched_total", len(hosts), client=self.__class__.__name__)
+            return hosts
 
         except requests.exceptions.HTTPError as e:
             if e.response is not None and self.END_OF_DATA_ERROR_MESSAGE in e.response.text:
@@ -85,8 +186,71 @@ class BaseApiClient:
             print(f"An unexpected error occurred while processing response from {url}: {e}")
             raise
 
+    # Body chunks of a streamed response. A page that came from the network is teed into the response
+    # cache as it is read; cached responses are built without a raw connection and are not written back.
+    def _stream_chunks(self, response: requests.Response, params: Dict[str, Any]) -> Iterator[bytes]:
+        chunks = response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE)
+        if self.response_cache is None or response.raw is None or not response.ok:
+            return chunks
+        return self.response_cache.record_stream(self.ENDPOINT, params, response, chunks)
+
+    # Streaming counterpart of _fetch_page: hosts are yielded as they are decoded from the response body
+    def _stream_page(self, skip: int, limit: int) -> Iterator[Dict[str, Any]]:
+        url = f"{self.BASE_URL}{self.ENDPOINT}"
+        params = {"skip": skip, "limit": limit}
+
+        if not (1 <= limit <= self.MAX_API_LIMIT):
+            raise ValueError(f"Invalid limit parameter: {limit}. Must be between 1 and {self.MAX_API_LIMIT}.")
+
+        response = self._post(url, params, stream=True)
+        chunks = self._stream_chunks(response, params)
+        reader = JsonStreamReader(chunks)
+        fetched = 0
+        try:
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                if self.END_OF_DATA_ERROR_MESSAGE in response.text:
+                    print(f"Detected specific end of data error for {self.__class__.__name__} at skip={skip}, limit={limit}.")
+                    raise EndOfDataError(f"API indicated end of data: {response.text}")
+                print(f"HTTP Error fetching data from {url} (skip={skip}, limit={limit}): {e}")
+                print(f"Response content: {response.text}")
+                raise
+
+            if reader.peek() == "[":
+                hosts = reader.items()
+            else:
+                # Error objects and unexpected bodies are small; decode them whole
+                hosts = parse_hosts_page(reader.value(), url)
+            for host in hosts:
+                fetched += 1
+                yield host
+            # Reads to the end of the body, so a page being recorded in the response cache is complete
+            reader.peek()
+        finally:
+            chunks.close()
+            response.close()
+            client = self.__class__.__name__
+            self.metrics.inc("http_response_bytes_total", reader.bytes_read, client=client)
+            self.metrics.inc("hosts_fetched_total", fetched, client=client)
+
+    # Last page is shorter than the limit: shrink the limit until the API accepts it
+    def _fetch_tail(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        print(f"API returned EndOfDataError with skip={skip}, limit={limit}. Attempting to retry with smaller limits.")
+        for retry_limit in range(limit - 1, 0, -1):
+            try:
+                print(f"Retrying with skip={skip}, limit={retry_limit}")
+                hosts_batch = self._fetch_page(skip, retry_limit)
+                if hosts_batch:
+                    return hosts_batch
+            except (EndOfDataError, ValueError, requests.exceptions.RequestException) as retry_e:
+                print(f"Retry with skip={skip}, limit={retry_limit} failed: {retry_e}")
+        print(f"No valid smaller limit found for skip={skip}. Stopping data fetching.")
+        return []
+
     # Main generator function
-    def fetch_all_hosts(self, page_limit: Optional[int] = None, skip: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    def fetch_all_hosts(self, page_limit: Optional[int] = None, skip: Optional[int] = None,
+                        prefetch: Optional[int] = None) -> Iterator[Dict[str, Any]]:
         actual_limit = page_limit if page_limit is not None else self.MAX_API_LIMIT
         if not (1 <= actual_limit <= self.MAX_API_LIMIT):
             raise ValueError(
@@ -95,35 +259,28 @@ class BaseApiClient:
             )
 
         skip = skip if skip is not None else 0
+        window = prefetch if prefetch is not None else self.PREFETCH_WINDOW
+        if window > 1:
+            yield from self._fetch_all_hosts_prefetched(skip, actual_limit, window)
+            return
+        if self.STREAM_PAGES:
+            yield from self._fetch_all_hosts_streamed(skip, actual_limit)
+            return
+
         while True:
             if skip > self.MAX_API_SKIP:
                 print(f"Reached documented maximum allowed skip ({self.MAX_API_SKIP}). Stopping data fetching for {self.__class__.__name__}.")
                 break
 
             hosts_batch = []
-            retried_successfully = False
             try:
-                print(f"Fetching {self.__class__.__name__} hosts: skip={skip}, limit={actual_limit}")
+                if self.metrics.verbose:
+                    print(f"Fetching {self.__class__.__name__} hosts: skip={skip}, limit={actual_limit}")
                 hosts_batch = self._fetch_page(skip, actual_limit)
 
             except EndOfDataError:
-                print(f"API returned EndOfDataError with skip={skip}, limit={actual_limit}. Attempting to retry with smaller limits.")
-                for retry_limit in range(actual_limit - 1, 0, -1):
-                    try:
-                        print(f"Retrying with skip={skip}, limit={retry_limit}")
-                        hosts_batch = self._fetch_page(skip, retry_limit)
-                        if hosts_batch:
-                            for host in hosts_batch:
-                                yield host
-                            retried_successfully = True
-                            break
-                    except (EndOfDataError, ValueError, requests.exceptions.RequestException) as retry_e:
-                        print(f"Retry with skip={skip}, limit={retry_limit} failed: {retry_e}")
-                if retried_successfully:
-                    break
-                else:
-                    print(f"No valid smaller limit found for skip={skip}. Stopping data fetching.")
-                    break
+                yield from self._fetch_tail(skip, actual_limit)
+                break
 
             except ValueError as e:
                 print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
@@ -132,9 +289,6 @@ class BaseApiClient:
                 print(f"An unexpected error occurred during {self.__class__.__name__} host fetching loop: {e}")
                 break
 
-            if retried_successfully:
-                continue
-
             if not hosts_batch:
                 break
 
@@ -142,4 +296,74 @@ class BaseApiClient:
                 yield host
 
             skip += actual_limit
-            time.sleep(0.05)
+
+    # Keeps up to `window` page requests in flight ahead of the consumer, yielding pages in order
+    def _fetch_all_hosts_prefetched(self, skip: int, limit: int, window: int) -> Iterator[Dict[str, Any]]:
+        page_skips = iter(range(skip, self.MAX_API_SKIP + 1, limit))
+        in_flight = deque()
+
+        with ThreadPoolExecutor(max_workers=window, thread_name_prefix=f"{self.__class__.__name__}-prefetch") as executor:
+            def submit_next_page():
+                next_skip = next(page_skips, None)
+                if next_skip is not None:
+                    if self.metrics.verbose:
+                        print(f"Fetching {self.__class__.__name__} hosts: skip={next_skip}, limit={limit} (prefetch)")
+                    in_flight.append((next_skip, executor.submit(self._fetch_page, next_skip, limit)))
+
+            for _ in range(window):
+                submit_next_page()
+
+            try:
+                while in_flight:
+                    page_skip, future = in_flight.popleft()
+                    try:
+                        hosts_batch = future.result()
+                    except EndOfDataError:
+                        # Every page after this one is past the end too, so the outstanding requests are discarded
+                        yield from self._fetch_tail(page_skip, limit)
+                        return
+                    except ValueError as e:
+                        print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
+                        return
+                    except Exception as e:
+                        print(f"An unexpected error occurred during {self.__class__.__name__} host fetching loop: {e}")
+                        return
+
+                    if not hosts_batch:
+                        return
+
+                    submit_next_page()
+                    for host in hosts_batch:
+                        yield host
+
+                print(f"Reached documented maximum allowed skip ({self.MAX_API_SKIP}). Stopping data fetching for {self.__class__.__name__}.")
+            finally:
+                for _, future in in_flight:
+                    future.cancel()
+
+    # One page at a time, yielding each host as soon as it is decoded, so memory holds one host
+    # rather than one page and the consumer starts before the page has finished downloading
+    def _fetch_all_hosts_streamed(self, skip: int, limit: int) -> Iterator[Dict[str, Any]]:
+        while skip <= self.MAX_API_SKIP:
+            if self.metrics.verbose:
+                print(f"Fetching {self.__class__.__name__} hosts: skip={skip}, limit={limit} (streamed)")
+            fetched = 0
+            try:
+                for host in self._stream_page(skip, limit):
+                    fetched += 1
+                    yield host
+            except EndOfDataError:
+                yield from self._fetch_tail(skip, limit)
+                return
+            except ValueError as e:
+                print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
+                return
+            except Exception as e:
+                print(f"An unexpected error occurred during {self.__class__.__name__} host fetching loop: {e}")
+                return
+
+            if not fetched:
+                return
+            skip += limit
+
+        print(f"Reached documented maximum allowed skip ({self.MAX_API_SKIP}). Stopping data fetching for {self.__class__.__name__}.")
@@ -1,4 +1,7 @@
 from src.api_clients.base_client import BaseApiClient
+from src.api_clients.rate_limiter import AdaptiveRateLimiter, RetryPolicy
+from src.api_clients.response_cache import ResponseCache
+from src.pipeline.metrics import PipelineMetrics
 from typing import Iterator, Dict, Any, Optional
 import os
 from dotenv import load_dotenv, dotenv_values
@@ -10,11 +13,16 @@ class CrowdStrikeApiClient(BaseApiClient):
     ENDPOINT: str = "/api/crowdstrike/hosts/get"
     MAX_API_LIMIT: int = 2
     MAX_API_SKIP: int = 6
+    PREFETCH_WINDOW: int = int(os.getenv("API_PREFETCH_WINDOW", "1"))
+    STREAM_PAGES: bool = os.getenv("API_STREAM_PAGES", "0") == "1"
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, rate_limiter: Optional[AdaptiveRateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 metrics: Optional[PipelineMetrics] = None, response_cache: Optional[ResponseCache] = None):
+        super().__init__(rate_limiter=rate_limiter, retry_policy=retry_policy, metrics=metrics,
+                         response_cache=response_cache)
         print("CrowdstrikeApiClient initialized.")
 
-    def fetch_hosts(self, page_limit: Optional[int] = None, skip: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    def fetch_hosts(self, page_limit: Optional[int] = None, skip: Optional[int] = None,
+                    prefetch: Optional[int] = None) -> Iterator[Dict[str, Any]]:
         print(f"Starting to fetch hosts from CrowdStrike with page_limit={page_limit if page_limit is not None else self.MAX_API_LIMIT}...")
-        yield from self.fetch_all_hosts(page_limit=page_limit, skip=skip)
+        yield from self.fetch_all_hosts(page_limit=page_limit, skip=skip, prefetch=prefetch)
@@ -0,0 +1,113 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+class JsonStreamReader:
+    """
+    Incremental JSON reader over an iterator of byte chunks (e.g. response.iter_content()).
+
+    Values are decoded one at a time with json.JSONDecoder.raw_decode, and text before the current
+    position is dropped whenever a chunk is appended, so the buffer holds one read chunk plus the
+    value being decoded. Arrays can be iterated item by item (items()) and objects member by member
+    (keys()), which lets a page of hosts be consumed while it is still downloading.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+        self.bytes_read = 0
+
+    def _fill(self) -> bool:
+        """Appends the next chunk to the unread text; False once the stream is exhausted."""
+        if self.exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            # Raises on a truncated UTF-8 sequence; the buffer is left as is, so positions stay valid
+            self.exhausted = True
+            self.buffer += self._utf8.decode(b"", final=True)
+            return False
+        self.bytes_read += len(chunk)
+        self.buffer = self.buffer[self.position:] + self._utf8.decode(chunk)
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, without consuming it; '' at the end of the stream."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{found or 'end of data'}'")
+        self.position += 1
+
+    def value(self) -> Any:
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # Incomplete value: read on, unless there is nothing left to read
+                if not self._fill():
+                    raise
+                continue
+            # A number (or literal) may continue in the next chunk while nothing but number characters
+            # follows it in the buffer ("12" then "34", or "12" + "." then "5")
+            rest = end
+            while rest < len(self.buffer) and self.buffer[rest] in _NUMBER_CHARS:
+                rest += 1
+            if rest == len(self.buffer) and self._fill():
+                continue
+            self.position = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """Items of the array at the current position, decoded one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.position += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, found '{separator or 'end of data'}'")
+
+    def keys(self) -> Iterator[str]:
+        """
+        Keys of the object at the current position. The caller consumes each member's value
+        (value() or items()) before asking for the next key.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self.position += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' in JSON object, found '{separator or 'end of data'}'")
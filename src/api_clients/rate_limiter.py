@@ -0,0 +1,158 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Iterator, Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Tokens refill at `rate` per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """Takes one token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def block_for(self, seconds: float):
+        """Stops handing out usable tokens for `seconds`, e.g. after a Retry-After header."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class RetryPolicy:
+    """Decides which failures are retried and how long to back off between attempts."""
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in self.RETRY_STATUSES
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        # Full jitter: spreads retries of concurrent requests instead of retrying in lockstep
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Per-source request limiter: a token bucket for the request rate, a cap on concurrent requests,
+    and additive-increase / multiplicative-decrease adjustment of the rate. The rate creeps up while
+    latency stays under the target, backs off when latency grows, and halves on throttling.
+
+    Threads take a request slot with slot() and coroutines with async_slot(). Each caps concurrent
+    requests at max_concurrency across every client sharing the limiter: the threads hold one
+    semaphore, and the coroutines of an event loop hold another.
+    """
+
+    def __init__(self, rate: float = 20.0, burst: float = 5.0, max_concurrency: int = 4,
+                 min_rate: float = 1.0, max_rate: float = 100.0, target_latency: float = 1.0,
+                 rate_step: float = 1.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.rate_step = rate_step
+        self.avg_latency: Optional[float] = None
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # asyncio primitives belong to the event loop they are first used in, so created on demand
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._async_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._slots:
+            self.bucket.acquire()
+            yield
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_slots is None or self._async_slots_loop is not loop:
+                self._async_slots = asyncio.Semaphore(self.max_concurrency)
+                self._async_slots_loop = loop
+            return self._async_slots
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[None]:
+        """slot() for coroutines: waits for a request slot and a token without blocking the event loop."""
+        async with self._async_semaphore():
+            wait = self.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+
+    def reserve(self) -> float:
+        """Seconds to wait before the next request; for callers that sleep themselves (asyncio)."""
+        return self.bucket.reserve()
+
+    def record_success(self, latency: float):
+        with self._lock:
+            # Exponentially weighted average smooths out single slow responses
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+            if self.avg_latency <= self.target_latency:
+                new_rate = min(self.max_rate, self.bucket.rate + self.rate_step)
+            elif self.avg_latency > 2 * self.target_latency:
+                new_rate = max(self.min_rate, self.bucket.rate * 0.8)
+            else:
+                return
+            self.bucket.set_rate(new_rate)
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        with self._lock:
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate * 0.5))
+            if retry_after:
+                self.bucket.block_for(retry_after)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import requests
+
+
+class CacheMissError(requests.exceptions.RequestException):
+    """Raised in replay mode for a request whose page is not in the cache."""
+    pass
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw API pages, for re-running the pipeline without re-downloading.
+
+    Each response is stored as one zlib-compressed file (a JSON header line with the status and
+    content type, then the raw body) named by the SHA-256 of the endpoint and request parameters
+    (skip/limit or cursor), under a directory per endpoint. The base URL is not part of the key, so
+    pages recorded from the vendor APIs or the fake API server replay against any client.
+
+    mode="record" serves fresh cached pages and stores every other definitive response (including
+    end-of-data and invalid-cursor errors, so pagination replays exactly); mode="replay" never goes
+    to the network and raises CacheMissError for a page it does not have. Pages older than `ttl`
+    seconds (0 = never) count as missing and are deleted.
+    """
+
+    MODES = ("record", "replay")
+
+    def __init__(self, directory: str, mode: str = "record", ttl: float = 0.0, compression_level: int = 1):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown response cache mode '{mode}', expected one of {self.MODES}.")
+        self.directory = directory
+        self.mode = mode
+        self.ttl = ttl
+        self.compression_level = compression_level
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def is_cacheable(response: requests.Response) -> bool:
+        # Throttling and server errors are transient, so they are never replayed
+        return response.status_code < 500 and response.status_code != 429
+
+    def _path(self, endpoint: str, params: Dict[str, Any]) -> str:
+        key = json.dumps([endpoint, {name: str(value) for name, value in sorted(params.items())}])
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, endpoint.strip("/").replace("/", "_"), f"{digest}.z")
+
+    def _expired(self, modified_at: float) -> bool:
+        return bool(self.ttl) and time.time() - modified_at > self.ttl
+
+    def get(self, endpoint: str, params: Dict[str, Any], url: str) -> Optional[requests.Response]:
+        """The cached response for this request, or None when it is missing or expired."""
+        path = self._path(endpoint, params)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                os.remove(path)
+                return None
+            with open(path, "rb") as cached:
+                header, body = zlib.decompress(cached.read()).split(b"\n", 1)
+        except FileNotFoundError:
+            return None
+
+        header = json.loads(header)
+        response = requests.Response()
+        response.status_code = header["status"]
+        response.headers["Content-Type"] = header["content_type"]
+        response.url = url
+        response.encoding = "utf-8"
+        # Marked as already read, so .content, .text and iter_content() all serve the cached body
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    @staticmethod
+    def _header(endpoint: str, params: Dict[str, Any], response: requests.Response) -> bytes:
+        header = json.dumps({"endpoint": endpoint, "params": params, "status": response.status_code,
+                             "content_type": response.headers.get("Content-Type", "application/json")})
+        return header.encode() + b"\n"
+
+    def _temporary_file(self, path: str):
+        # Pages are written under a temporary name and renamed, so concurrent readers never see a partial page
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+
+    def put(self, endpoint: str, params: Dict[str, Any], response: requests.Response):
+        """Stores a response if it is cacheable; reads the body, so use record_stream for streamed pages."""
+        if not self.is_cacheable(response):
+            return
+        path = self._path(endpoint, params)
+        data = zlib.compress(self._header(endpoint, params, response) + response.content, self.compression_level)
+        descriptor, temporary_path = self._temporary_file(path)
+        with os.fdopen(descriptor, "wb") as cached:
+            cached.write(data)
+        os.replace(temporary_path, path)
+
+    def record_stream(self, endpoint: str, params: Dict[str, Any], response: requests.Response,
+                      chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Yields the body chunks of a streamed response while compressing them into the cache, so the
+        body is never buffered whole. The page is stored once the chunks have been read to the end;
+        a body abandoned part-way (the generator is closed) is discarded.
+        """
+        if not self.is_cacheable(response):
+            yield from chunks
+            return
+        path = self._path(endpoint, params)
+        descriptor, temporary_path = self._temporary_file(path)
+        compressor = zlib.compressobj(self.compression_level)
+        stored = False
+        try:
+            with os.fdopen(descriptor, "wb") as cached:
+                cached.write(compressor.compress(self._header(endpoint, params, response)))
+                for chunk in chunks:
+                    cached.write(compressor.compress(chunk))
+                    yield chunk
+                cached.write(compressor.flush())
+            os.replace(temporary_path, path)
+            stored = True
+        finally:
+            if not stored:
+                try:
+                    os.remove(temporary_path)
+                except FileNotFoundError:
+                    pass
+
+    def evict_expired(self) -> int:
+        """Deletes every page older than the TTL; returns how many were deleted."""
+        if not self.ttl:
+            return 0
+        evicted = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if self._expired(os.path.getmtime(path)):
+                        os.remove(path)
+                        evicted += 1
+                except FileNotFoundError:
+                    pass
+        return evicted
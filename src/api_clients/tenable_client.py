@@ -1,31 +1,71 @@
+import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
 
-from src.api_clients.base_client import BaseApiClient
-from typing import Iterator, Dict, Any, Optional, List
+from src.api_clients.base_client import BaseApiClient, decode_json
+from src.api_clients.json_stream import JsonStreamReader
+from src.api_clients.rate_limiter import AdaptiveRateLimiter, RetryPolicy
+from src.api_clients.response_cache import ResponseCache
+from src.pipeline.metrics import PipelineMetrics
+from typing import Iterator, Dict, Any, Optional, List, Tuple
 import os
 from dotenv import load_dotenv, dotenv_values
 load_dotenv()
 
+# "cursor" as the last or the first key of the top-level object. Anchored at the ends of the body,
+# these cannot match a "cursor" key inside a host, so the next cursor is read without decoding the page
+_TRAILING_CURSOR = re.compile(rb'"cursor"\s*:\s*("(?:[^"\\]|\\.)*"|null)\s*\}\s*$')
+_LEADING_CURSOR = re.compile(rb'^\s*\{\s*"cursor"\s*:\s*("(?:[^"\\]|\\.)*"|null)\s*[,}]')
+_EMPTY_HOSTS = re.compile(rb'^\s*\{\s*"hosts"\s*:\s*\[\s*\]')
+_NOT_FOUND = object()
+
+
+def peek_cursor(content: bytes) -> Any:
+    """Next cursor of a raw Tenable page, or _NOT_FOUND when the page has to be decoded to find it."""
+    match = _TRAILING_CURSOR.search(content, max(0, len(content) - 512)) or _LEADING_CURSOR.match(content)
+    if match is None:
+        return _NOT_FOUND
+    return decode_json(match.group(1))
+
+
 class TenableApiClient(BaseApiClient):
     API_TOKEN: str = os.getenv("API_TOKEN")
     BASE_URL: str = "https://api.recruiting.app.silk.security"
     ENDPOINT: str = "/api/tenable/hosts/get"
-    CURSOR: str = ''
+    # Request the next page while the current one is decoded and consumed
+    PIPELINED_FETCH: bool = os.getenv("TENABLE_PIPELINED_FETCH", "1") != "0"
+    STREAM_PAGES: bool = os.getenv("API_STREAM_PAGES", "0") == "1"
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, rate_limiter: Optional[AdaptiveRateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 metrics: Optional[PipelineMetrics] = None, response_cache: Optional[ResponseCache] = None):
+        super().__init__(rate_limiter=rate_limiter, retry_policy=retry_policy, metrics=metrics,
+                         response_cache=response_cache)
+        # Kept per instance so concurrent clients never share pagination state
+        self.cursor: Optional[str] = ''
+        self.page_cursor: Optional[str] = None
         print("TenableApiClient initialized.")
 
-    def fetch_hosts(self) -> Iterator[Dict[str, Any]]:
+    def fetch_hosts(self, cursor: Optional[str] = None) -> Iterator[Dict[str, Any]]:
         print(f"Starting to fetch hosts from Tenable")
-        yield from self.fetch_all_hosts()
+        if cursor is not None:
+            self.cursor = cursor
+        if self.STREAM_PAGES:
+            # The cursor follows the hosts in the body, so streamed pages cannot be pipelined
+            yield from self._fetch_all_hosts_streamed()
+        elif self.PIPELINED_FETCH:
+            yield from self._fetch_all_hosts_pipelined()
+        else:
+            yield from self.fetch_all_hosts()
 
     def fetch_all_hosts(self) -> Iterator[Dict[str, Any]]:
         while True:
             hosts_batch = []
             try:
-                print(f"Fetching {self.__class__.__name__} hosts, cursor: {self.CURSOR}")
-                hosts_batch = self._fetch_page(cursor=self.CURSOR)
+                if self.metrics.verbose:
+                    print(f"Fetching {self.__class__.__name__} hosts, cursor: {self.cursor}")
+                # Cursor that produced the hosts currently being yielded, used for sync checkpoints
+                self.page_cursor = self.cursor
+                hosts_batch = self._fetch_page(cursor=self.cursor)
 
             except ValueError as e:
                 print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
@@ -40,24 +80,88 @@ class TenableApiClient(BaseApiClient):
             for host in hosts_batch:
                 yield host
 
+            if not self.cursor:
+                break
+
+    # The next cursor only arrives with the current page, so at most one request is in flight. It is
+    # issued as soon as the cursor is read from the raw body, before the page is decoded and yielded.
+    def _fetch_all_hosts_pipelined(self) -> Iterator[Dict[str, Any]]:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.__class__.__name__}-fetch") as executor:
+            def submit_page(cursor: str):
+                if self.metrics.verbose:
+                    print(f"Fetching {self.__class__.__name__} hosts, cursor: {cursor} (pipelined)")
+                return cursor, executor.submit(self._request_page, cursor)
+
+            in_flight = submit_page(self.cursor)
+            try:
+                while in_flight is not None:
+                    page_cursor, future = in_flight
+                    in_flight = None
+                    try:
+                        content = future.result()
+                        if not content:
+                            break
+                        next_cursor = peek_cursor(content)
+                        if next_cursor is not _NOT_FOUND and next_cursor and not _EMPTY_HOSTS.match(content):
+                            in_flight = submit_page(next_cursor)
+                        hosts_batch, self.cursor = self._decode_page(content)
+                    except ValueError as e:
+                        print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
+                        break
+                    except Exception as e:
+                        print(f"An unexpected error occurred during {self.__class__.__name__} host fetching loop: {e}")
+                        break
+
+                    if not hosts_batch:
+                        break
+                    if in_flight is None and self.cursor:
+                        # The cursor was not where peek_cursor looks, so it was only known after decoding
+                        in_flight = submit_page(self.cursor)
+
+                    self.page_cursor = page_cursor
+                    for host in hosts_batch:
+                        yield host
+            finally:
+                if in_flight is not None:
+                    in_flight[1].cancel()
+
+    # One page at a time, yielding each host as soon as it is decoded from the response body
+    def _fetch_all_hosts_streamed(self) -> Iterator[Dict[str, Any]]:
+        while True:
+            if self.metrics.verbose:
+                print(f"Fetching {self.__class__.__name__} hosts, cursor: {self.cursor} (streamed)")
+            self.page_cursor = self.cursor
+            fetched = 0
+            try:
+                for host in self._stream_page(self.cursor):
+                    fetched += 1
+                    yield host
+            except ValueError as e:
+                print(f"Stopping {self.__class__.__name__} host fetching due to API constraint: {e}")
+                break
+            except Exception as e:
+                print(f"An unexpected error occurred during {self.__class__.__name__} host fetching loop: {e}")
+                break
+
+            if not fetched or not self.cursor:
+                break
 
     def _fetch_page(self, cursor: str) -> List[Dict[str, Any]]:
+        content = self._request_page(cursor)
+        if not content:
+            return []
+        hosts, self.cursor = self._decode_page(content)
+        return hosts
+
+    # POSTs for one page and returns the raw body, or None when the API rejects the cursor
+    def _request_page(self, cursor: str) -> Optional[bytes]:
         url = f"{self.BASE_URL}{self.ENDPOINT}"
-        params = {"cursor": self.CURSOR}
+        params = {"cursor": cursor}
 
         try:
-            response = self.session.post(url, params=params, data={}, timeout=30)
+            response = self._post(url, params)
             response.raise_for_status()
-
-            response_json = response.json()
-            hosts = response_json.get("hosts")
-            self.CURSOR = response_json.get("cursor")
-
-            if isinstance(hosts, list):
-                return hosts
-            else:
-                print(f"Unexpected API response structure for {url}: {response_json}")
-                return []
+            return response.content
 
         except requests.exceptions.ConnectionError as e:
             print(f"Connection Error fetching data from {url}: {e}")
@@ -65,14 +169,64 @@ class TenableApiClient(BaseApiClient):
         except requests.exceptions.Timeout as e:
             print(f"Timeout Error fetching data from {url}: {e}")
             raise
+        except requests.exceptions.RequestException as e:
+            if e.response is not None and e.response.text == 'Invalid cursor':
+                print(f"Wrong cursor: {cursor} on {url}: {e}")
+                return None
+            raise
+
+    # Streaming counterpart of _fetch_page; self.cursor moves on once the whole page has been read
+    def _stream_page(self, cursor: str) -> Iterator[Dict[str, Any]]:
+        url = f"{self.BASE_URL}{self.ENDPOINT}"
+        params = {"cursor": cursor}
+        response = self._post(url, params, stream=True)
+        chunks = self._stream_chunks(response, params)
+        reader = JsonStreamReader(chunks)
+        fetched = 0
+        next_cursor = None
+        try:
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                if response.text == 'Invalid cursor':
+                    print(f"Wrong cursor: {cursor} on {url}: {e}")
+                    return
+                raise
+
+            for key in reader.keys():
+                if key == "hosts" and reader.peek() == "[":
+                    for host in reader.items():
+                        fetched += 1
+                        yield host
+                elif key == "cursor":
+                    next_cursor = reader.value()
+                else:
+                    value = reader.value()
+                    if key == "hosts":
+                        print(f"Unexpected API response structure for {url}: hosts={value}")
+            # Reads to the end of the body, so a page being recorded in the response cache is complete
+            reader.peek()
+            self.cursor = next_cursor
+        finally:
+            chunks.close()
+            response.close()
+            client = self.__class__.__name__
+            self.metrics.inc("http_response_bytes_total", reader.bytes_read, client=client)
+            self.metrics.inc("hosts_fetched_total", fetched, client=client)
+
+    # Decodes a raw page into its hosts and the next cursor
+    def _decode_page(self, content: bytes) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        url = f"{self.BASE_URL}{self.ENDPOINT}"
+        try:
+            response_json = decode_json(content)
         except ValueError as e:
             print(f"API Constraint Violation: {e}")
             raise
-        except requests.exceptions.RequestException as e:
-            if e.response.text == 'Invalid cursor':
-                print(f"Wrong cursor: {self.CURSOR} on {url}: {e}")
-                return []
-            raise
-        except Exception as e:
-            print(f"An unexpected error occurred while processing response from {url}: {e}")
-            raise
\ No newline at end of file
+
+        hosts = response_json.get("hosts")
+        cursor = response_json.get("cursor")
+        if isinstance(hosts, list):
+            self.metrics.inc("hosts_fetched_total", len(hosts), client=self.__class__.__name__)
+            return hosts, cursor
+        print(f"Unexpected API response structure for {url}: {response_json}")
+        return [], cursor
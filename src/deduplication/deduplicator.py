@@ -1,7 +1,14 @@
 import datetime
-from typing import Dict, Any, List
+import hashlib
+import json
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
 from pymongo.database import Database
+from src.models.sources import SourceSet
 from src.models.unified_host import UnifiedHost
+from src.deduplication.identity_index import IdentityIndex
+from src.pipeline.metrics import PIPELINE_METRICS, PipelineMetrics
 
 class Deduplicator:
     # Rules for matching, each has a field to check and a weight
@@ -15,9 +22,27 @@ class Deduplicator:
 
     CONFIDENCE_THRESHOLD = 45
 
-    def __init__(self, db: Database):
+    # Fields used to look up candidate documents (the strong identifiers plus hostname)
+    CANDIDATE_FIELDS = ["primary_mac_address", "cloud_instance_id", "hostname"]
+
+    SOURCE_ID_KEYS = {"qualys_id": "Qualys", "crowdstrike_id": "CrowdStrike", "tenable_id": "Tenable"}
+    # Order in which the pipeline merges the sources; later sources win on conflicting fields
+    MERGE_ORDER = ["Qualys", "CrowdStrike", "Tenable"]
+    # Per-run metadata that must not make an otherwise identical source record look changed
+    FINGERPRINT_EXCLUDED_FIELDS = {"record_created_at", "record_last_updated_at", "source_fingerprints",
+                                   "write_version", "source_versions"}
+
+    def __init__(self, db: Database, use_identity_index: bool = False, metrics: Optional[PipelineMetrics] = None):
+        self.metrics = metrics or PIPELINE_METRICS
         self.collection = db["unified_assets"]
         self._ensure_indexes()
+        self.merge_stats = {"inserted": 0, "merged": 0, "skipped": 0}
+
+        # Optional in-process index: candidate lookup and scoring without database reads
+        self.identity_index = None
+        if use_identity_index:
+            self.identity_index = IdentityIndex([rule["field"] for rule in self.DEDUPLICATION_RULES])
+            self.identity_index.warm(self.collection)
 
     def _ensure_indexes(self):
         print("Ensuring database indexes exist for deduplication...")
@@ -44,116 +69,397 @@ class Deduplicator:
         return list(self.collection.find(query))
 
     def _calculate_match_score(self, new_host: UnifiedHost, existing_doc: Dict[str, Any]) -> int:
+        verbose = self.metrics.verbose
         score = 0
-        print(f"--- Scoring against existing host ID: {existing_doc['_id']} ---")
+        if verbose:
+            print(f"--- Scoring against existing host ID: {existing_doc['_id']} ---")
         for rule in self.DEDUPLICATION_RULES:
             field = rule["field"]
             new_value = getattr(new_host, field, None)
             existing_value = existing_doc.get(field)
 
             if new_value is not None and new_value == existing_value:
-                print(f"  [+] Match on '{rule['description']}'. Adding {rule['weight']} points.")
+                if verbose:
+                    print(f"  [+] Match on '{rule['description']}'. Adding {rule['weight']} points.")
                 score += rule['weight']
-        print(f"--- Total Score: {score} ---")
+        if verbose:
+            print(f"--- Total Score: {score} ---")
         return score
 
-    def _merge_hosts(self, incoming_host: UnifiedHost, existing_doc: Dict[str, Any]) -> Dict[str, Any]:
-        update_payload = {"$set": {}}
-        incoming_id = list(incoming_host.source_ids.keys())[0]
+    def _best_match(self, host: UnifiedHost, candidates: Iterable[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], int]:
+        # Highest scoring candidate; the first one wins a tie
+        best_match = None
+        highest_score = 0
+        with self.metrics.stage("score", items=0) as timer:
+            for candidate_doc in candidates:
+                timer.items += 1
+                score = self._calculate_match_score(host, candidate_doc)
+                if score > highest_score:
+                    highest_score = score
+                    best_match = candidate_doc
+        return best_match, highest_score
+
+    def _source_of(self, host: UnifiedHost) -> str:
+        incoming_id = list(host.source_ids.keys())[0]
+        return self.SOURCE_ID_KEYS.get(incoming_id, "Unknown")
+
+    def _fingerprint(self, host: UnifiedHost, dumped: Optional[Dict[str, Any]] = None) -> str:
+        # Stable hash of the normalized host as delivered by its source; reuses `dumped` when given
+        if dumped is None:
+            payload = host.model_dump(exclude=self.FINGERPRINT_EXCLUDED_FIELDS)
+        else:
+            payload = {k: v for k, v in dumped.items() if k not in self.FINGERPRINT_EXCLUDED_FIELDS}
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha1(encoded.encode()).hexdigest()
+
+    @classmethod
+    def _merge_rank(cls, source: str) -> int:
+        return cls.MERGE_ORDER.index(source) if source in cls.MERGE_ORDER else len(cls.MERGE_ORDER)
+
+    @classmethod
+    def merge_superseded(cls, source: str, doc: Dict[str, Any]) -> bool:
+        """
+        Whether the document may no longer hold what the source's last merge wrote. Sources merged
+        after it in MERGE_ORDER are expected to win conflicting fields; a source that comes before it
+        but wrote after it (it changed) has overwritten fields that this source's merge sets.
+        """
+        versions = doc.get("source_versions") or {}
+        version = versions.get(source)
+        if version is None:
+            return True
+        rank = cls._merge_rank(source)
+        return any(other_version > version and cls._merge_rank(other) <= rank
+                   for other, other_version in versions.items() if other != source)
+
+    def _merge_if_changed(self, incoming_host: UnifiedHost, existing_doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Merge payload, or None when this source already merged an identical record into the document
+        and that merge has not been superseded since (see merge_superseded).
+        """
+        with self.metrics.stage("merge"):
+            source = self._source_of(incoming_host)
+            # Dumped once: the fingerprint and the merge payload are both built from it
+            dumped = incoming_host.model_dump()
+            fingerprint = self._fingerprint(incoming_host, dumped)
+            version = existing_doc.get("write_version") or 0
+            if ((existing_doc.get("source_fingerprints") or {}).get(source) == fingerprint
+                    and not self.merge_superseded(source, existing_doc)):
+                self.merge_stats["skipped"] += 1
+                return None
+            update_payload = self._merge_hosts(incoming_host, existing_doc, dumped)
+            update_payload["$set"][f"source_fingerprints.{source}"] = fingerprint
+            update_payload["$set"]["write_version"] = version + 1
+            update_payload["$set"][f"source_versions.{source}"] = version + 1
+            self.merge_stats["merged"] += 1
+            return update_payload
+
+    def _new_document(self, host: UnifiedHost) -> Dict[str, Any]:
+        with self.metrics.stage("merge"):
+            doc = host.model_dump()
+            source = self._source_of(host)
+            doc["source_fingerprints"] = {source: self._fingerprint(host, doc)}
+            doc["write_version"] = 1
+            doc["source_versions"] = {source: 1}
+            self.merge_stats["inserted"] += 1
+            return doc
 
-        incoming_source = "Unknown"
-        if incoming_id == "qualys_id":
-            incoming_source = "Qualys"
-        elif incoming_id == "crowdstrike_id":
-            incoming_source = "CrowdStrike"
-        elif incoming_id == "tenable_id":
-            incoming_source = "Tenable"
+    @staticmethod
+    def _without_none(fields: Dict[str, Any]) -> Dict[str, Any]:
+        # model_dump(exclude_none=True) of a flat model, from its already dumped fields
+        return {k: v for k, v in fields.items() if v is not None}
+
+    def _merge_hosts(self, incoming_host: UnifiedHost, existing_doc: Dict[str, Any],
+                     dumped: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        update_payload = {"$set": {}}
+        incoming_source = self._source_of(incoming_host)
+        if dumped is None:
+            dumped = incoming_host.model_dump()
 
         # Merge Logic
         for field in ["hostname", "os_name", "os_platform", "kernel_version", "manufacturer", "product_model",
                       "processor_info", "public_ip", "private_ip", "last_boot_timestamp", "default_gateway"]:
-            new_val = getattr(incoming_host, field)
+            new_val = dumped[field]
             if new_val is not None:
                 update_payload["$set"][field] = new_val
 
-        for source, source_id in incoming_host.source_ids.items():
+        for source, source_id in dumped["source_ids"].items():
             update_payload["$set"][f"source_ids.{source}"] = source_id
 
         # Software
-        existing_software_raw = existing_doc.get("installed_software", [])
-        incoming_software = incoming_host.installed_software or []
-
-        consolidated_software = [s for s in existing_software_raw if incoming_source not in s.get("sources", [])]
-        software_lookup = {(s.get("vendor"), s.get("product"), s.get("version")): s for s in consolidated_software}
-
-        for sw in incoming_software:
-            key = (sw.vendor, sw.product, sw.version)
-            if key in software_lookup:
-                software_lookup[key]["sources"].append(incoming_source)
-                software_lookup[key]["sources"] = sorted(list(set(software_lookup[key]["sources"])))
-            else:
-                consolidated_software.append(sw.model_dump(exclude_none=True))
-
-        update_payload["$set"]["installed_software"] = consolidated_software
+        self._merge_software(incoming_source, existing_doc.get("installed_software") or [],
+                             dumped["installed_software"] or [], update_payload["$set"])
 
         # Network interfaces
         existing_interfaces_raw = existing_doc.get("network_interfaces", [])
-        incoming_interfaces = incoming_host.network_interfaces or []
+        incoming_interfaces = dumped["network_interfaces"] or []
 
-        consolidated_interfaces = [i for i in existing_interfaces_raw if incoming_source not in i.get("sources", [])]
+        # The source's earlier interfaces lose its attribution, and are dropped once no source reports
+        # them, so re-merging one source leaves what the others reported for a shared interface intact
+        consolidated_interfaces = []
+        for existing_iface in existing_interfaces_raw:
+            sources = SourceSet.coerce(existing_iface.get("sources"))
+            if incoming_source in sources:
+                sources = sources.discard(incoming_source)
+                if not sources:
+                    continue
+                existing_iface = {**existing_iface, "sources": sources.to_list()}
+            consolidated_interfaces.append(existing_iface)
         interface_lookup = {i.get("mac_address"): i for i in consolidated_interfaces if i.get("mac_address")}
 
         for iface in incoming_interfaces:
-            mac = iface.mac_address
+            mac = iface.get("mac_address")
             if mac and mac in interface_lookup:
                 # Interface with this MAC exists, update it
                 existing_iface = interface_lookup[mac]
                 # Merge sources
-                existing_iface["sources"] = sorted(list(set(existing_iface.get("sources", []) + [incoming_source])))
+                existing_iface["sources"] = SourceSet.coerce(existing_iface.get("sources")).add(incoming_source).to_list()
                 # Enrich with potentially new IP info
-                if iface.private_ip_v4: existing_iface["private_ip_v4"] = iface.private_ip_v4
-                if iface.public_ip_v4: existing_iface["public_ip_v4"] = iface.public_ip_v4
-                if iface.ip_v6: existing_iface["ip_v6"] = iface.ip_v6
+                if iface.get("private_ip_v4"): existing_iface["private_ip_v4"] = iface["private_ip_v4"]
+                if iface.get("public_ip_v4"): existing_iface["public_ip_v4"] = iface["public_ip_v4"]
+                if iface.get("ip_v6"): existing_iface["ip_v6"] = iface["ip_v6"]
             else:
-                consolidated_interfaces.append(iface.model_dump(exclude_none=True))
+                consolidated_interfaces.append(self._without_none(iface))
 
         update_payload["$set"]["network_interfaces"] = consolidated_interfaces
 
         # Cloud context
-        if incoming_host.cloud_context:
+        if dumped["cloud_context"]:
             merged_cloud_context = (existing_doc.get("cloud_context") or {}).copy()
-            merged_cloud_context.update(
-                {k: v for k, v in incoming_host.cloud_context.model_dump(exclude_none=True).items()})
+            merged_cloud_context.update(self._without_none(dumped["cloud_context"]))
             update_payload["$set"]["cloud_context"] = merged_cloud_context
 
         # Merge source-specific security info
-        if incoming_host.qualys_security:
-            update_payload["$set"]["qualys_security"] = incoming_host.qualys_security.model_dump(exclude_none=True)
-        if incoming_host.crowdstrike_security:
-            update_payload["$set"]["crowdstrike_security"] = incoming_host.crowdstrike_security.model_dump(exclude_none=True)
-        if incoming_host.tenable_security:
-            update_payload["$set"]["tenable_security"] = incoming_host.tenable_security.model_dump(exclude_none=True)
+        if dumped["qualys_security"]:
+            update_payload["$set"]["qualys_security"] = self._without_none(dumped["qualys_security"])
+        if dumped["crowdstrike_security"]:
+            update_payload["$set"]["crowdstrike_security"] = self._without_none(dumped["crowdstrike_security"])
+        if dumped["tenable_security"]:
+            tenable_security = self._without_none(dumped["tenable_security"])
+            tenable_security["tags"] = [self._without_none(tag) for tag in tenable_security["tags"]]
+            tenable_security["mitigations"] = [self._without_none(mit) for mit in tenable_security["mitigations"]]
+            update_payload["$set"]["tenable_security"] = tenable_security
 
         update_payload["$set"]["record_last_updated_at"] = datetime.datetime.utcnow().isoformat() + "Z"
 
         return update_payload
 
-    def upsert_host(self, host: UnifiedHost):
-        candidates = self._find_candidates(host)
+    @staticmethod
+    def _merge_software(incoming_source: str, existing_software: List[Dict[str, Any]],
+                        incoming_software: List[Dict[str, Any]], set_fields: Dict[str, Any]):
+        """
+        Adds the $set paths that bring installed_software in line with what incoming_source reports
+        (incoming_software holds the dumped Software entries).
 
-        best_match = None
-        highest_score = 0
+        The source is added to the sources of every package it reports and removed from the ones it no
+        longer reports; packages it reports for the first time are appended. Only those entries are
+        written, as positional paths (installed_software.<n>.sources, installed_software.<len>), so a
+        re-scan that changes a few packages does not rewrite the whole array. Only when a package loses
+        its last source, and has to be removed, is the full array set.
+        """
+        reported = {}
+        for sw in incoming_software:
+            reported.setdefault((sw.get("vendor"), sw.get("product"), sw.get("version")), sw)
+
+        changed_sources = {}
+        removed = set()
+        for position, entry in enumerate(existing_software):
+            key = (entry.get("vendor"), entry.get("product"), entry.get("version"))
+            sources = SourceSet.coerce(entry.get("sources"))
+            if key in reported:
+                reported.pop(key)
+                if incoming_source not in sources:
+                    changed_sources[position] = sources.add(incoming_source).to_list()
+            elif incoming_source in sources:
+                sources = sources.discard(incoming_source)
+                if sources:
+                    changed_sources[position] = sources.to_list()
+                else:
+                    removed.add(position)
 
-        for candidate_doc in candidates:
-            score = self._calculate_match_score(host, candidate_doc)
-            if score > highest_score:
-                highest_score = score
-                best_match = candidate_doc
+        appended = []
+        for sw in reported.values():
+            entry = Deduplicator._without_none(sw)
+            entry["sources"] = SourceSet.coerce(sw.get("sources")).add(incoming_source).to_list()
+            appended.append(entry)
+
+        if removed:
+            consolidated = []
+            for position, entry in enumerate(existing_software):
+                if position in removed:
+                    continue
+                if position in changed_sources:
+                    entry = {**entry, "sources": changed_sources[position]}
+                consolidated.append(entry)
+            set_fields["installed_software"] = consolidated + appended
+            return
+
+        for position, sources in changed_sources.items():
+            set_fields[f"installed_software.{position}.sources"] = sources
+        for offset, entry in enumerate(appended):
+            set_fields[f"installed_software.{len(existing_software) + offset}"] = entry
+
+    def upsert_host(self, host: UnifiedHost):
+        with self.metrics.stage("dedup_find"):
+            if self.identity_index is not None:
+                candidates = self.identity_index.find_candidates(host, self.CANDIDATE_FIELDS)
+            else:
+                candidates = self._find_candidates(host)
+
+        best_match, highest_score = self._best_match(host, candidates)
 
         if highest_score > self.CONFIDENCE_THRESHOLD:
-            print(f"Confident match found (Score: {highest_score}). Merging with host ID: {best_match['_id']}\n")
-            update_operation = self._merge_hosts(host, best_match)
-            self.collection.update_one({"_id": best_match["_id"]}, update_operation)
+            if self.metrics.verbose:
+                print(f"Confident match found (Score: {highest_score}). Merging with host ID: {best_match['_id']}\n")
+            if self.identity_index is not None:
+                # Index entries only carry identity fields; merging needs the full document
+                with self.metrics.stage("dedup_find"):
+                    best_match = self.collection.find_one({"_id": best_match["_id"]})
+            update_operation = self._merge_if_changed(host, best_match)
+            if update_operation is None:
+                if self.metrics.verbose:
+                    print("Source record unchanged since the last merge. Skipping.\n")
+                return
+            with self.metrics.stage("write"):
+                self.collection.update_one({"_id": best_match["_id"]}, update_operation)
+            if self.identity_index is not None:
+                self.identity_index.apply_set(best_match["_id"], update_operation["$set"])
         else:
-            print("No confident match found. Inserting as new host.\n")
-            self.collection.insert_one(host.model_dump())
+            if self.metrics.verbose:
+                print("No confident match found. Inserting as new host.\n")
+            doc = self._new_document(host)
+            with self.metrics.stage("write"):
+                self.collection.insert_one(doc)
+            if self.identity_index is not None:
+                self.identity_index.add(doc)
+
+    @staticmethod
+    def _apply_set(doc: Dict[str, Any], set_fields: Dict[str, Any]):
+        # Applies a $set payload to an in-memory document, including dotted paths
+        for path, value in set_fields.items():
+            target = doc
+            keys = path.split(".")
+            for key in keys[:-1]:
+                if isinstance(target, list):
+                    target = target[int(key)]
+                else:
+                    target = target.setdefault(key, {})
+            if isinstance(target, list):
+                index = int(keys[-1])
+                if index == len(target):
+                    target.append(value)
+                else:
+                    target[index] = value
+            else:
+                target[keys[-1]] = value
+
+    def _find_batch_candidates(self, hosts: List[UnifiedHost]) -> List[Dict[str, Any]]:
+        if self.identity_index is not None:
+            # Candidates come from the index; only their full documents are read, by _id
+            candidate_ids = self.identity_index.candidate_ids(hosts, self.CANDIDATE_FIELDS)
+            if not candidate_ids:
+                return []
+            docs = {doc["_id"]: doc for doc in self.collection.find({"_id": {"$in": candidate_ids}})}
+            return [docs[doc_id] for doc_id in candidate_ids if doc_id in docs]
+
+        # One $or/$in query resolving candidates for the whole batch
+        query_parts = []
+        for field in self.CANDIDATE_FIELDS:
+            values = sorted({getattr(host, field) for host in hosts if getattr(host, field)})
+            if values:
+                query_parts.append({field: {"$in": values}})
+
+        if not query_parts:
+            return []
+        return list(self.collection.find({"$or": query_parts}))
+
+    def _index_doc(self, lookup: Dict[Tuple[str, Any], List[Any]], doc: Dict[str, Any], remove: bool = False):
+        for field in self.CANDIDATE_FIELDS:
+            value = doc.get(field)
+            if not value:
+                continue
+            ids = lookup.setdefault((field, value), [])
+            if remove:
+                if doc["_id"] in ids:
+                    ids.remove(doc["_id"])
+            elif doc["_id"] not in ids:
+                ids.append(doc["_id"])
+
+    def _upsert_batch(self, hosts: List[UnifiedHost], stats: Dict[str, int]):
+        # Working set holds the current state of every document this batch can touch, including the
+        # ones inserted by earlier hosts of the same batch, so hosts are matched exactly as if they
+        # had been upserted one by one.
+        with self.metrics.stage("dedup_find", items=len(hosts)):
+            working: Dict[Any, Dict[str, Any]] = {doc["_id"]: doc for doc in self._find_batch_candidates(hosts)}
+        order = {doc_id: position for position, doc_id in enumerate(working)}
+        lookup: Dict[Tuple[str, Any], List[Any]] = {}
+        for doc in working.values():
+            self._index_doc(lookup, doc)
+
+        # Insertion-ordered so documents are written in the order they were created
+        new_ids: Dict[Any, None] = {}
+        updates: Dict[Any, List[Dict[str, Any]]] = {}
+
+        for host in hosts:
+            candidate_ids = set()
+            for field in self.CANDIDATE_FIELDS:
+                value = getattr(host, field)
+                if value:
+                    candidate_ids.update(lookup.get((field, value), []))
+
+            best_match, highest_score = self._best_match(
+                host, (working[doc_id] for doc_id in sorted(candidate_ids, key=order.__getitem__)))
+
+            if highest_score > self.CONFIDENCE_THRESHOLD:
+                update_operation = self._merge_if_changed(host, best_match)
+                if update_operation is None:
+                    stats["skipped"] += 1
+                    continue
+                self._index_doc(lookup, best_match, remove=True)
+                self._apply_set(best_match, update_operation["$set"])
+                self._index_doc(lookup, best_match)
+                if best_match["_id"] not in new_ids:
+                    updates.setdefault(best_match["_id"], []).append(update_operation)
+                stats["merged"] += 1
+            else:
+                doc = self._new_document(host)
+                doc["_id"] = ObjectId()
+                working[doc["_id"]] = doc
+                order[doc["_id"]] = len(order)
+                new_ids[doc["_id"]] = None
+                self._index_doc(lookup, doc)
+                stats["inserted"] += 1
+
+        operations = [InsertOne(working[doc_id]) for doc_id in new_ids]
+        for doc_id, doc_updates in updates.items():
+            if len(doc_updates) == 1:
+                operations.append(UpdateOne({"_id": doc_id}, doc_updates[0]))
+            else:
+                # Several merges into one document: write the final state of every field they touched
+                touched = {path.split(".")[0] for update in doc_updates for path in update["$set"]}
+                operations.append(UpdateOne({"_id": doc_id}, {"$set": {field: working[doc_id][field] for field in touched}}))
+
+        if operations:
+            with self.metrics.stage("write", items=len(operations)):
+                self.collection.bulk_write(operations, ordered=False)
+        if self.identity_index is not None:
+            for doc_id in list(new_ids) + list(updates):
+                self.identity_index.add(working[doc_id])
+        if self.metrics.verbose:
+            print(f"Bulk upsert of {len(hosts)} hosts: {len(new_ids)} inserted, {len(updates)} documents updated.")
+
+    def upsert_hosts_bulk(self, hosts: Iterable[UnifiedHost], batch_size: int = 500) -> Dict[str, int]:
+        """
+        Batched alternative to calling upsert_host for every host. Each batch resolves its candidates
+        with one query and applies all merges and inserts with one unordered bulk_write.
+        Returns counters of merged, skipped (unchanged) and inserted hosts.
+        """
+        stats = {"inserted": 0, "merged": 0, "skipped": 0}
+        batch: List[UnifiedHost] = []
+        for host in hosts:
+            batch.append(host)
+            if len(batch) >= batch_size:
+                self._upsert_batch(batch, stats)
+                batch = []
+        if batch:
+            self._upsert_batch(batch, stats)
+        return stats
@@ -0,0 +1,142 @@
+import sys
+from typing import Dict, Any, List, Iterable, Set
+from pymongo.collection import Collection
+from src.models.unified_host import UnifiedHost
+
+
+class IdentityIndex:
+    """
+    In-process copy of the identity fields of every document in unified_assets.
+
+    Keeps one hash map per deduplication field (value -> set of asset _ids) plus the identity
+    fields of each asset, so candidate lookup and match scoring need no database reads.
+    It is only correct while this process is the only writer of the collection: every insert and
+    merge has to be reported through add() / apply_set().
+    """
+
+    def __init__(self, fields: List[str]):
+        self.fields = list(fields)
+        self._by_field: Dict[str, Dict[Any, Set[Any]]] = {field: {} for field in self.fields}
+        # _id -> {"_id": ..., field: value}
+        self._identities: Dict[Any, Dict[str, Any]] = {}
+        # _id -> insertion position, so candidates come back in the collection's natural order
+        self._sequence: Dict[Any, int] = {}
+        self._next_sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._identities)
+
+    def warm(self, collection: Collection, batch_size: int = 10000):
+        """Rebuilds the index from a projection of the collection."""
+        print(f"Warming identity index from '{collection.name}'...")
+        self.clear()
+        projection = {field: 1 for field in self.fields}
+        for doc in collection.find({}, projection).batch_size(batch_size):
+            self.add(doc)
+        print(f"Identity index warmed with {len(self)} assets.")
+
+    def clear(self):
+        self._by_field = {field: {} for field in self.fields}
+        self._identities.clear()
+        self._sequence.clear()
+        self._next_sequence = 0
+
+    def add(self, doc: Dict[str, Any]):
+        """Indexes a document, replacing any previous entry for the same _id."""
+        doc_id = doc["_id"]
+        self._unindex(doc_id)
+        identity = {"_id": doc_id}
+        for field in self.fields:
+            value = doc.get(field)
+            if value is not None:
+                identity[field] = value
+                self._by_field[field].setdefault(value, set()).add(doc_id)
+        self._identities[doc_id] = identity
+        if doc_id not in self._sequence:
+            self._sequence[doc_id] = self._next_sequence
+            self._next_sequence += 1
+
+    def apply_set(self, doc_id: Any, set_fields: Dict[str, Any]):
+        """Reflects the identity fields of a $set payload that was written to the collection."""
+        identity = self._identities.get(doc_id)
+        if identity is None:
+            return
+        changed = {field: set_fields[field] for field in self.fields if field in set_fields}
+        if changed:
+            self.add({**identity, **changed})
+
+    def remove(self, doc_id: Any):
+        self._unindex(doc_id)
+        self._sequence.pop(doc_id, None)
+
+    def _unindex(self, doc_id: Any):
+        identity = self._identities.pop(doc_id, None)
+        if identity is None:
+            return
+        for field in self.fields:
+            value = identity.get(field)
+            if value is None:
+                continue
+            ids = self._by_field[field].get(value)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._by_field[field][value]
+
+    def candidate_ids(self, hosts: Iterable[UnifiedHost], lookup_fields: List[str]) -> List[Any]:
+        """_ids of every asset sharing a lookup field value with any of the hosts, in natural order."""
+        ids: Set[Any] = set()
+        for host in hosts:
+            for field in lookup_fields:
+                value = getattr(host, field, None)
+                if value:
+                    ids.update(self._by_field[field].get(value, ()))
+        return sorted(ids, key=self._sequence.__getitem__)
+
+    def find_candidates(self, host: UnifiedHost, lookup_fields: List[str]) -> List[Dict[str, Any]]:
+        """Identity documents of the candidates for a host; enough for scoring, not for merging."""
+        return [self._identities[doc_id] for doc_id in self.candidate_ids([host], lookup_fields)]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by the index (containers, keys and values)."""
+        _size = sys.getsizeof
+        maps_bytes = 0
+        for value_map in self._by_field.values():
+            maps_bytes += _size(value_map)
+            for value, ids in value_map.items():
+                maps_bytes += _size(value) + _size(ids) + sum(_size(doc_id) for doc_id in ids)
+
+        identities_bytes = _size(self._identities) + _size(self._sequence)
+        for identity in self._identities.values():
+            identities_bytes += _size(identity) + sum(_size(value) for value in identity.values())
+
+        return {
+            "assets": len(self),
+            "field_maps_bytes": maps_bytes,
+            "identities_bytes": identities_bytes,
+            "total_bytes": maps_bytes + identities_bytes,
+        }
+
+    def verify(self, collection: Collection, batch_size: int = 10000) -> List[str]:
+        """Compares the index against the collection; returns a description of every mismatch."""
+        problems = []
+        seen = set()
+        projection = {field: 1 for field in self.fields}
+        for doc in collection.find({}, projection).batch_size(batch_size):
+            doc_id = doc["_id"]
+            seen.add(doc_id)
+            identity = self._identities.get(doc_id)
+            if identity is None:
+                problems.append(f"Asset {doc_id} is missing from the identity index")
+                continue
+            for field in self.fields:
+                if identity.get(field) != doc.get(field):
+                    problems.append(f"Asset {doc_id}: index has {field}={identity.get(field)!r}, "
+                                    f"collection has {doc.get(field)!r}")
+                elif doc.get(field) is not None and doc_id not in self._by_field[field].get(doc[field], ()):
+                    problems.append(f"Asset {doc_id}: {field}={doc[field]!r} is not in the field map")
+
+        for doc_id in self._identities:
+            if doc_id not in seen:
+                problems.append(f"Asset {doc_id} is in the identity index but not in the collection")
+        return problems
@@ -0,0 +1,160 @@
+import itertools
+import zlib
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import bson
+from pymongo.database import Database
+
+from src.deduplication.deduplicator import Deduplicator
+from src.deduplication.identity_index import IdentityIndex
+from src.models.unified_host import UnifiedHost
+from src.pipeline.metrics import PIPELINE_METRICS, PipelineMetrics
+
+
+class OfflineDeduplicator(Deduplicator):
+    """
+    Merge-then-load deduplication for full re-syncs.
+
+    Hosts are matched and merged entirely in memory with the same DEDUPLICATION_RULES,
+    CONFIDENCE_THRESHOLD and _merge_hosts semantics as Deduplicator, without touching MongoDB.
+    load() then writes the consolidated set into a staging collection and swaps it in place of
+    unified_assets, so the live collection is replaced in one step. Assets that were already in
+    unified_assets keep their _id, matched through their identity keys (see ID_KEY_FIELDS).
+
+    To keep millions of hosts in a few GB, each consolidated document is held as zlib-compressed
+    BSON; only the identity fields live uncompressed, in an IdentityIndex.
+    """
+
+    STAGING_SUFFIX = "_staging"
+    # Besides the source record ids, the fields through which a consolidated document takes over the
+    # _id of an existing asset, strongest first
+    ID_KEY_FIELDS = ["cloud_instance_id", "primary_mac_address"]
+
+    def __init__(self, db: Database, collection_name: str = "unified_assets", compression_level: int = 1,
+                 metrics: Optional[PipelineMetrics] = None):
+        # Deliberately not calling Deduplicator.__init__: nothing is read from or written to
+        # the database until load()
+        self.metrics = metrics or PIPELINE_METRICS
+        self.db = db
+        self.collection_name = collection_name
+        self.collection = db[collection_name]
+        self.compression_level = compression_level
+        self.identity_index = IdentityIndex([rule["field"] for rule in self.DEDUPLICATION_RULES])
+        self.merge_stats = {"inserted": 0, "merged": 0, "skipped": 0}
+        self._documents: Dict[int, bytes] = {}
+        self._ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _pack(self, doc: Dict[str, Any]) -> bytes:
+        return zlib.compress(bson.encode(doc), self.compression_level)
+
+    def _unpack(self, doc_id: int) -> Dict[str, Any]:
+        return bson.decode(zlib.decompress(self._documents[doc_id]))
+
+    def upsert_host(self, host: UnifiedHost):
+        with self.metrics.stage("dedup_find"):
+            candidates = self.identity_index.find_candidates(host, self.CANDIDATE_FIELDS)
+
+        best_match, highest_score = self._best_match(host, candidates)
+
+        if highest_score > self.CONFIDENCE_THRESHOLD:
+            doc_id = best_match["_id"]
+            existing_doc = self._unpack(doc_id)
+            update_operation = self._merge_if_changed(host, existing_doc)
+            if update_operation is None:
+                return
+            self._apply_set(existing_doc, update_operation["$set"])
+            self._documents[doc_id] = self._pack(existing_doc)
+            self.identity_index.apply_set(doc_id, update_operation["$set"])
+        else:
+            doc = self._new_document(host)
+            doc["_id"] = next(self._ids)
+            self._documents[doc["_id"]] = self._pack(doc)
+            self.identity_index.add(doc)
+
+    def upsert_hosts_bulk(self, hosts: Iterable[UnifiedHost], batch_size: int = 500) -> Dict[str, int]:
+        # Everything is already in memory, so batching buys nothing here
+        before = dict(self.merge_stats)
+        for host in hosts:
+            self.upsert_host(host)
+        return {key: self.merge_stats[key] - before[key] for key in before}
+
+    def documents(self) -> Iterator[Dict[str, Any]]:
+        """Consolidated documents in creation order, without the internal _id."""
+        for doc_id in self._documents:
+            doc = self._unpack(doc_id)
+            del doc["_id"]
+            yield doc
+
+    def memory_usage(self) -> Dict[str, int]:
+        documents_bytes = sum(len(packed) for packed in self._documents.values())
+        index_usage = self.identity_index.memory_usage()
+        return {
+            "assets": len(self),
+            "documents_bytes": documents_bytes,
+            "index_bytes": index_usage["total_bytes"],
+            "total_bytes": documents_bytes + index_usage["total_bytes"],
+        }
+
+    def _identity_keys(self, doc: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        keys = [(f"source_ids.{key}", value) for key, value in (doc.get("source_ids") or {}).items() if value]
+        keys.extend((field, doc[field]) for field in self.ID_KEY_FIELDS if doc.get(field))
+        return keys
+
+    def _existing_ids(self, batch_size: int = 10000) -> Dict[Tuple[str, Any], Any]:
+        """_id of the assets in the live collection by each of their identity keys; the first asset wins."""
+        existing_ids = {}
+        projection = {"source_ids": 1, **{field: 1 for field in self.ID_KEY_FIELDS}}
+        for doc in self.collection.find({}, projection).batch_size(batch_size):
+            for key in self._identity_keys(doc):
+                existing_ids.setdefault(key, doc["_id"])
+        return existing_ids
+
+    def load(self, batch_size: int = 1000) -> int:
+        """
+        Writes all consolidated documents to a staging collection, builds its indexes and renames it
+        over the target collection. A document that shares an identity key with an asset of the target
+        collection is written under that asset's _id, so references to existing assets stay valid;
+        each existing _id is reused at most once. Returns the number of documents loaded.
+        """
+        existing_ids = self._existing_ids()
+        kept_ids = set()
+        staging = self.db[self.collection_name + self.STAGING_SUFFIX]
+        staging.drop()
+        print(f"Loading {len(self)} consolidated hosts into '{staging.name}'...")
+
+        batch = []
+        loaded = 0
+        for doc in self.documents():
+            for key in self._identity_keys(doc):
+                doc_id = existing_ids.get(key)
+                if doc_id is not None and doc_id not in kept_ids:
+                    doc["_id"] = doc_id
+                    kept_ids.add(doc_id)
+                    break
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                with self.metrics.stage("write", items=len(batch)):
+                    staging.insert_many(batch, ordered=False)
+                loaded += len(batch)
+                batch = []
+        if batch:
+            with self.metrics.stage("write", items=len(batch)):
+                staging.insert_many(batch, ordered=False)
+            loaded += len(batch)
+
+        if not loaded:
+            # An empty fetch must not wipe the live inventory
+            staging.drop()
+            print(f"No consolidated hosts to load; '{self.collection_name}' left unchanged.")
+            return 0
+
+        # Build the deduplication indexes before the swap so the live collection never lacks them
+        self.collection = staging
+        self._ensure_indexes()
+        staging.rename(self.collection_name, dropTarget=True)
+        self.collection = self.db[self.collection_name]
+        print(f"Swapped '{staging.name}' into '{self.collection_name}' ({loaded} hosts, {len(kept_ids)} existing _ids kept).")
+        return loaded
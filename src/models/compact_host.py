@@ -0,0 +1,172 @@
+import sys
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from src.models.sources import SourceSet, mask_to_sources
+from src.models.unified_host import NetworkInterface, Software, UnifiedHost
+
+# Low-cardinality host fields whose strings are interned, so hosts share one copy of each value
+INTERNED_HOST_FIELDS = frozenset({"os_name", "os_platform", "kernel_version", "manufacturer", "product_model",
+                                  "processor_info", "default_gateway"})
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+class PackedModel:
+    """A nested model (cloud context, security info, tag, ...) reduced to its class and a tuple of field values."""
+    __slots__ = ("model", "values")
+
+    def __init__(self, model: Type[BaseModel], values: Tuple[Any, ...]):
+        self.model = model
+        self.values = values
+
+    def __reduce__(self):
+        return PackedModel, (self.model, self.values)
+
+    @classmethod
+    def pack(cls, value: Any) -> Any:
+        if isinstance(value, BaseModel):
+            return cls(type(value), tuple(cls.pack(getattr(value, name)) for name in type(value).model_fields))
+        if isinstance(value, list):
+            return [cls.pack(item) for item in value]
+        return value
+
+    @staticmethod
+    def unpack(value: Any) -> Any:
+        if isinstance(value, PackedModel):
+            fields = {name: PackedModel.unpack(item) for name, item in zip(value.model.model_fields, value.values)}
+            return value.model(**fields)
+        if isinstance(value, list):
+            return [PackedModel.unpack(item) for item in value]
+        return value
+
+    @staticmethod
+    def to_document(value: Any) -> Any:
+        if isinstance(value, PackedModel):
+            return {name: PackedModel.to_document(item) for name, item in zip(value.model.model_fields, value.values)}
+        if isinstance(value, list):
+            return [PackedModel.to_document(item) for item in value]
+        if isinstance(value, dict):
+            return dict(value)
+        return value
+
+
+class CompactSoftware:
+    """installed_software entry with interned strings and a source bitmask instead of a sources list."""
+    __slots__ = ("vendor", "product", "version", "sources")
+
+    def __init__(self, vendor: Optional[str], product: str, version: Optional[str], sources: int):
+        self.vendor = _intern(vendor)
+        self.product = _intern(product)
+        self.version = _intern(version)
+        self.sources = sources
+
+    def __reduce__(self):
+        # Unpickling goes through __init__, so strings are interned again in the receiving process
+        return CompactSoftware, (self.vendor, self.product, self.version, self.sources)
+
+    @classmethod
+    def from_model(cls, software: Software) -> "CompactSoftware":
+        return cls(software.vendor, software.product, software.version, SourceSet.coerce(software.sources).mask)
+
+    def to_model(self) -> Software:
+        return Software(vendor=self.vendor, product=self.product, version=self.version,
+                        sources=SourceSet.from_mask(self.sources))
+
+    def to_document(self) -> Dict[str, Any]:
+        return {"vendor": self.vendor, "product": self.product, "version": self.version,
+                "sources": mask_to_sources(self.sources)}
+
+
+class CompactInterface:
+    """network_interfaces entry with a source bitmask instead of a sources list."""
+    __slots__ = ("mac_address", "private_ip_v4", "public_ip_v4", "ip_v6", "sources")
+
+    def __init__(self, mac_address: Optional[str], private_ip_v4: Optional[str], public_ip_v4: Optional[str],
+                 ip_v6: Optional[str], sources: int):
+        self.mac_address = mac_address
+        self.private_ip_v4 = private_ip_v4
+        self.public_ip_v4 = public_ip_v4
+        self.ip_v6 = ip_v6
+        self.sources = sources
+
+    def __reduce__(self):
+        return CompactInterface, (self.mac_address, self.private_ip_v4, self.public_ip_v4, self.ip_v6, self.sources)
+
+    @classmethod
+    def from_model(cls, interface: NetworkInterface) -> "CompactInterface":
+        return cls(interface.mac_address, interface.private_ip_v4, interface.public_ip_v4, interface.ip_v6,
+                   SourceSet.coerce(interface.sources).mask)
+
+    def to_model(self) -> NetworkInterface:
+        return NetworkInterface(mac_address=self.mac_address, private_ip_v4=self.private_ip_v4,
+                                public_ip_v4=self.public_ip_v4, ip_v6=self.ip_v6, sources=SourceSet.from_mask(self.sources))
+
+    def to_document(self) -> Dict[str, Any]:
+        return {"mac_address": self.mac_address, "private_ip_v4": self.private_ip_v4,
+                "public_ip_v4": self.public_ip_v4, "ip_v6": self.ip_v6, "sources": mask_to_sources(self.sources)}
+
+
+class CompactHost:
+    """
+    Memory-compact form of a UnifiedHost for hosts that are buffered in flight (normalization
+    results waiting for deduplication, batches).
+
+    One slot per UnifiedHost field; installed_software and network_interfaces become tuples of
+    slotted records with interned strings and source bitmasks, and low-cardinality host strings are
+    interned. Nested models (cloud context, security info) are packed into PackedModel tuples. Convert at
+    the edges only: from_unified / from_document on the way in, to_unified / to_document on the way out.
+
+    Measured on the synthetic fleet (benchmarks/compact_host_benchmark.py), a CompactHost takes 3.7x
+    (CrowdStrike) to 6.0x (Tenable) less memory than the UnifiedHost, and pickles 1.5x (CrowdStrike)
+    to 3.2x (Qualys, Tenable) smaller. CrowdStrike hosts carry no software and mostly per-host strings,
+    which are kept as they are, so there is little to compact in them.
+    """
+    __slots__ = tuple(UnifiedHost.model_fields)
+
+    @classmethod
+    def from_unified(cls, host: UnifiedHost) -> "CompactHost":
+        compact = cls.__new__(cls)
+        for name in cls.__slots__:
+            value = getattr(host, name)
+            if name == "installed_software":
+                value = tuple(CompactSoftware.from_model(software) for software in value)
+            elif name == "network_interfaces":
+                value = tuple(CompactInterface.from_model(interface) for interface in value)
+            elif name in INTERNED_HOST_FIELDS:
+                value = _intern(value)
+            elif isinstance(value, BaseModel):
+                value = PackedModel.pack(value)
+            setattr(compact, name, value)
+        return compact
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "CompactHost":
+        """From a unified_assets document (or model_dump output); keys that are not host fields are ignored."""
+        return cls.from_unified(UnifiedHost.model_validate({k: v for k, v in doc.items() if k in cls.__slots__}))
+
+    def to_unified(self) -> UnifiedHost:
+        fields = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name in ("installed_software", "network_interfaces"):
+                value = [item.to_model() for item in value]
+            else:
+                value = PackedModel.unpack(value)
+            fields[name] = value
+        return UnifiedHost(**fields)
+
+    def to_document(self) -> Dict[str, Any]:
+        """The document UnifiedHost.model_dump() would produce, without building the models."""
+        doc = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name in ("installed_software", "network_interfaces"):
+                value = [item.to_document() for item in value]
+            else:
+                value = PackedModel.to_document(value)
+            doc[name] = value
+        return doc
@@ -0,0 +1,148 @@
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
+
+# The known sources get fixed bits, in alphabetical order, so that masks mean the same in every
+# process and iterating the bits yields the names sorted
+KNOWN_SOURCES = ("CrowdStrike", "Qualys", "Tenable")
+
+_SOURCE_BITS: Dict[str, int] = {name: 1 << index for index, name in enumerate(KNOWN_SOURCES)}
+_BIT_NAMES: Dict[int, str] = {bit: name for name, bit in _SOURCE_BITS.items()}
+# mask -> sorted source names
+_MASK_NAMES: Dict[int, Tuple[str, ...]] = {0: ()}
+
+
+def source_bit(name: str) -> int:
+    """
+    Bit of a source name. Names outside KNOWN_SOURCES are given the next free bit on first use;
+    those bits are only meaningful inside the process that assigned them.
+    """
+    bit = _SOURCE_BITS.get(name)
+    if bit is None:
+        bit = 1 << len(_SOURCE_BITS)
+        _SOURCE_BITS[name] = bit
+        _BIT_NAMES[bit] = name
+    return bit
+
+
+def sources_to_mask(names: Iterable[str]) -> int:
+    mask = 0
+    for name in names:
+        mask |= source_bit(name)
+    return mask
+
+
+def mask_to_names(mask: int) -> Tuple[str, ...]:
+    """Sorted source names of a mask."""
+    names = _MASK_NAMES.get(mask)
+    if names is None:
+        names = tuple(sorted(_BIT_NAMES[bit] for bit in _BIT_NAMES if mask & bit))
+        _MASK_NAMES[mask] = names
+    return names
+
+
+def mask_to_sources(mask: int) -> List[str]:
+    """Sorted source names of a mask as a new list, the form stored in MongoDB."""
+    return list(mask_to_names(mask))
+
+
+class SourceSet:
+    """
+    Immutable set of source names backed by a bitmask; one shared instance per mask.
+
+    Membership tests, unions and removals are single bit operations. Pydantic fields of this type
+    accept a list of names (or a SourceSet) and serialize to the sorted list of names, which is the
+    form stored in MongoDB.
+    """
+    __slots__ = ("mask",)
+    _instances: Dict[int, "SourceSet"] = {}
+    _by_names: Dict[Tuple[str, ...], "SourceSet"] = {}
+
+    def __new__(cls, names: Iterable[str] = ()) -> "SourceSet":
+        return cls.from_mask(sources_to_mask(names))
+
+    @classmethod
+    def from_mask(cls, mask: int) -> "SourceSet":
+        instance = cls._instances.get(mask)
+        if instance is None:
+            instance = object.__new__(cls)
+            object.__setattr__(instance, "mask", mask)
+            cls._instances[mask] = instance
+        return instance
+
+    @classmethod
+    def coerce(cls, value: Any) -> "SourceSet":
+        if isinstance(value, SourceSet):
+            return value
+        if value is None:
+            return cls.from_mask(0)
+        if isinstance(value, str):
+            return cls.from_mask(source_bit(value))
+        # Stored documents repeat the same few name lists, so resolve each distinct list once
+        names = tuple(value)
+        instance = cls._by_names.get(names)
+        if instance is None:
+            instance = cls._by_names[names] = cls(names)
+        return instance
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("SourceSet is immutable")
+
+    def __reduce__(self):
+        return SourceSet, (self.names(),)
+
+    def __contains__(self, name: str) -> bool:
+        bit = _SOURCE_BITS.get(name)
+        return bit is not None and bool(self.mask & bit)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(mask_to_names(self.mask))
+
+    def __len__(self) -> int:
+        return bin(self.mask).count("1")
+
+    def __bool__(self) -> bool:
+        return bool(self.mask)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, SourceSet):
+            return self.mask == other.mask
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.mask)
+
+    def __or__(self, other: Any) -> "SourceSet":
+        return SourceSet.from_mask(self.mask | SourceSet.coerce(other).mask)
+
+    def add(self, name: str) -> "SourceSet":
+        """A SourceSet with `name` added (the set itself is immutable)."""
+        return SourceSet.from_mask(self.mask | source_bit(name))
+
+    def discard(self, name: str) -> "SourceSet":
+        """A SourceSet without `name`."""
+        return SourceSet.from_mask(self.mask & ~_SOURCE_BITS.get(name, 0))
+
+    def names(self) -> Tuple[str, ...]:
+        return mask_to_names(self.mask)
+
+    def to_list(self) -> List[str]:
+        return list(mask_to_names(self.mask))
+
+    def __repr__(self) -> str:
+        return f"SourceSet({list(self.names())!r})"
+
+    @staticmethod
+    def serialize(value: Any) -> List[str]:
+        # Models built without validation may still hold a plain list
+        return value.to_list() if isinstance(value, SourceSet) else list(value)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.coerce,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.serialize, return_schema=core_schema.list_schema(core_schema.str_schema())
+            ),
+        )
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 
+from src.models.sources import SourceSet
+
 
 class NetworkInterface(BaseModel):
     """Represents a single network interface on the host."""
@@ -8,7 +10,7 @@ class NetworkInterface(BaseModel):
     private_ip_v4: Optional[str] = None
     public_ip_v4: Optional[str] = None
     ip_v6: Optional[str] = None
-    sources: List[str] = Field(default_factory=list)
+    sources: SourceSet = Field(default_factory=SourceSet)
 
 
 class CloudContext(BaseModel):
@@ -74,7 +76,7 @@ class Software(BaseModel):
     vendor: Optional[str] = None
     product: str
     version: Optional[str] = None
-    sources: List[str] = Field(default_factory=list)
+    sources: SourceSet = Field(default_factory=SourceSet)
 
 
 class UnifiedHost(BaseModel):
@@ -118,3 +120,9 @@ class UnifiedHost(BaseModel):
     # --- Metadata ---
     record_created_at: Optional[str] = None
     record_last_updated_at: Optional[str] = None
+    # Hash of the last merged slice per source ({"Qualys": "..."}), used to skip no-op merges
+    source_fingerprints: Dict[str, str] = Field(default_factory=dict)
+    # Counter bumped by every merge, and its value after each source's last merge; a fingerprint only
+    # allows skipping a merge while no source earlier in the merge order has written since
+    write_version: int = 0
+    source_versions: Dict[str, int] = Field(default_factory=dict)
@@ -1,5 +1,6 @@
 import datetime
-from typing import Dict, Any, Optional, List
+import functools
+from typing import Dict, Any, Callable, Iterable, Optional, List, Tuple
 
 from src.models.unified_host import (
     UnifiedHost,
@@ -10,57 +11,134 @@ from src.models.unified_host import (
     Software,
     TenableSecurityInfo, TenableTag, TenableMitigation
 )
+from src.models.sources import SourceSet
+
+PRIVATE_IPV4_PREFIXES = ('10.', '172.', '192.168.')
+
+QUALYS_SOURCES = SourceSet(["Qualys"])
+CROWDSTRIKE_SOURCES = SourceSet(["CrowdStrike"])
+TENABLE_SOURCES = SourceSet(["Tenable"])
+
+
+# Bounds of the parse caches; CPE and OS strings repeat across the fleet, so a few thousand entries cover most hosts
+CPE_CACHE_SIZE = 65536
+OS_CACHE_SIZE = 4096
+
+
+# --- Parsing helpers, shared by every host instead of being redefined per call ---
+@functools.lru_cache(maxsize=CPE_CACHE_SIZE)
+def _parse_cpe_components(cpe_string: str) -> Optional[Tuple[str, str, str]]:
+    # Cached as an immutable (vendor, product, version) tuple; every host still gets its own Software
+    parts = cpe_string.split(":")
+    if len(parts) >= 5:
+        return parts[2], parts[3], parts[4]
+    return None
+
+
+def _parse_cpe(cpe_string: str) -> Optional[Software]:
+    try:
+        components = _parse_cpe_components(cpe_string)
+    except Exception:
+        return None
+    if components is None:
+        return None
+    vendor, product, version = components
+    return Software(
+        vendor=vendor,
+        product=product,
+        version=version,
+        sources=TENABLE_SOURCES
+    )
+
+
+@functools.lru_cache(maxsize=OS_CACHE_SIZE)
+def _parse_os(os_str: str) -> Tuple[str, str, Optional[str]]:
+    os_nam = os_str
+    platform = "Unknown"
+    kernel = None
+
+    if " on " in os_str:
+        parts = os_str.split(" on ")
+        os_nam = parts[1]
+        kernel_part = parts[0]
+        if "Kernel" in kernel_part:
+            kernel = kernel_part.split("Kernel ")[1]
+
+    if "Linux" in os_nam:
+        platform = "Linux"
+    elif "Windows" in os_nam:
+        platform = "Windows"
+
+    return os_nam, platform, kernel
+
+
+_PARSE_CACHES = {"cpe": _parse_cpe_components, "os": _parse_os}
+
+
+def _safe_get_list(data: Dict, key: str) -> List:
+    return data.get(key, {}).get('list', [])
+
+
+def _get_aws_ec2_info(sources: List) -> Dict:
+    for source in sources:
+        if 'Ec2AssetSourceSimple' in source:
+            return source.get('Ec2AssetSourceSimple', {})
+    return {}
+
+
+def _timestamp() -> str:
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
 
 class HostNormalizer:
-    def normalize_host(self, raw_host: Dict[str, Any], source: str) -> Optional[UnifiedHost]:
-        if source == "Qualys":
-            return self._normalize_qualys_host(raw_host)
-        elif source == "CrowdStrike":
-            return self._normalize_crowdstrike_host(raw_host)
-        elif source == "Tenable":
-            return self._normalize_tenable_host(raw_host)
-        else:
+    # Source name -> normalizer method, resolved once per batch
+    NORMALIZERS = {
+        "Qualys": "_normalize_qualys_host",
+        "CrowdStrike": "_normalize_crowdstrike_host",
+        "Tenable": "_normalize_tenable_host",
+    }
+
+    @staticmethod
+    def cache_stats() -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters of the CPE and OS string parse caches in this process."""
+        stats = {}
+        for name, cache in _PARSE_CACHES.items():
+            info = cache.cache_info()
+            stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+        return stats
+
+    @staticmethod
+    def clear_caches():
+        for cache in _PARSE_CACHES.values():
+            cache.cache_clear()
+
+    def _normalizer_for(self, source: str) -> Optional[Callable[[Dict[str, Any], Optional[str]], Optional[UnifiedHost]]]:
+        method_name = self.NORMALIZERS.get(source)
+        if method_name is None:
             print(f"Warning: No normalizer available for source: {source}")
             return None
+        return getattr(self, method_name)
 
-    def _normalize_tenable_host(self, raw_host: Dict[str, Any]) -> Optional[UnifiedHost]:
+    def normalize_host(self, raw_host: Dict[str, Any], source: str) -> Optional[UnifiedHost]:
+        normalizer = self._normalizer_for(source)
+        return normalizer(raw_host) if normalizer else None
+
+    def normalize_batch(self, raw_hosts: Iterable[Dict[str, Any]], source: str) -> List[Optional[UnifiedHost]]:
+        """
+        Normalizes a batch of hosts from one source, one result (or None) per input in the same order.
+        The source normalizer is resolved once and all hosts of the batch share one record timestamp.
+        """
+        raw_hosts = list(raw_hosts)
+        normalizer = self._normalizer_for(source)
+        if normalizer is None:
+            return [None] * len(raw_hosts)
+        now = _timestamp()
+        return [normalizer(raw_host, now) for raw_host in raw_hosts]
+
+    def _normalize_tenable_host(self, raw_host: Dict[str, Any], now: Optional[str] = None) -> Optional[UnifiedHost]:
         if not raw_host:
             return None
 
-        # Helper functions
-        def _parse_cpe(cpe_string: str) -> Optional[Software]:
-            try:
-                parts = cpe_string.split(":")
-                if len(parts) >= 5:
-                    return Software(
-                        vendor=parts[2],
-                        product=parts[3],
-                        version=parts[4],
-                        sources=['Tenable']
-                    )
-            except Exception:
-                return None
-
-        def _parse_os(os_str: str) -> tuple[str, str, str]:
-            os_nam = os_str
-            platform = "Unknown"
-            kernel = None
-
-            if " on " in os_str:
-                parts = os_str.split(" on ")
-                os_nam = parts[1]
-                kernel_part = parts[0]
-                if "Kernel" in kernel_part:
-                    kernel = kernel_part.split("Kernel ")[1]
-
-            if "Linux" in os_nam:
-                platform = "Linux"
-            elif "Windows" in os_nam:
-                platform = "Windows"
-
-            return os_nam, platform, kernel
-
-
         # --- Data Extraction ---
         os_string = raw_host.get("operating_systems")[0]
         os_name, os_platform, kernel_version = _parse_os(os_string)
@@ -122,12 +200,12 @@ class HostNormalizer:
         ipv6_addresses = raw_host.get("ipv6_addresses", [])
 
         network_interfaces = [
-            NetworkInterface(mac_address=mac, sources=['Tenable']) for mac in mac_addresses
+            NetworkInterface(mac_address=mac, sources=TENABLE_SOURCES) for mac in mac_addresses
         ]
 
         if network_interfaces:
             # Separate public and private IPs
-            private_ips = [ip for ip in ipv4_addresses if ip.startswith(('10.', '172.', '192.168.'))]
+            private_ips = [ip for ip in ipv4_addresses if ip.startswith(PRIVATE_IPV4_PREFIXES)]
             public_ips = [ip for ip in ipv4_addresses if ip not in private_ips]
 
             if private_ips:
@@ -138,7 +216,7 @@ class HostNormalizer:
                 network_interfaces[0].ip_v6 = ipv6_addresses[0]
 
         # --- Assemble the UnifiedHost object ---
-        now = datetime.datetime.utcnow().isoformat() + "Z"
+        now = now or _timestamp()
         unified_host = UnifiedHost(
             primary_mac_address=raw_host.get('display_mac_address'),
             cloud_instance_id=raw_host.get('aws_ec2_instance_id'),
@@ -159,20 +237,10 @@ class HostNormalizer:
         return unified_host
 
 
-    def _normalize_qualys_host(self, raw_host: Dict[str, Any]) -> Optional[UnifiedHost]:
+    def _normalize_qualys_host(self, raw_host: Dict[str, Any], now: Optional[str] = None) -> Optional[UnifiedHost]:
         if not raw_host:
             return None
 
-        # --- Helper functions for safe data extraction ---
-        def _safe_get_list(data: Dict, key: str) -> List:
-            return data.get(key, {}).get('list', [])
-
-        def _get_aws_ec2_info(sources: List) -> Dict:
-            for source in sources:
-                if 'Ec2AssetSourceSimple' in source:
-                    return source.get('Ec2AssetSourceSimple', {})
-            return {}
-
         # --- Data Extraction ---
         agent_info = raw_host.get('agentInfo', {})
         ec2_info = _get_aws_ec2_info(_safe_get_list(raw_host, 'sourceInfo'))
@@ -210,7 +278,7 @@ class HostNormalizer:
                     "private_ip_v4": None,
                     "public_ip_v4": None,
                     "ip_v6": None,
-                    "sources": ['Qualys']
+                    "sources": QUALYS_SOURCES
                 }
 
             if iface.get('gatewayAddress'):
@@ -219,7 +287,7 @@ class HostNormalizer:
             if address:
                 if ':' in address:  # IPv6
                     grouped_interfaces[mac]['ip_v6'] = address
-                elif address.startswith(('10.', '172.', '192.168.')):  # Private IPv4
+                elif address.startswith(PRIVATE_IPV4_PREFIXES):  # Private IPv4
                     grouped_interfaces[mac]['private_ip_v4'] = address
                 else:  # Assumed Public IPv4
                     grouped_interfaces[mac]['public_ip_v4'] = address
@@ -255,7 +323,7 @@ class HostNormalizer:
             Software(
                 product=sw.get('HostAssetSoftware', {}).get('name'),
                 version=sw.get('HostAssetSoftware', {}).get('version'),
-                sources=['Qualys']
+                sources=QUALYS_SOURCES
             )
             for sw in _safe_get_list(raw_host, 'software')
             if sw.get('HostAssetSoftware', {}).get('name')
@@ -275,7 +343,7 @@ class HostNormalizer:
         ) if ec2_info else None
 
         # --- Assemble the UnifiedHost object ---
-        now = datetime.datetime.utcnow().isoformat() + "Z"
+        now = now or _timestamp()
         unified_host = UnifiedHost(
             primary_mac_address=primary_mac,
             cloud_instance_id=ec2_info.get('instanceId'),
@@ -302,7 +370,7 @@ class HostNormalizer:
         return unified_host
 
 
-    def _normalize_crowdstrike_host(self, raw_host: Dict[str, Any]) -> Optional[UnifiedHost]:
+    def _normalize_crowdstrike_host(self, raw_host: Dict[str, Any], now: Optional[str] = None) -> Optional[UnifiedHost]:
         if not raw_host:
             return None
 
@@ -331,7 +399,7 @@ class HostNormalizer:
         ) if raw_host.get('service_provider') else None
 
         # --- Assemble the UnifiedHost object ---
-        now = datetime.datetime.utcnow().isoformat() + "Z"
+        now = now or _timestamp()
         unified_host = UnifiedHost(
             primary_mac_address=raw_host.get('mac_address', '').replace('-', ':'),
             cloud_instance_id=raw_host.get('instance_id'),
@@ -351,7 +419,7 @@ class HostNormalizer:
             network_interfaces=[
                 NetworkInterface(mac_address=raw_host.get('mac_address', '').replace('-', ':'),
                                  private_ip_v4=raw_host.get('local_ip', ''),
-                                 sources=['CrowdStrike'])
+                                 sources=CROWDSTRIKE_SOURCES)
             ],
             cloud_context=cloud_context,
             crowdstrike_security=crowdstrike_security,
@@ -0,0 +1,222 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from src.deduplication.deduplicator import Deduplicator
+from src.models.unified_host import UnifiedHost
+from src.pipeline.incremental_sync import IncrementalSync
+from src.pipeline.parallel_normalizer import ParallelNormalizer
+
+
+class SourceProgress:
+    """Thread-safe progress counters for a single source."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.fetched = 0
+        self.processed = 0
+        self.unchanged = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def mark_started(self):
+        with self._lock:
+            self.started_at = time.perf_counter()
+
+    def mark_fetched(self):
+        with self._lock:
+            self.fetched += 1
+
+    def mark_processed(self):
+        with self._lock:
+            self.processed += 1
+
+    def mark_unchanged(self):
+        with self._lock:
+            self.unchanged += 1
+
+    def mark_done(self, error: Optional[BaseException] = None):
+        with self._lock:
+            self.done = True
+            self.error = error
+            self.finished_at = time.perf_counter()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+            return {
+                "source": self.source,
+                "fetched": self.fetched,
+                "processed": self.processed,
+                "unchanged": self.unchanged,
+                "done": self.done,
+                "error": repr(self.error) if self.error else None,
+                "fetch_seconds": round(elapsed, 3) if elapsed is not None else None,
+            }
+
+
+class ConcurrentPipeline:
+    """
+    Fetches all sources at the same time and feeds a single normalize -> deduplicate stage.
+
+    Fetching runs on a thread pool, one task per source, each pushing raw hosts into its own queue.
+    The shared stage drains those queues strictly in the order the sources were given, so
+    Deduplicator.upsert_host sees hosts in exactly the same order as the serial pipeline and
+    produces the same merge result. While the first source is being merged, the others keep
+    downloading in the background. Normalization can be moved to a process pool by passing a
+    ParallelNormalizer with workers; it keeps the order of the hosts.
+    """
+
+    _END_OF_SOURCE = object()
+
+    def __init__(self, deduplicator: Deduplicator, max_workers: Optional[int] = None,
+                 queue_size: int = 0, progress_interval: int = 100, batch_size: int = 0,
+                 sync: Optional[IncrementalSync] = None, normalizer: Optional[ParallelNormalizer] = None):
+        self.deduplicator = deduplicator
+        # Normalization stage between the fetch queues and deduplication (in-thread by default)
+        self.normalizer = normalizer or ParallelNormalizer()
+        # Optional incremental sync: skips unchanged source records and checkpoints progress
+        self.sync = sync
+        self.max_workers = max_workers
+        # 0 upserts host by host, otherwise hosts are deduplicated in bulk batches of this size
+        self.batch_size = batch_size
+        # 0 means unbounded; a bound caps memory at the cost of pausing fetchers of later sources
+        self.queue_size = queue_size
+        self.progress_interval = progress_interval
+        self.progress: Dict[str, SourceProgress] = {}
+        self._stop = threading.Event()
+
+    def _fetch_source(self, client, source: str, host_queue: queue.Queue, progress: SourceProgress,
+                      fetch_arguments: Dict[str, Any]):
+        progress.mark_started()
+        error = None
+        try:
+            for fetched, raw_host in enumerate(client.fetch_hosts(**fetch_arguments), start=1):
+                # The resume position is read here, while the client is still on this host's page
+                position = self.sync.position(source, client, fetched) if self.sync else None
+                if not self._put(host_queue, (raw_host, position)):
+                    return
+                progress.mark_fetched()
+        except Exception as e:
+            print(f"Fetching {source} failed: {e}")
+            error = e
+        finally:
+            progress.mark_done(error)
+            self._put(host_queue, self._END_OF_SOURCE)
+
+    def _put(self, host_queue: queue.Queue, item) -> bool:
+        # Bounded queues must not block forever if the processing stage has failed
+        while not self._stop.is_set():
+            try:
+                host_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _queued_hosts(self, source: str, host_queue: queue.Queue,
+                      pending: Deque[Tuple[Dict[str, Any], Optional[Dict[str, Any]], bool]]) -> Iterator[Optional[Dict[str, Any]]]:
+        # Raw hosts to normalize, in queue order; unchanged hosts are passed on as None placeholders
+        while True:
+            item = host_queue.get()
+            if item is self._END_OF_SOURCE:
+                return
+            raw_host, position = item
+            changed = not self.sync or self.sync.is_changed(source, raw_host)
+            pending.append((raw_host, position, changed))
+            yield raw_host if changed else None
+
+    def _normalized_hosts(self, source: str, host_queue: queue.Queue, progress: SourceProgress) -> Iterator[UnifiedHost]:
+        # Once a whole write unit has been handed to the deduplicator, everything before it is written
+        write_unit = self.batch_size or 1
+        yielded = 0
+        # Source hosts taken off the queue, and how many of them the last checkpoint covered
+        handled = 0
+        checkpointed = 0
+        position = None
+        pending = deque()
+        raw_hosts = self._queued_hosts(source, host_queue, pending)
+        for normalized_host in self.normalizer.normalize(source, raw_hosts):
+            if self.sync and position is not None and yielded % write_unit == 0:
+                self.sync.checkpoint(source, position, hosts=handled - checkpointed)
+                checkpointed = handled
+            raw_host, position, changed = pending.popleft()
+            handled += 1
+            self._last_position[source] = position
+
+            if not changed:
+                progress.mark_unchanged()
+                continue
+
+            if normalized_host:
+                if self.sync:
+                    self.sync.mark_processed(source, raw_host)
+                yield normalized_host
+                yielded += 1
+                progress.mark_processed()
+                if self.progress_interval and progress.processed % self.progress_interval == 0:
+                    self.report_progress()
+
+    def _process_source_queue(self, source: str, host_queue: queue.Queue, progress: SourceProgress):
+        print(f"\n--- Processing source: {source} ---")
+        normalized_hosts = self._normalized_hosts(source, host_queue, progress)
+        if self.batch_size:
+            self.deduplicator.upsert_hosts_bulk(normalized_hosts, batch_size=self.batch_size)
+        else:
+            for normalized_host in normalized_hosts:
+                self.deduplicator.upsert_host(normalized_host)
+        if self.sync:
+            self.sync.finish_source(source, position=self._last_position.get(source), completed=progress.error is None)
+        throughput = self.normalizer.throughput(source)
+        print(f"--- Finished {source}. Processed {progress.processed} hosts, {progress.unchanged} unchanged. "
+              f"Normalization: {throughput['normalize_hosts_per_second']} hosts/s per worker. ---")
+
+    def report_progress(self):
+        for progress in self.progress.values():
+            snap = progress.snapshot()
+            state = "done" if snap["done"] else "fetching"
+            print(f"[progress] {snap['source']}: fetched={snap['fetched']} processed={snap['processed']} "
+                  f"unchanged={snap['unchanged']} ({state})")
+
+    def run(self, sources: List[Tuple[Any, str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Runs the pipeline for the given (client, source_name) pairs.
+        Sources are merged in the order given; returns per-source progress counters.
+        """
+        self._stop.clear()
+        self.progress = {source: SourceProgress(source) for _, source in sources}
+        self._last_position: Dict[str, Optional[Dict[str, Any]]] = {}
+        fetch_arguments = {source: self.sync.start_source(source) if self.sync else {} for _, source in sources}
+        queues = {source: queue.Queue(maxsize=self.queue_size) for _, source in sources}
+        workers = self.max_workers or len(sources)
+
+        print(f"Starting concurrent fetch of {len(sources)} sources with {workers} worker(s).")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+            # Submission order matches consumption order, so a bounded queue can never deadlock
+            # even when there are fewer workers than sources.
+            for client, source in sources:
+                executor.submit(self._fetch_source, client, source, queues[source], self.progress[source],
+                                fetch_arguments[source])
+
+            try:
+                with self.normalizer:
+                    for _, source in sources:
+                        self._process_source_queue(source, queues[source], self.progress[source])
+            except BaseException:
+                self._stop.set()
+                raise
+
+        self.report_progress()
+        print(f"Parse cache stats: {self.normalizer.cache_stats()}")
+        return {
+            source: {**progress.snapshot(), **self.normalizer.throughput(source)}
+            for source, progress in self.progress.items()
+        }
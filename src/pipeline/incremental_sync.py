@@ -0,0 +1,212 @@
+import datetime
+import hashlib
+import json
+from typing import Dict, Any, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from src.deduplication.deduplicator import Deduplicator
+
+
+class IncrementalSync:
+    """
+    Per-source checkpoints and record fingerprints that let a run skip hosts which did not change.
+
+    For every source record a content hash is stored (sync_records). Check-in timestamps change on
+    every agent heartbeat, so they are left out of the hash and only force a re-process once they
+    have moved by more than SEEN_REFRESH; otherwise every active host would count as changed on
+    every run. Checkpoints (sync_checkpoints) hold the resume position (skip offset for Qualys and
+    CrowdStrike, page cursor for Tenable). An interrupted run resumes from its checkpoint; a completed
+    one starts from the beginning again.
+
+    An unchanged record is still re-processed when its asset in unified_assets has been written by a
+    source earlier in the merge order since this source's last merge (Deduplicator.merge_superseded):
+    that merge has overwritten fields this source's merge sets.
+    """
+
+    RECORD_ID_FIELDS = {"Qualys": "id", "CrowdStrike": "device_id", "Tenable": "id"}
+    # Check-in timestamps per source, as dotted paths into the raw record
+    SEEN_FIELDS = {
+        "Qualys": ["agentInfo.lastCheckedIn.$date"],
+        "CrowdStrike": ["last_seen"],
+        "Tenable": ["last_seen", "last_authenticated_scan_time"],
+    }
+    SEEN_REFRESH = datetime.timedelta(days=1)
+    # Source hosts handled between two saved checkpoints
+    CHECKPOINT_INTERVAL = 1000
+
+    def __init__(self, db: Database):
+        self.checkpoints = db["sync_checkpoints"]
+        self.records = db["sync_records"]
+        self.assets = db["unified_assets"]
+        self._known: Dict[str, Dict[str, Tuple[str, Optional[str]]]] = {}
+        self._computed: Dict[str, Dict[str, Tuple[str, Optional[str]]]] = {}
+        self._dirty: Dict[str, Dict[str, Tuple[str, Optional[str]]]] = {}
+        self._since_checkpoint: Dict[str, int] = {}
+        self._start_skip: Dict[str, int] = {}
+        self._stale: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def _get_path(record: Dict[str, Any], path: str) -> Any:
+        value = record
+        for key in path.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    @staticmethod
+    def _parse_timestamp(value: Optional[str]) -> Optional[datetime.datetime]:
+        if not value:
+            return None
+        try:
+            parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+    def _seen_timestamp(self, source: str, raw_host: Dict[str, Any]) -> Optional[str]:
+        for path in self.SEEN_FIELDS.get(source, []):
+            value = self._get_path(raw_host, path)
+            if value:
+                return value
+        return None
+
+    def _content_hash(self, source: str, raw_host: Dict[str, Any]) -> str:
+        record = dict(raw_host)
+        for path in self.SEEN_FIELDS.get(source, []):
+            # Copy each level on the way down so the raw record itself is left untouched
+            keys = path.split(".")
+            parent = record
+            for key in keys[:-1]:
+                if not isinstance(parent.get(key), dict):
+                    parent = None
+                    break
+                parent[key] = dict(parent[key])
+                parent = parent[key]
+            if parent is not None:
+                parent.pop(keys[-1], None)
+        encoded = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha1(encoded.encode()).hexdigest()
+
+    def start_source(self, source: str) -> Dict[str, Any]:
+        """Loads the stored fingerprints for a source and returns the fetch_hosts arguments to resume from."""
+        self._known[source] = {
+            doc["record_id"]: (doc["hash"], doc.get("seen"))
+            for doc in self.records.find({"source": source}, {"record_id": 1, "hash": 1, "seen": 1})
+        }
+        self._computed[source] = {}
+        self._dirty[source] = {}
+        self._since_checkpoint[source] = 0
+        self._stale.pop(source, None)
+
+        checkpoint = self.checkpoints.find_one({"_id": source}) or {}
+        position = checkpoint.get("position") or {}
+        if checkpoint and not checkpoint.get("completed", True) and position:
+            print(f"Resuming {source} from checkpoint {position}.")
+            self._start_skip[source] = position.get("skip", 0)
+            return dict(position)
+        self._start_skip[source] = 0
+        return {}
+
+    def position(self, source: str, client, fetched: int) -> Dict[str, Any]:
+        """Resume position once the `fetched`-th host of this run has been processed."""
+        page_cursor = getattr(client, "page_cursor", None)
+        if page_cursor is not None:
+            # Resuming re-reads the page the host came from; merges are idempotent
+            return {"cursor": page_cursor}
+        return {"skip": self._start_skip.get(source, 0) + fetched}
+
+    def _load_stale(self, source: str) -> Set[str]:
+        """Record ids of this source whose last merge into their asset has been superseded."""
+        source_key = next((key for key, name in Deduplicator.SOURCE_ID_KEYS.items() if name == source), None)
+        if source_key is None:
+            return set()
+        stale = set()
+        projection = {f"source_ids.{source_key}": 1, "source_versions": 1}
+        for doc in self.assets.find({f"source_ids.{source_key}": {"$exists": True}}, projection):
+            # Same rule as Deduplicator._merge_if_changed; assets without versions count as stale
+            if Deduplicator.merge_superseded(source, doc):
+                stale.add(str(doc["source_ids"][source_key]))
+        return stale
+
+    def is_changed(self, source: str, raw_host: Dict[str, Any]) -> bool:
+        record_id = raw_host.get(self.RECORD_ID_FIELDS.get(source, "id"))
+        if record_id is None:
+            return True
+        record_id = str(record_id)
+
+        content_hash = self._content_hash(source, raw_host)
+        seen = self._seen_timestamp(source, raw_host)
+        self._computed[source][record_id] = (content_hash, seen)
+
+        known = self._known[source].get(record_id)
+        if known is None or known[0] != content_hash:
+            return True
+
+        if source not in self._stale:
+            # Loaded on the first record of the source rather than in start_source, because sources
+            # are processed one after another and the earlier ones must have been written by now
+            self._stale[source] = self._load_stale(source)
+        if record_id in self._stale[source]:
+            return True
+
+        seen_at = self._parse_timestamp(seen)
+        old_seen_at = self._parse_timestamp(known[1])
+        return bool(seen_at and old_seen_at and seen_at - old_seen_at >= self.SEEN_REFRESH)
+
+    def mark_processed(self, source: str, raw_host: Dict[str, Any]):
+        record_id = raw_host.get(self.RECORD_ID_FIELDS.get(source, "id"))
+        if record_id is None:
+            return
+        computed = self._computed[source].pop(str(record_id), None)
+        if computed:
+            self._dirty[source][str(record_id)] = computed
+
+    def _flush_records(self, source: str):
+        dirty = self._dirty[source]
+        if not dirty:
+            return
+        operations = [
+            UpdateOne(
+                {"_id": f"{source}:{record_id}"},
+                {"$set": {"source": source, "record_id": record_id, "hash": content_hash, "seen": seen}},
+                upsert=True,
+            )
+            for record_id, (content_hash, seen) in dirty.items()
+        ]
+        self.records.bulk_write(operations, ordered=False)
+        self._known[source].update(dirty)
+        self._dirty[source] = {}
+
+    def _save_checkpoint(self, source: str, position: Optional[Dict[str, Any]], completed: bool):
+        self.checkpoints.update_one(
+            {"_id": source},
+            {"$set": {
+                "position": position,
+                "completed": completed,
+                "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
+            }},
+            upsert=True,
+        )
+
+    def checkpoint(self, source: str, position: Dict[str, Any], hosts: int = 1):
+        """
+        Records progress after `hosts` more source hosts have been handled. Must only be called once
+        every host marked as processed has been written, because the stored fingerprints and position
+        make the next run skip those hosts.
+        """
+        self._since_checkpoint[source] += hosts
+        if self._since_checkpoint[source] < self.CHECKPOINT_INTERVAL:
+            return
+        self._since_checkpoint[source] = 0
+        self._flush_records(source)
+        self._save_checkpoint(source, position, completed=False)
+
+    def finish_source(self, source: str, position: Optional[Dict[str, Any]] = None, completed: bool = True):
+        """Flushes fingerprints; an incomplete source keeps `position` so the next run resumes there."""
+        self._flush_records(source)
+        self._save_checkpoint(source, None if completed else position, completed=completed)
+        self._computed[source] = {}
+        print(f"Sync checkpoint saved for {source}.")
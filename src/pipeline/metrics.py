@@ -0,0 +1,270 @@
+import bisect
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# Stages instrumented across the pipeline
+STAGES = ("fetch", "normalize", "dedup_find", "score", "merge", "write")
+# Upper bounds, in seconds, of the latency histogram buckets (the last bucket is +Inf)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, Any]) -> MetricKey:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; bucket counts are per bucket, made cumulative on export."""
+    __slots__ = ("bounds", "buckets", "count", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        result = []
+        for bound, count in zip(list(self.bounds) + [float("inf")], self.buckets):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+
+class _StageTimer:
+    """Context manager returned by PipelineMetrics.stage; `items` may be set inside the block."""
+    __slots__ = ("metrics", "name", "items", "started_at", "profile", "traced_at")
+
+    def __init__(self, metrics: "PipelineMetrics", name: str, items: int):
+        self.metrics = metrics
+        self.name = name
+        self.items = items
+        self.profile = None
+        self.traced_at = None
+
+    def __enter__(self) -> "_StageTimer":
+        metrics = self.metrics
+        if self.name in metrics.profile_stages:
+            self.profile = metrics._start_profile(self.name)
+        if self.name in metrics.trace_memory_stages:
+            self.traced_at = tracemalloc.get_traced_memory()[0]
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started_at
+        metrics = self.metrics
+        if self.profile is not None:
+            metrics._stop_profile(self.profile)
+        if self.traced_at is not None:
+            metrics.inc("stage_allocated_bytes_total", tracemalloc.get_traced_memory()[0] - self.traced_at, stage=self.name)
+        metrics.record_stage(self.name, elapsed, self.items)
+
+
+class PipelineMetrics:
+    """
+    Counters and latency histograms for the pipeline stages (fetch, normalize, dedup_find, score,
+    merge, write), HTTP traffic and MongoDB commands, exportable as JSON or Prometheus text.
+
+    Every `stage()` block observes its duration in stage_seconds{stage} and adds its items (hosts,
+    pages, candidates) to stage_items_total{stage}. Stages listed in profile_stages also run under
+    cProfile, and stages in trace_memory_stages record the net bytes they allocate (tracemalloc).
+    verbose=False is the quiet mode: the per-host and per-page log lines are not printed, nor formatted.
+    """
+
+    def __init__(self, verbose: bool = True, profile_stages: Iterable[str] = (), trace_memory_stages: Iterable[str] = ()):
+        self.verbose = verbose
+        self.profile_stages = frozenset()
+        self.trace_memory_stages = frozenset()
+        self._lock = threading.Lock()
+        self._counters: Dict[MetricKey, float] = {}
+        self._histograms: Dict[MetricKey, Histogram] = {}
+        # stage -> (stage_seconds histogram key, stage_items_total counter key), so record_stage builds no keys
+        self._stage_keys: Dict[str, Tuple[MetricKey, MetricKey]] = {}
+        # One profiler per stage and thread: cProfile only follows the thread that enabled it
+        self._profiles: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._profiling = threading.local()
+        self.configure(profile_stages=profile_stages, trace_memory_stages=trace_memory_stages)
+
+    def configure(self, verbose: Optional[bool] = None, profile_stages: Optional[Iterable[str]] = None,
+                  trace_memory_stages: Optional[Iterable[str]] = None):
+        if verbose is not None:
+            self.verbose = verbose
+        if profile_stages is not None:
+            self.profile_stages = frozenset(profile_stages)
+        if trace_memory_stages is not None:
+            self.trace_memory_stages = frozenset(trace_memory_stages)
+            if self.trace_memory_stages and not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._profiles.clear()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def record_stage(self, stage: str, seconds: float, items: int = 1):
+        """Records a unit of stage work timed elsewhere (e.g. in a worker process)."""
+        keys = self._stage_keys.get(stage)
+        if keys is None:
+            keys = self._stage_keys[stage] = (_key("stage_seconds", {"stage": stage}), _key("stage_items_total", {"stage": stage}))
+        histogram_key, items_key = keys
+        with self._lock:
+            histogram = self._histograms.get(histogram_key)
+            if histogram is None:
+                histogram = self._histograms[histogram_key] = Histogram()
+            histogram.observe(seconds)
+            self._counters[items_key] = self._counters.get(items_key, 0) + items
+
+    def stage(self, name: str, items: int = 1) -> _StageTimer:
+        return _StageTimer(self, name, items)
+
+    def _start_profile(self, stage: str) -> Optional[cProfile.Profile]:
+        # Nested profiled stages are accounted to the outermost one
+        if getattr(self._profiling, "active", False):
+            return None
+        key = (stage, threading.get_ident())
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = cProfile.Profile()
+        self._profiling.active = True
+        profile.enable()
+        return profile
+
+    def _stop_profile(self, profile: cProfile.Profile):
+        profile.disable()
+        self._profiling.active = False
+
+    def dump_profiles(self, directory: str) -> List[str]:
+        """Writes one pstats file per profiled stage (all threads combined); returns the paths."""
+        by_stage: Dict[str, List[cProfile.Profile]] = {}
+        with self._lock:
+            for (stage, _), profile in self._profiles.items():
+                by_stage.setdefault(stage, []).append(profile)
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for stage, profiles in sorted(by_stage.items()):
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            path = os.path.join(directory, f"{stage}.prof")
+            stats.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage: timed units, total seconds, items and items per second."""
+        with self._lock:
+            summary = {}
+            for (name, labels), histogram in self._histograms.items():
+                if name != "stage_seconds":
+                    continue
+                stage = dict(labels)["stage"]
+                items = self._counters.get(_key("stage_items_total", {"stage": stage}), 0)
+                summary[stage] = {
+                    "count": histogram.count,
+                    "seconds": round(histogram.sum, 3),
+                    "items": items,
+                    "items_per_second": round(items / histogram.sum, 1) if histogram.sum else None,
+                }
+        return {stage: summary[stage] for stage in sorted(summary, key=lambda s: (STAGES + (s,)).index(s))}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), "count": histogram.count, "sum": histogram.sum,
+                           "buckets": dict(histogram.cumulative())}
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        snapshot = {"counters": counters, "histograms": histograms, "stages": self.stage_summary()}
+        if tracemalloc.is_tracing():
+            snapshot["traced_memory_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        return snapshot
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "pipeline_") -> str:
+        def labels_text(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{label}="{value}"' for label, value in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {prefix}{name} counter")
+                    typed.add(name)
+                lines.append(f"{prefix}{name}{labels_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {prefix}{name} histogram")
+                    typed.add(name)
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{prefix}{name}_bucket{labels_text(labels, (('le', bound),))} {count}")
+                lines.append(f"{prefix}{name}_sum{labels_text(labels)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{labels_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, fmt: str = "json"):
+        """Writes the metrics to `path` as "json" or "prometheus" text."""
+        content = self.to_prometheus() if fmt == "prometheus" else self.to_json()
+        with open(path, "w") as output:
+            output.write(content)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    pymongo command listener counting MongoDB round-trips (every command, getMore included) and
+    their latency per command name. Register it with MongoClient(event_listeners=[...]).
+    """
+
+    def __init__(self, metrics: PipelineMetrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.metrics.inc("mongo_round_trips_total", command=event.command_name)
+        self.metrics.observe("mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        self.metrics.inc("mongo_round_trips_total", command=event.command_name)
+        self.metrics.inc("mongo_command_failures_total", command=event.command_name)
+
+
+# Shared registry used by the clients, normalizer and deduplicators unless they are given their own
+PIPELINE_METRICS = PipelineMetrics()
@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.models.compact_host import CompactHost
+from src.models.unified_host import UnifiedHost
+from src.normalization.host_normalizer import HostNormalizer
+from src.pipeline.metrics import PIPELINE_METRICS, PipelineMetrics
+
+# One normalizer per worker process, created by the pool initializer
+_worker_normalizer: Optional[HostNormalizer] = None
+
+
+def _init_worker():
+    global _worker_normalizer
+    _worker_normalizer = HostNormalizer()
+
+
+def _normalize_chunk(source: str, raw_hosts: List[Dict[str, Any]],
+                     compact: bool = False) -> Tuple[List[Optional[Union[UnifiedHost, CompactHost]]], float, int, Dict]:
+    started_at = time.perf_counter()
+    normalized = _worker_normalizer.normalize_batch(raw_hosts, source)
+    if compact:
+        # Sent back and buffered as CompactHost: a fraction of the pickled and in-memory size of the models
+        normalized = [CompactHost.from_unified(host) if host else None for host in normalized]
+    return normalized, time.perf_counter() - started_at, os.getpid(), HostNormalizer.cache_stats()
+
+
+class ParallelNormalizer:
+    """
+    Normalization stage that runs HostNormalizer in a process pool.
+
+    Raw hosts are sent to the workers in chunks of chunk_size; at most max_pending chunks are in
+    flight, which bounds the memory held between fetching and deduplication. With compact=True the
+    results travel and wait as CompactHost records instead of models, for a fraction of the memory
+    but at the cost of packing and expanding every host. Results are yielded in input order, one per
+    input, so the merge order (and result) is the same as normalizing in the calling thread. With
+    workers=0 hosts are normalized in the calling thread.
+    """
+
+    def __init__(self, workers: int = 0, chunk_size: int = 200, max_pending: Optional[int] = None,
+                 metrics: Optional[PipelineMetrics] = None, compact: bool = False):
+        self.metrics = metrics or PIPELINE_METRICS
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+        self.max_pending = max_pending or max(2, 2 * workers)
+        # Transport and buffer worker results as CompactHost (less memory, more CPU per host)
+        self.compact = compact
+        self.stats: Dict[str, Dict[str, float]] = {}
+        # Latest parse cache counters reported by each worker process
+        self._worker_cache_stats: Dict[int, Dict[str, Dict[str, int]]] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._local_normalizer = HostNormalizer()
+
+    def __enter__(self):
+        if self.workers > 0:
+            # spawn, not fork: the fetch threads may hold locks at the moment a worker is created
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _record(self, source: str, hosts: int, worker_seconds: float):
+        self.metrics.record_stage("normalize", worker_seconds, hosts)
+        stats = self.stats.setdefault(source, {"hosts": 0, "worker_seconds": 0.0})
+        stats["hosts"] += hosts
+        stats["worker_seconds"] += worker_seconds
+
+    def normalize(self, source: str, raw_hosts: Iterable[Optional[Dict[str, Any]]]) -> Iterator[Optional[UnifiedHost]]:
+        """
+        Yields the normalized host (or None) for every raw host, in input order.
+        A None input is passed through as None without being normalized.
+        """
+        if self._executor is not None:
+            yield from self._normalize_in_pool(source, raw_hosts)
+            return
+        for raw_host in raw_hosts:
+            if raw_host is None:
+                yield None
+                continue
+            started_at = time.perf_counter()
+            normalized = self._local_normalizer.normalize_host(raw_host, source)
+            self._record(source, 1, time.perf_counter() - started_at)
+            yield normalized
+
+    def _normalize_in_pool(self, source: str, raw_hosts: Iterable[Optional[Dict[str, Any]]]) -> Iterator[Optional[UnifiedHost]]:
+        # Each pending entry: (number of inputs, positions of the non-None inputs, future)
+        pending: Deque[Tuple[int, List[int], Future]] = deque()
+        chunk: List[Dict[str, Any]] = []
+        chunk_positions: List[int] = []
+        chunk_inputs = 0
+
+        def collect(entry: Tuple[int, List[int], Future]) -> Iterator[Optional[UnifiedHost]]:
+            inputs, positions, future = entry
+            normalized, worker_seconds, worker_pid, cache_stats = future.result()
+            self._worker_cache_stats[worker_pid] = cache_stats
+            self._record(source, len(normalized), worker_seconds)
+            results: List[Optional[Union[UnifiedHost, CompactHost]]] = [None] * inputs
+            for position, host in zip(positions, normalized):
+                results[position] = host
+            if not self.compact:
+                return iter(results)
+            # Expanded back to UnifiedHost one at a time, as the deduplicator asks for them
+            return (host.to_unified() if host else None for host in results)
+
+        try:
+            for raw_host in raw_hosts:
+                if raw_host is not None:
+                    chunk_positions.append(chunk_inputs)
+                    chunk.append(raw_host)
+                chunk_inputs += 1
+                # Placeholders count too: a run of unchanged hosts must not hold back the changed ones
+                # before it, or an unbounded number of inputs piles up behind a single chunk
+                if chunk_inputs < self.chunk_size:
+                    continue
+
+                pending.append((chunk_inputs, chunk_positions, self._executor.submit(_normalize_chunk, source, chunk, self.compact)))
+                chunk, chunk_positions, chunk_inputs = [], [], 0
+                # Hand finished chunks on as soon as possible; block only when the window is full
+                while pending and (len(pending) >= self.max_pending or pending[0][2].done()):
+                    yield from collect(pending.popleft())
+
+            if chunk_inputs:
+                pending.append((chunk_inputs, chunk_positions,
+                                self._executor.submit(_normalize_chunk, source, chunk, self.compact)))
+            while pending:
+                yield from collect(pending.popleft())
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """HostNormalizer parse cache counters, summed over the worker processes when there are any."""
+        if not self._worker_cache_stats:
+            return HostNormalizer.cache_stats()
+        totals: Dict[str, Dict[str, int]] = {}
+        for worker_stats in self._worker_cache_stats.values():
+            for name, counters in worker_stats.items():
+                total = totals.setdefault(name, {})
+                for key, value in counters.items():
+                    total[key] = total.get(key, 0) + value
+        return totals
+
+    def throughput(self, source: str) -> Dict[str, Any]:
+        """Hosts normalized for a source and the rate of a single worker; the stage scales with workers."""
+        stats = self.stats.get(source, {"hosts": 0, "worker_seconds": 0.0})
+        worker_seconds = stats["worker_seconds"]
+        return {
+            "normalized": stats["hosts"],
+            "normalize_seconds": round(worker_seconds, 3),
+            "normalize_hosts_per_second": round(stats["hosts"] / worker_seconds, 1) if worker_seconds else None,
+        }
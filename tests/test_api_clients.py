@@ -0,0 +1,104 @@
+import pytest
+
+from benchmarks.fake_api_server import FakeApiServer
+from benchmarks.synthetic_hosts import crowdstrike_hosts, qualys_hosts, tenable_hosts
+from src.api_clients import tenable_client
+from src.api_clients.crowdstrike_client import CrowdStrikeApiClient
+from src.api_clients.qualys_client import QualysApiClient
+from src.api_clients.tenable_client import TenableApiClient, _EMPTY_HOSTS, _NOT_FOUND, peek_cursor
+
+# Odd, so the last page is short
+HOSTS = 5
+
+
+@pytest.fixture
+def server():
+    with FakeApiServer(tenable_hosts=tenable_hosts(HOSTS)) as server:
+        yield server
+
+
+def make_client(client_class, server: FakeApiServer, **attributes):
+    client = client_class()
+    client.BASE_URL = server.base_url
+    for name, value in attributes.items():
+        setattr(client, name, value)
+    return client
+
+
+@pytest.mark.parametrize("hosts", [4, HOSTS], ids=["full-last-page", "partial-last-page"])
+@pytest.mark.parametrize("client_class, source", [
+    (QualysApiClient, "qualys"),
+    (CrowdStrikeApiClient, "crowdstrike"),
+])
+def test_prefetched_fetch_matches_sequential_fetch(client_class, source, hosts):
+    with FakeApiServer(qualys_hosts=qualys_hosts(hosts), crowdstrike_hosts=crowdstrike_hosts(hosts)) as server:
+        # Room for requests past the end, so the window runs into the end-of-data error
+        sequential = list(make_client(client_class, server, MAX_API_SKIP=20).fetch_hosts(prefetch=1))
+        client = make_client(client_class, server, MAX_API_SKIP=20)
+        tails = []
+        fetch_tail = client._fetch_tail
+        client._fetch_tail = lambda skip, limit: tails.append(skip) or fetch_tail(skip, limit)
+        prefetched = list(client.fetch_hosts(prefetch=3))
+
+    assert sequential == server.hosts[source]
+    assert prefetched == sequential
+    # The tail is fetched once, from the first page past the end; later pages in flight are discarded
+    assert tails == [4]
+
+
+@pytest.mark.parametrize("content, cursor", [
+    (b'{"hosts": [{"id": "1", "cursor": "inner"}], "cursor": "c2"}', "c2"),
+    (b'{"hosts": [], "cursor": null}\n', None),
+    (b'{"cursor": "c2", "hosts": [{"id": "1", "cursor": "inner"}]}', "c2"),
+    (b'{ "cursor" : "c\\"2", "hosts": []}', 'c"2'),
+])
+def test_peek_cursor(content, cursor):
+    assert peek_cursor(content) == cursor
+
+
+@pytest.mark.parametrize("content", [
+    b'{"hosts": [{"id": "1", "cursor": "inner"}]}',
+    b'{"hosts": [{"id": "1"}], "cursor": "c2", "total": 5}',
+    b'{"hosts": [{"id": "1", "cursor": "inner"}], "total": 5}',
+])
+def test_peek_cursor_not_found(content):
+    assert peek_cursor(content) is _NOT_FOUND
+
+
+def test_empty_hosts():
+    assert _EMPTY_HOSTS.match(b'{"hosts": [], "cursor": "c5"}')
+    assert _EMPTY_HOSTS.match(b' { "hosts" : [ ] }')
+    assert not _EMPTY_HOSTS.match(b'{"hosts": [{"id": "1"}], "cursor": "c5"}')
+    assert not _EMPTY_HOSTS.match(b'{"cursor": "c5", "hosts": []}')
+
+
+@pytest.mark.parametrize("peekable", [True, False], ids=["peeked", "decoded"])
+def test_pipelined_fetch_matches_sequential_fetch(server, monkeypatch, peekable):
+    sequential = list(make_client(TenableApiClient, server, PIPELINED_FETCH=False).fetch_hosts())
+    sequential_requests = server.request_count
+    if not peekable:
+        # The next cursor is then only known once the page is decoded
+        monkeypatch.setattr(tenable_client, "peek_cursor", lambda content: _NOT_FOUND)
+
+    pipelined = list(make_client(TenableApiClient, server, PIPELINED_FETCH=True).fetch_hosts())
+
+    assert sequential == server.hosts["tenable"]
+    assert pipelined == sequential
+    assert server.request_count - sequential_requests == sequential_requests
+
+
+@pytest.mark.parametrize("client_class, source", [
+    (QualysApiClient, "qualys"),
+    (CrowdStrikeApiClient, "crowdstrike"),
+    (TenableApiClient, "tenable"),
+])
+def test_streamed_fetch_matches_buffered_fetch(client_class, source):
+    with FakeApiServer(qualys_hosts=qualys_hosts(HOSTS), crowdstrike_hosts=crowdstrike_hosts(HOSTS),
+                       tenable_hosts=tenable_hosts(HOSTS)) as server:
+        buffered = list(make_client(client_class, server, MAX_API_SKIP=20, PIPELINED_FETCH=False).fetch_hosts())
+        # Small chunks, so hosts, strings and numbers are split across them
+        streamed = list(make_client(client_class, server, MAX_API_SKIP=20, STREAM_PAGES=True,
+                                    STREAM_CHUNK_SIZE=7).fetch_hosts())
+
+    assert buffered == server.hosts[source]
+    assert streamed == buffered
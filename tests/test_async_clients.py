@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_api_server import FakeApiServer
+from benchmarks.synthetic_hosts import crowdstrike_hosts, qualys_hosts, tenable_hosts
+from src.api_clients.async_base_client import create_http_client
+from src.api_clients.async_crowdstrike_client import AsyncCrowdStrikeApiClient
+from src.api_clients.async_qualys_client import AsyncQualysApiClient
+from src.api_clients.async_tenable_client import AsyncTenableApiClient
+from src.api_clients.base_client import EndOfDataError
+from src.api_clients.rate_limiter import AdaptiveRateLimiter
+
+# Odd, so the last skip/limit page is short and ends in the end-of-data error
+HOSTS = 5
+
+
+@pytest.fixture
+def server():
+    with FakeApiServer(qualys_hosts=qualys_hosts(HOSTS), crowdstrike_hosts=crowdstrike_hosts(HOSTS),
+                       tenable_hosts=tenable_hosts(HOSTS)) as server:
+        yield server
+
+
+def make_client(client_class, server: FakeApiServer, **kwargs):
+    client = client_class(base_url=server.base_url, **kwargs)
+    client.MAX_API_SKIP = HOSTS
+    return client
+
+
+async def collect(client):
+    async with client:
+        return [host async for host in client.fetch_hosts()]
+
+
+@pytest.mark.parametrize("client_class, source", [
+    (AsyncQualysApiClient, "qualys"),
+    (AsyncCrowdStrikeApiClient, "crowdstrike"),
+    (AsyncTenableApiClient, "tenable"),
+])
+def test_fetches_every_host_in_order(server, client_class, source):
+    hosts = asyncio.run(collect(make_client(client_class, server)))
+    assert hosts == server.hosts[source]
+
+
+def test_end_of_data_error(server):
+    async def fetch_past_the_end():
+        async with make_client(AsyncQualysApiClient, server) as client:
+            await client._fetch_page(skip=4, limit=2)
+
+    with pytest.raises(EndOfDataError):
+        asyncio.run(fetch_past_the_end())
+
+
+def test_limit_too_big(server):
+    async def fetch_too_many():
+        async with make_client(AsyncQualysApiClient, server) as client:
+            client.MAX_API_LIMIT = 10
+            await client._fetch_page(skip=0, limit=10)
+
+    with pytest.raises(ValueError, match="limit too big"):
+        asyncio.run(fetch_too_many())
+
+
+def test_invalid_page_limit_is_rejected(server):
+    async def fetch_with_bad_limit():
+        async with make_client(AsyncCrowdStrikeApiClient, server) as client:
+            return [host async for host in client.fetch_hosts(page_limit=3)]
+
+    with pytest.raises(ValueError, match="page_limit"):
+        asyncio.run(fetch_with_bad_limit())
+
+
+def test_clients_sharing_a_limiter_share_its_concurrency_cap():
+    server = FakeApiServer(qualys_hosts=qualys_hosts(40), crowdstrike_hosts=crowdstrike_hosts(40), latency=0.02)
+    rate_limiter = AdaptiveRateLimiter(rate=1e6, burst=1e6, max_rate=1e6, max_concurrency=2)
+
+    async def fetch_both():
+        async with create_http_client() as http_client:
+            clients = [client_class(http_client=http_client, base_url=server.base_url, rate_limiter=rate_limiter)
+                       for client_class in (AsyncQualysApiClient, AsyncCrowdStrikeApiClient)]
+            for client in clients:
+                client.MAX_API_SKIP = 40
+            return await asyncio.gather(*(collect(client) for client in clients))
+
+    with server:
+        qualys, crowdstrike = asyncio.run(fetch_both())
+    assert len(qualys) == len(crowdstrike) == 40
+    assert server.max_in_flight <= 2
@@ -0,0 +1,151 @@
+import mongomock
+import pytest
+from pymongo import InsertOne, UpdateOne
+
+from src.deduplication.deduplicator import Deduplicator
+from src.deduplication.offline_deduplicator import OfflineDeduplicator
+from src.models.sources import SourceSet
+from src.models.unified_host import NetworkInterface, UnifiedHost
+
+MAC = "00:11:22:33:44:55"
+SOURCE_ID_KEYS = {"Qualys": "qualys_id", "CrowdStrike": "crowdstrike_id", "Tenable": "tenable_id"}
+
+
+def make_host(source: str, hostname: str = "host-0") -> UnifiedHost:
+    return UnifiedHost(
+        primary_mac_address=MAC,
+        source_ids={SOURCE_ID_KEYS[source]: f"{source.lower()}-1"},
+        hostname=hostname,
+        network_interfaces=[NetworkInterface(mac_address=MAC, sources=SourceSet([source]))],
+    )
+
+
+def run_sources(deduplicator, qualys_hostname: str = "host-0"):
+    for source in ("Qualys", "CrowdStrike", "Tenable"):
+        deduplicator.upsert_host(make_host(source, qualys_hostname if source == "Qualys" else "host-0"))
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["asset_inventory_test"]
+
+
+def only_document(deduplicator):
+    docs = list(deduplicator.documents()) if isinstance(deduplicator, OfflineDeduplicator) \
+        else list(deduplicator.collection.find())
+    assert len(docs) == 1
+    return docs[0]
+
+
+def interface_sources(doc):
+    return {iface["mac_address"]: iface["sources"] for iface in doc["network_interfaces"]}
+
+
+@pytest.mark.parametrize("offline", [False, True])
+def test_changed_source_does_not_erase_unchanged_sources(db, offline):
+    deduplicator = OfflineDeduplicator(db) if offline else Deduplicator(db)
+    run_sources(deduplicator)
+    # Only Qualys changed: its merge drops the shared interface and overwrites the hostname, so the
+    # unchanged CrowdStrike and Tenable records must be merged again rather than skipped
+    run_sources(deduplicator, qualys_hostname="renamed-by-qualys")
+
+    doc = only_document(deduplicator)
+    assert doc["hostname"] == "host-0"
+    assert interface_sources(doc) == {MAC: ["CrowdStrike", "Qualys", "Tenable"]}
+
+    # Same result on a third run with nothing changed
+    run_sources(deduplicator, qualys_hostname="renamed-by-qualys")
+    doc = only_document(deduplicator)
+    assert doc["hostname"] == "host-0"
+    assert interface_sources(doc) == {MAC: ["CrowdStrike", "Qualys", "Tenable"]}
+
+
+@pytest.mark.parametrize("offline", [False, True])
+def test_unchanged_rerun_skips_every_merge(db, offline):
+    deduplicator = OfflineDeduplicator(db) if offline else Deduplicator(db)
+    fleet = [(f"00:00:00:00:00:{index:02x}", f"host-{index}") for index in range(50)]
+
+    def run():
+        for source in ("Qualys", "CrowdStrike", "Tenable"):
+            for mac, hostname in fleet:
+                host = make_host(source, hostname)
+                host.primary_mac_address = mac
+                host.source_ids = {SOURCE_ID_KEYS[source]: f"{source.lower()}-{hostname}"}
+                host.network_interfaces = [NetworkInterface(mac_address=mac, sources=SourceSet([source]))]
+                deduplicator.upsert_host(host)
+
+    run()
+    assert deduplicator.merge_stats == {"inserted": 50, "merged": 100, "skipped": 0}
+    run()
+    run()
+    assert deduplicator.merge_stats == {"inserted": 50, "merged": 100, "skipped": 300}
+
+
+def test_merge_is_repeated_only_after_an_earlier_source_wrote(db):
+    deduplicator = Deduplicator(db)
+    run_sources(deduplicator)
+    # Only the last source changed: the earlier sources' merges still hold
+    deduplicator.upsert_host(make_host("Qualys"))
+    deduplicator.upsert_host(make_host("CrowdStrike"))
+    deduplicator.upsert_host(make_host("Tenable", "renamed-by-tenable"))
+    assert deduplicator.merge_stats == {"inserted": 1, "merged": 3, "skipped": 2}
+
+    # The first source changed: the later ones must be merged again to win their fields back
+    deduplicator.upsert_host(make_host("Qualys", "renamed-by-qualys"))
+    deduplicator.upsert_host(make_host("CrowdStrike"))
+    deduplicator.upsert_host(make_host("Tenable", "renamed-by-tenable"))
+    assert deduplicator.merge_stats == {"inserted": 1, "merged": 6, "skipped": 2}
+    doc = only_document(deduplicator)
+    assert doc["hostname"] == "renamed-by-tenable"
+    assert interface_sources(doc) == {MAC: ["CrowdStrike", "Qualys", "Tenable"]}
+    assert doc["source_versions"] == {"Qualys": 5, "CrowdStrike": 6, "Tenable": 7}
+
+
+def test_bulk_batch_merges_hosts_resolving_to_the_same_asset(db, monkeypatch):
+    deduplicator = Deduplicator(db)
+    written = []
+
+    def bulk_write(operations, ordered=True):
+        # mongomock's bulk_write does not accept pymongo 4 operations; apply them one by one
+        written.append(operations)
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                deduplicator.collection.insert_one(operation._doc)
+            else:
+                deduplicator.collection.update_one(operation._filter, operation._doc)
+
+    monkeypatch.setattr(deduplicator.collection, "bulk_write", bulk_write)
+
+    # The CrowdStrike host matches the document the Qualys host inserted earlier in the same batch
+    stats = deduplicator.upsert_hosts_bulk([make_host("Qualys"), make_host("CrowdStrike")])
+    assert stats == {"inserted": 1, "merged": 1, "skipped": 0}
+    assert [type(operation) for operation in written[-1]] == [InsertOne]
+
+    # Two merges into one stored document are written as a single update
+    stats = deduplicator.upsert_hosts_bulk([make_host("Tenable"), make_host("CrowdStrike", "renamed-by-crowdstrike")])
+    assert stats == {"inserted": 0, "merged": 2, "skipped": 0}
+    assert [type(operation) for operation in written[-1]] == [UpdateOne]
+
+    doc = only_document(deduplicator)
+    assert doc["hostname"] == "renamed-by-crowdstrike"
+    assert doc["source_ids"] == {"qualys_id": "qualys-1", "crowdstrike_id": "crowdstrike-1", "tenable_id": "tenable-1"}
+    assert interface_sources(doc) == {MAC: ["CrowdStrike", "Qualys", "Tenable"]}
+
+
+def test_offline_load_keeps_the_id_of_existing_assets(db):
+    first = OfflineDeduplicator(db)
+    run_sources(first)
+    first.load()
+    asset_id = db["unified_assets"].find_one()["_id"]
+
+    second = OfflineDeduplicator(db)
+    # A new asset created ahead of the existing one, so documents are not matched by position
+    second.upsert_host(UnifiedHost(primary_mac_address="66:77:88:99:aa:bb", source_ids={"qualys_id": "qualys-2"},
+                                   hostname="host-1"))
+    run_sources(second, "renamed-by-qualys")
+    assert second.load() == 2
+
+    docs = {doc["source_ids"]["qualys_id"]: doc for doc in db["unified_assets"].find()}
+    assert docs["qualys-1"]["_id"] == asset_id
+    assert docs["qualys-1"]["hostname"] == "host-0"
+    assert docs["qualys-2"]["_id"] != asset_id
@@ -0,0 +1,20 @@
+from benchmarks.synthetic_hosts import qualys_hosts
+from src.normalization.host_normalizer import HostNormalizer
+
+
+def test_numeric_vendor_strings_are_validated_into_the_schema_types():
+    raw_host = qualys_hosts(1)[0]
+    # Vendor JSON may carry numbers as strings
+    raw_host["totalMemory"] = str(raw_host["totalMemory"])
+    for vuln in raw_host["vuln"]["list"]:
+        vuln["HostAssetVuln"]["qid"] = str(vuln["HostAssetVuln"]["qid"])
+    for port in raw_host["openPort"]["list"]:
+        port["HostAssetOpenPort"]["port"] = str(port["HostAssetOpenPort"]["port"])
+
+    host = HostNormalizer().normalize_host(raw_host, "Qualys")
+
+    assert isinstance(host.total_memory_mb, int)
+    assert host.qualys_security.vulnerability_qids
+    assert all(isinstance(qid, int) for qid in host.qualys_security.vulnerability_qids)
+    # open_ports entries are free-form, so ports are stored as the vendor sent them
+    assert [port["port"] for port in host.qualys_security.open_ports] == ["22", "80", "443"]
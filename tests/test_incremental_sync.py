@@ -0,0 +1,86 @@
+import mongomock
+import pytest
+
+from src.deduplication.deduplicator import Deduplicator
+from src.pipeline.incremental_sync import IncrementalSync
+from tests.test_deduplicator import make_host
+
+RAW_HOSTS = {
+    "Qualys": {"id": "qualys-1"},
+    "CrowdStrike": {"device_id": "crowdstrike-1"},
+    "Tenable": {"id": "tenable-1"},
+}
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["asset_inventory_test"]
+
+
+def store_fingerprints(sync: IncrementalSync, sources):
+    # What _flush_records leaves behind after a run (mongomock does not support pymongo 4 bulk_write)
+    for source in sources:
+        record_id = str(RAW_HOSTS[source][IncrementalSync.RECORD_ID_FIELDS[source]])
+        content_hash = sync._content_hash(source, RAW_HOSTS[source])
+        sync.records.insert_one({"_id": f"{source}:{record_id}", "source": source, "record_id": record_id,
+                                 "hash": content_hash, "seen": None})
+
+
+def test_unchanged_record_is_reprocessed_after_another_source_wrote_its_asset(db):
+    deduplicator = Deduplicator(db)
+    for source in ("Qualys", "CrowdStrike", "Tenable"):
+        deduplicator.upsert_host(make_host(source))
+    sync = IncrementalSync(db)
+    store_fingerprints(sync, ["CrowdStrike", "Tenable"])
+
+    for source in ("Qualys", "CrowdStrike", "Tenable"):
+        sync.start_source(source)
+    # Run 2: only the Qualys record changed, and its merge overwrote the hostname
+    deduplicator.upsert_host(make_host("Qualys", "renamed-by-qualys"))
+    for source in ("CrowdStrike", "Tenable"):
+        assert sync.is_changed(source, RAW_HOSTS[source])
+        deduplicator.upsert_host(make_host(source))
+
+    doc = db["unified_assets"].find_one()
+    assert doc["hostname"] == "host-0"
+    assert doc["network_interfaces"][0]["sources"] == ["CrowdStrike", "Qualys", "Tenable"]
+
+
+def test_unchanged_rerun_skips_every_record(db):
+    deduplicator = Deduplicator(db)
+    for source in ("Qualys", "CrowdStrike", "Tenable"):
+        deduplicator.upsert_host(make_host(source))
+    sync = IncrementalSync(db)
+    store_fingerprints(sync, ["Qualys", "CrowdStrike", "Tenable"])
+
+    for source in ("Qualys", "CrowdStrike", "Tenable"):
+        sync.start_source(source)
+    for source in ("Qualys", "CrowdStrike", "Tenable"):
+        assert not sync.is_changed(source, RAW_HOSTS[source])
+
+
+def test_later_source_writing_does_not_make_earlier_records_stale(db):
+    deduplicator = Deduplicator(db)
+    deduplicator.upsert_host(make_host("Qualys"))
+    deduplicator.upsert_host(make_host("CrowdStrike"))
+    sync = IncrementalSync(db)
+    store_fingerprints(sync, ["Qualys", "CrowdStrike"])
+
+    sync.start_source("Qualys")
+    sync.start_source("CrowdStrike")
+    # Qualys changed and was merged again after CrowdStrike
+    deduplicator.upsert_host(make_host("Qualys", "renamed-by-qualys"))
+    assert not sync.is_changed("Qualys", RAW_HOSTS["Qualys"])
+    assert sync.is_changed("CrowdStrike", RAW_HOSTS["CrowdStrike"])
+
+
+def test_checkpoint_interval_counts_hosts(db):
+    sync = IncrementalSync(db)
+    sync.start_source("Qualys")
+    sync.checkpoint("Qualys", {"skip": 500}, hosts=500)
+    assert sync.checkpoints.find_one({"_id": "Qualys"}) is None
+
+    sync.checkpoint("Qualys", {"skip": 1000}, hosts=500)
+    checkpoint = sync.checkpoints.find_one({"_id": "Qualys"})
+    assert checkpoint["position"] == {"skip": 1000}
+    assert not checkpoint["completed"]
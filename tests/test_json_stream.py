@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic_hosts import tenable_hosts
+from src.api_clients.base_client import decode_json
+from src.api_clients.json_stream import JsonStreamReader
+
+ESCAPED_HOST = {
+    "id": "escaped",
+    "host_name": 'quote " backslash \\ slash / newline \n tab \t',
+    "unicode": "café ✓ \U0001f600",
+    "numbers": [0, -12345, 6.02e23, 1.5],
+    "flags": [True, False, None],
+    "nested": {"hosts": [], "cursor": "inner"},
+}
+
+
+def chunked(body: bytes, size: int):
+    return (body[start:start + size] for start in range(0, len(body), size))
+
+
+@pytest.fixture(params=[False, True], ids=["escaped", "ascii-escaped"])
+def hosts_body(request):
+    return json.dumps(tenable_hosts(3) + [ESCAPED_HOST], ensure_ascii=request.param).encode()
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1 << 16])
+def test_items_match_decode_json(hosts_body, size):
+    reader = JsonStreamReader(chunked(hosts_body, size))
+    assert list(reader.items()) == decode_json(hosts_body)
+    assert reader.peek() == ""
+    assert reader.bytes_read == len(hosts_body)
+
+
+@pytest.mark.parametrize("size", [1, 3, 1 << 16])
+def test_keys_walk_an_object_page(size):
+    page = {"hosts": tenable_hosts(2) + [ESCAPED_HOST], "cursor": 'c"2\\', "total": 3}
+    body = json.dumps(page, ensure_ascii=False).encode()
+    reader = JsonStreamReader(chunked(body, size))
+    decoded = {}
+    for key in reader.keys():
+        decoded[key] = list(reader.items()) if reader.peek() == "[" else reader.value()
+    assert decoded == decode_json(body)
+
+
+def test_number_split_across_chunks():
+    assert JsonStreamReader([b" 12", b"34", b"5.", b"5 "]).value() == 12345.5
+
+
+def test_empty_array():
+    assert list(JsonStreamReader([b" [", b" ] "]).items()) == []
+
+
+def test_truncated_body_raises():
+    reader = JsonStreamReader(chunked(b'[{"id": "1"}, {"id": "2"', 4))
+    with pytest.raises(ValueError):
+        list(reader.items())
+
+
+def test_missing_separator_raises():
+    with pytest.raises(ValueError, match="Expected ',' or ']'"):
+        list(JsonStreamReader([b'[1 2]']).items())
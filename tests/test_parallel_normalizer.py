@@ -0,0 +1,29 @@
+import pytest
+
+from benchmarks.synthetic_hosts import tenable_hosts
+from src.models.unified_host import UnifiedHost
+from src.pipeline.parallel_normalizer import ParallelNormalizer
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_placeholders_count_toward_chunks(compact):
+    raw_host = tenable_hosts(1)[0]
+    consumed = []
+
+    def raw_hosts():
+        # One changed host followed by a long run of unchanged ones (None placeholders)
+        for index in range(50):
+            consumed.append(index)
+            yield raw_host if index == 0 else None
+
+    with ParallelNormalizer(workers=1, chunk_size=2, max_pending=2, compact=compact) as normalizer:
+        normalized = normalizer.normalize("Tenable", raw_hosts())
+        first = next(normalized)
+        # The first result is handed on once max_pending chunks of chunk_size inputs are in flight,
+        # not after the whole run of placeholders has been read
+        assert len(consumed) <= 4
+        rest = list(normalized)
+
+    assert isinstance(first, UnifiedHost)
+    assert first.source_ids == {"tenable_id": raw_host["id"]}
+    assert rest == [None] * 49
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from benchmarks.fake_api_server import FakeApiServer
+from benchmarks.synthetic_hosts import qualys_hosts, tenable_hosts
+from src.api_clients.qualys_client import QualysApiClient
+from src.api_clients.response_cache import ResponseCache
+from src.api_clients.tenable_client import TenableApiClient
+
+HOSTS = 5
+
+
+@pytest.fixture
+def server():
+    with FakeApiServer(qualys_hosts=qualys_hosts(HOSTS), tenable_hosts=tenable_hosts(HOSTS)) as server:
+        yield server
+
+
+def make_client(client_class, base_url: str, cache: ResponseCache):
+    client = client_class(response_cache=cache)
+    client.BASE_URL = base_url
+    client.STREAM_PAGES = True
+    client.MAX_API_SKIP = HOSTS
+    return client
+
+
+def cached_pages(directory: str):
+    return sorted(name for _, _, files in os.walk(directory) for name in files)
+
+
+@pytest.mark.parametrize("client_class", [QualysApiClient, TenableApiClient])
+def test_streamed_pages_are_recorded_and_replayed(server, tmp_path, client_class):
+    directory = str(tmp_path)
+    recorded = list(make_client(client_class, server.base_url, ResponseCache(directory)).fetch_hosts())
+    assert len(recorded) == HOSTS
+    assert cached_pages(directory)
+    assert not [name for name in cached_pages(directory) if name.endswith(".tmp")]
+
+    requests_before = server.request_count
+    replay = ResponseCache(directory, mode="replay")
+    replayed = list(make_client(client_class, "http://replay.invalid", replay).fetch_hosts())
+    assert replayed == recorded
+    assert server.request_count == requests_before
+
+
+def test_abandoned_streamed_page_is_not_recorded(server, tmp_path):
+    directory = str(tmp_path)
+    hosts = make_client(QualysApiClient, server.base_url, ResponseCache(directory)).fetch_hosts()
+    next(hosts)
+    hosts.close()
+    assert cached_pages(directory) == []